@@ -0,0 +1,148 @@
+"""
+Admission control in front of the expensive backends. Each backend (LLM, embeddings,
+RPC) has a concurrency limit; calls beyond it wait in a bounded FIFO queue, and are
+shed with `Overloaded` (a 429 at the API) when the queue is full or the wait exceeds
+the timeout, instead of piling up until the provider starts rate limiting us.
+
+    async with admission.limit("llm"):
+        response = await llm.ainvoke(messages)
+"""
+import asyncio
+import time
+from collections import deque
+
+import metrics
+from config import (
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_TIMEOUT,
+    EMBEDDING_CONCURRENCY,
+    LLM_CONCURRENCY,
+    RPC_CONCURRENCY,
+)
+
+
+class Overloaded(Exception):
+    """A backend's admission queue is full or the wait for a slot timed out."""
+
+    def __init__(self, backend: str, reason: str, retry_after: int = 1):
+        super().__init__(f"{backend} is overloaded ({reason}), retry in {retry_after}s")
+        self.backend = backend
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Limiter:
+    """
+    Async context manager admitting at most `limit` concurrent holders (0 = unlimited).
+    Slots are handed to waiters in arrival order.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int = ADMISSION_MAX_QUEUE, timeout: float = ADMISSION_TIMEOUT):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed = {"queue_full": 0, "timeout": 0}
+        self.max_queued = 0
+        self.wait_seconds = 0.0
+        self._waiters = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        if self.limit <= 0:
+            return
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            self._admit(0.0)
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._shed("queue_full")
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self.max_queued = max(self.max_queued, len(self._waiters))
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            self._shed("timeout")
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # a slot was handed over just as we were cancelled
+            raise
+        finally:
+            if future in self._waiters:
+                self._waiters.remove(future)
+        self._admit(time.perf_counter() - started)
+
+    def release(self) -> None:
+        if self.limit <= 0:
+            return
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)  # hand our slot straight to the next waiter
+                return
+        self.in_flight -= 1
+
+    def _admit(self, waited: float) -> None:
+        self.admitted += 1
+        self.wait_seconds += waited
+        if metrics.METRICS_ENABLED:
+            metrics.ADMISSION_WAIT.observe(waited, backend=self.name)
+
+    def _shed(self, reason: str):
+        self.shed[reason] += 1
+        if metrics.METRICS_ENABLED:
+            metrics.ADMISSION_SHED.inc(backend=self.name, reason=reason)
+        raise Overloaded(self.name, reason.replace("_", " "), retry_after=max(1, round(self.timeout / 2)))
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "admitted": self.admitted,
+            "shed": dict(self.shed),
+            "avg_wait_seconds": round(self.wait_seconds / self.admitted, 4) if self.admitted else None,
+        }
+
+
+LIMITERS = {
+    "llm": Limiter("llm", LLM_CONCURRENCY),
+    "embeddings": Limiter("embeddings", EMBEDDING_CONCURRENCY),
+    "rpc": Limiter("rpc", RPC_CONCURRENCY),
+}
+
+
+def limit(backend: str) -> Limiter:
+    return LIMITERS[backend]
+
+
+metrics.register(metrics.Gauge(
+    "defi_admission_queued",
+    "Calls currently waiting for a backend slot.",
+    lambda: {(("backend", name),): limiter.queued for name, limiter in LIMITERS.items()},
+))
+metrics.register(metrics.Gauge(
+    "defi_admission_in_flight",
+    "Calls currently holding a backend slot.",
+    lambda: {(("backend", name),): limiter.in_flight for name, limiter in LIMITERS.items()},
+))
+
+
+def stats() -> dict:
+    return {name: limiter.stats() for name, limiter in LIMITERS.items()}
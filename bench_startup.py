@@ -0,0 +1,54 @@
+"""
+Startup timing for CI: time to import main.py and time until all lazy components are warm.
+
+Import time is measured in a fresh interpreter with placeholder credentials, so it needs
+no network. Pass --warm to also build every component (needs real credentials in .env).
+
+Run: python bench_startup.py [--warm] [--runs 3]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = """
+import asyncio, json
+import main
+from lazy import warm_up
+result = {"import_seconds": main.STARTUP["import_seconds"]}
+if WARM:
+    ok = asyncio.run(warm_up())
+    result["warm_ok"] = ok
+    result["ready_seconds"] = main.time.perf_counter() - main.STARTUP["started"]
+    result["components"] = main.readiness()
+print(json.dumps(result))
+"""
+
+
+def run_once(warm: bool) -> dict:
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "sk-placeholder")
+    output = subprocess.run(
+        [sys.executable, "-c", f"WARM = {warm}\n" + PROBE],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--warm", action="store_true")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    runs = [run_once(args.warm) for _ in range(args.runs)]
+    summary = {"import_seconds_median": statistics.median(r["import_seconds"] for r in runs)}
+    if args.warm:
+        summary["ready_seconds_median"] = statistics.median(r["ready_seconds"] for r in runs)
+    summary["runs"] = runs
+    print(json.dumps(summary, indent=4))
@@ -0,0 +1,74 @@
+"""
+Time-to-first-token of /userQuery/stream vs. the latency of the blocking /userQuery.
+
+Runs the FastAPI app in-process against a scripted chat model that streams tokens with
+configurable latency, so no API keys are needed.
+
+Run: python bench_streaming.py [--requests 10] [--token-ms 15] [--first-token-ms 300]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-stub")
+# Every request asks the same question; measure the full pipeline, not the response cache
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "False")
+
+import httpx
+
+import main
+from fakes import ScriptedChatModel
+
+
+async def positions_stub(user_address):
+    return "[]"
+
+
+async def blocking_latency(client, body):
+    started = time.perf_counter()
+    response = await client.post("/userQuery", json=body)
+    response.raise_for_status()
+    return time.perf_counter() - started
+
+
+async def streaming_ttft(body):
+    # Iterate the StreamingResponse directly: httpx's ASGI transport buffers whole bodies
+    started = time.perf_counter()
+    ttft = None
+    response = await main.userQueryStream(main.RequestBody(**body))
+    async for message in response.body_iterator:
+        event = message.split("\n", 1)[0][len("event: "):]
+        if event == "token" and ttft is None:
+            ttft = time.perf_counter() - started
+        if event == "error":
+            raise RuntimeError(f"stream returned an error event: {message}")
+    return ttft, time.perf_counter() - started
+
+
+async def run(args):
+    main.llm.set(ScriptedChatModel(first_token_seconds=args.first_token_ms / 1000, token_seconds=args.token_ms / 1000))
+    main.positions.set(SimpleNamespace(aquery_all_positions=positions_stub))
+    body = {"userInput": "Recommend some staking protocols for me, at least 5% APR."}
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        blocking = [await blocking_latency(client, body) for _ in range(args.requests)]
+    streaming = [await streaming_ttft(body) for _ in range(args.requests)]
+
+    return {
+        "blocking_latency_p50_s": statistics.median(blocking),
+        "streaming_ttft_p50_s": statistics.median(t for t, _ in streaming),
+        "streaming_total_p50_s": statistics.median(total for _, total in streaming),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--first-token-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=15)
+    print(json.dumps(asyncio.run(run(parser.parse_args())), indent=4))
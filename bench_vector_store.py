@@ -0,0 +1,107 @@
+"""
+Retrieval latency: local NumPy index vs. the remote Pinecone path.
+
+The remote path runs the real PineconeVectorStore code against a stand-in index that
+does the same brute-force search after sleeping for a simulated network round trip,
+so no API keys are needed. Embeddings are deterministic fakes; only search time is measured.
+
+Run: python bench_vector_store.py [--docs 5000] [--rtt-ms 40] [--queries 200]
+"""
+import argparse
+import json
+import statistics
+import tempfile
+import time
+
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_pinecone import PineconeVectorStore
+
+from local_index import LocalVectorStore
+
+DIMENSION = 1536
+
+
+class RemoteIndexStandIn:
+    """Minimal Pinecone Index stand-in: `query()` with simulated round-trip latency."""
+
+    def __init__(self, vectors, texts, metadatas, rtt: float):
+        self.matrix = np.asarray(vectors, dtype=np.float32)
+        self.matrix /= np.linalg.norm(self.matrix, axis=1, keepdims=True)
+        self.texts = texts
+        self.metadatas = metadatas
+        self.rtt = rtt
+
+    def query(self, vector, top_k, include_metadata=True, namespace=None, filter=None):
+        time.sleep(self.rtt)
+        scores = self.matrix @ np.asarray(vector, dtype=np.float32)
+        top = np.argsort(-scores)[:top_k]
+        return {
+            "matches": [
+                {
+                    "id": str(row),
+                    "score": float(scores[row]),
+                    "metadata": {**self.metadatas[row], "text": self.texts[row]},
+                }
+                for row in top
+            ]
+        }
+
+
+def build_catalog(n_docs: int):
+    with open("protocols_data.json", "r") as f:
+        records = json.load(f)
+    texts, metadatas = [], []
+    for i in range(n_docs):
+        record = dict(records[i % len(records)], strategyID=str(i + 1))
+        texts.append("\n".join(f"{k}: {v}" for k, v in record.items()))
+        metadatas.append({"category": record["category"]})
+    return texts, metadatas
+
+
+def measure(search, queries):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+        "mean_ms": statistics.fmean(latencies),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=5000)
+    parser.add_argument("--rtt-ms", type=float, default=40.0)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    embeddings = DeterministicFakeEmbedding(size=DIMENSION)
+    texts, metadatas = build_catalog(args.docs)
+    vectors = embeddings.embed_documents(texts)
+    queries = [embeddings.embed_query(f"staking with at least {i % 10}% APR") for i in range(args.queries)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        local = LocalVectorStore(embeddings, path=f"{tmp}/index")
+        local.add_vectors(vectors, texts, metadatas)
+        # Reopen so the benchmark runs against the memory-mapped file, like the server does
+        local = LocalVectorStore(embeddings, path=f"{tmp}/index")
+
+        remote = PineconeVectorStore(
+            index=RemoteIndexStandIn(vectors, texts, metadatas, args.rtt_ms / 1000),
+            embedding=embeddings,
+            text_key="text",
+        )
+
+        results = {
+            "docs": args.docs,
+            "rtt_ms": args.rtt_ms,
+            "local": measure(lambda q: local.similarity_search_by_vector_with_score(q, k=args.k), queries),
+            "remote_stand_in": measure(lambda q: remote.similarity_search_by_vector_with_score(q, k=args.k), queries),
+        }
+    print(json.dumps(results, indent=4))
@@ -0,0 +1,165 @@
+"""
+Throughput scaling from 1 to N uvicorn worker processes sharing the SQLite checkpointer.
+
+Each run starts `uvicorn --workers N` on the app with the deterministic fakes from
+fakes.py (short LLM latency, so the workers are CPU-bound), then has every simulated
+user send several turns one after another while users run concurrently. Turns of one
+user land on arbitrary workers, so at the end every thread in the shared checkpoint
+database must hold all of its user's turns.
+
+Run: python bench_workers.py [--workers 1 2 4] [--users 32] [--turns 3] [--concurrency 16]
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-stub")
+os.environ.setdefault("QUICKNODE_API_KEY", "stub")
+os.environ.setdefault("AGGREGATOR_CONTRACT_ADDRESS", "0x0000000000000000000000000000000000000001")
+
+QUESTIONS = [
+    "Recommend some staking protocols for me, at least 5% APR.",
+    "Check my positions.",
+    "Which protocol has the highest TVL?",
+    "Claim my rewards.",
+]
+
+
+def create_app():
+    """uvicorn factory for the worker processes: the real app with fake backends."""
+    import fakes
+    import main
+
+    fakes.install(
+        main,
+        llm_seconds=float(os.environ.get("BENCH_LLM_MS", "20")) / 1000,
+        token_seconds=0,
+        vector_seconds=0.005,
+        rpc_seconds=0.005,
+    )
+    return main.app
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _wait_until_up(client, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def drive(base_url: str, users: int, turns: int, concurrency: int) -> dict:
+    import httpx
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], []
+
+    async def user(client, i):
+        address = f"0x{i + 1:040x}"
+        for turn in range(turns):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(
+                    "/userQuery", json={"userInput": QUESTIONS[(i + turn) % len(QUESTIONS)], "userAddress": address}
+                )
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    errors.append(response.text[:200])
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        await _wait_until_up(client)
+        started = time.perf_counter()
+        await asyncio.gather(*(user(client, i) for i in range(users)))
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round((len(latencies) - len(errors)) / elapsed, 2),
+        "p50": round(latencies[len(latencies) // 2], 4),
+        "p95": round(latencies[int(len(latencies) * 0.95) - 1], 4),
+    }
+
+
+def check_histories(path: str, users: int, turns: int) -> int:
+    """Number of users whose thread holds all of their turns."""
+    from checkpointer import SQLiteCheckpointStore, StoreCheckpointer
+    from conversation import thread_id_for
+
+    saver = StoreCheckpointer(SQLiteCheckpointStore(path))
+    complete = 0
+    for i in range(users):
+        state = saver.get_tuple({"configurable": {"thread_id": thread_id_for(f"0x{i + 1:040x}")}})
+        messages = state.checkpoint["channel_values"].get("messages", []) if state else []
+        complete += sum(m.type == "human" for m in messages) == turns
+    return complete
+
+
+def run(workers: int, args) -> dict:
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "checkpoints.sqlite")
+        env = {
+            **os.environ,
+            "CHECKPOINT_BACKEND": "sqlite",
+            "CHECKPOINT_PATH": path,
+            "RESPONSE_CACHE_ENABLED": "False",
+            "BENCH_LLM_MS": str(args.llm_ms),
+        }
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "bench_workers:create_app", "--factory",
+             "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        try:
+            result = asyncio.run(drive(f"http://127.0.0.1:{port}", args.users, args.turns, args.concurrency))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+        result["complete_histories"] = f"{check_histories(path, args.users, args.turns)}/{args.users}"
+    return {"workers": workers, **result}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--users", type=int, default=32)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--llm-ms", type=float, default=20, help="fake LLM latency per call")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPU cores", file=sys.stderr)
+    results = []
+    for workers in args.workers:
+        result = run(workers, args)
+        results.append(result)
+        baseline = results[0]["throughput_rps"]
+        print(
+            f"workers={workers:<3} {result['throughput_rps']:>8.2f} req/s ({result['throughput_rps'] / baseline:.2f}x)  "
+            f"p50={result['p50']}s p95={result['p95']}s errors={result['errors']} "
+            f"complete histories={result['complete_histories']}",
+            file=sys.stderr,
+        )
+    print(json.dumps(results, indent=4))
@@ -0,0 +1,30 @@
+import os
+import time
+import uuid
+
+from config import CATALOG_VERSION_PATH
+
+_cached = {"mtime": None, "version": "0"}
+
+
+def catalog_version() -> str:
+    """Version of the ingested strategy catalog ("0" if ingestion never ran)."""
+    try:
+        mtime = os.stat(CATALOG_VERSION_PATH).st_mtime_ns
+    except FileNotFoundError:
+        return "0"
+    if mtime != _cached["mtime"]:
+        with open(CATALOG_VERSION_PATH, "r") as f:
+            _cached["version"] = f.read().strip() or "0"
+        _cached["mtime"] = mtime
+    return _cached["version"]
+
+
+def bump_catalog_version() -> str:
+    """Mark the catalog as changed; called by ingestion after the index is updated."""
+    version = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+    tmp_path = CATALOG_VERSION_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(version)
+    os.replace(tmp_path, CATALOG_VERSION_PATH)
+    return version
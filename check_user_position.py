@@ -1,8 +1,14 @@
-from web3 import Web3
+from web3 import AsyncWeb3, Web3
 from eth_account import Account
+import asyncio
 import json
 import os
 import getpass
+from config import MULTICALL3_ADDRESS, MULTICALL_CHUNK_SIZE, POSITIONS_BATCH_CONCURRENCY
+from position_cache import IncompleteRead, PositionCache
+from strategy_registry import registry
+import admission
+import metrics
 
 
 QUICKNODE_API_KEY = os.environ.get("QUICKNODE_API_KEY")
@@ -10,6 +16,7 @@ QUICKNODE_API_KEY = os.environ.get("QUICKNODE_API_KEY")
 RPC_URL = "https://testnet-rpc2.monad.xyz/" + QUICKNODE_API_KEY
 
 w3 = Web3(Web3.HTTPProvider(RPC_URL))
+async_w3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(RPC_URL))
 
 AGGREGATOR_CONTRACT_ADDRESS = os.environ.get("AGGREGATOR_CONTRACT_ADDRESS")
 
@@ -33,6 +40,44 @@ CONTRACT_ABI = [
         "outputs": [{"internalType": "uint256", "name": "", "type": "uint256"}],
         "stateMutability": "view",
         "type": "function",
+    },
+    {
+        "inputs": [{"internalType": "uint256", "name": "strategyId", "type": "uint256"}],
+        "name": "getTotalStaked",
+        "outputs": [{"internalType": "uint256", "name": "", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function",
+    },
+]
+
+MULTICALL3_ABI = [
+    {
+        "inputs": [
+            {
+                "components": [
+                    {"internalType": "address", "name": "target", "type": "address"},
+                    {"internalType": "bool", "name": "allowFailure", "type": "bool"},
+                    {"internalType": "bytes", "name": "callData", "type": "bytes"},
+                ],
+                "internalType": "struct Multicall3.Call3[]",
+                "name": "calls",
+                "type": "tuple[]",
+            }
+        ],
+        "name": "aggregate3",
+        "outputs": [
+            {
+                "components": [
+                    {"internalType": "bool", "name": "success", "type": "bool"},
+                    {"internalType": "bytes", "name": "returnData", "type": "bytes"},
+                ],
+                "internalType": "struct Multicall3.Result[]",
+                "name": "returnData",
+                "type": "tuple[]",
+            }
+        ],
+        "stateMutability": "payable",
+        "type": "function",
     }
 ]
 
@@ -40,67 +85,343 @@ CONTRACT_ABI = [
 aggregator_contract = w3.eth.contract(
     address=AGGREGATOR_CONTRACT_ADDRESS, abi=CONTRACT_ABI
 )
+multicall_contract = w3.eth.contract(
+    address=Web3.to_checksum_address(MULTICALL3_ADDRESS), abi=MULTICALL3_ABI
+)
 
-def getPendingRewards(strategyId: int, userAddress: str) -> int:
-    try:
-        pendingRewards = aggregator_contract.functions.getPendingRewards(
-            strategyId, userAddress
-        ).call()
-        pendingRewards = w3.from_wei(pendingRewards, "ether")
+# Async counterparts used by the FastAPI request path
+async_aggregator_contract = async_w3.eth.contract(
+    address=AGGREGATOR_CONTRACT_ADDRESS, abi=CONTRACT_ABI
+)
+async_multicall_contract = async_w3.eth.contract(
+    address=Web3.to_checksum_address(MULTICALL3_ADDRESS), abi=MULTICALL3_ABI
+)
 
-        print(
-            f"Pending Rewards for user {userAddress} in strategy {strategyId}: {pendingRewards}"
-        )
-        return pendingRewards
+def _strategy_ids():
+    """On-chain strategy ids of every strategy in the registry."""
+    return [int(record["strategyID"]) for record in registry.current().records]
+
+
+def _read_one(fn_name: str, strategyId: int, userAddress: str, contract) -> int:
+    try:
+        with metrics.timer("rpc", fn_name):
+            return getattr(contract.functions, fn_name)(strategyId, userAddress).call()
     except Exception as e:
-        print(f"Error calling getPendingRewards: {str(e)}")
+        print(f"Error calling {fn_name}: {str(e)}")
         return 0
 
 
-def getStakedBalance(strategyId: int, userAddress: str) -> int:
+async def _aread_one(fn_name: str, strategyId: int, userAddress: str, contract, block_identifier="latest"):
+    """Like `_read_one`, but returns None instead of 0 on errors so callers can tell them apart."""
     try:
-        staked = aggregator_contract.functions.getStakedBalance(
-            strategyId, userAddress
-        ).call()
-        staked = w3.from_wei(staked, "ether")
-        print(
-            f"Staked Balance for user {userAddress} in strategy {strategyId}: {staked}"
-        )
-        return staked
+        with metrics.timer("rpc", fn_name):
+            return await getattr(contract.functions, fn_name)(strategyId, userAddress).call(
+                block_identifier=block_identifier
+            )
     except Exception as e:
-        print(f"Error calling getStakedBalance: {str(e)}")
-        return 0
+        print(f"Error calling {fn_name}: {str(e)}")
+        return None
 
 
-def query_all_positions(userAddress: str):
-    protocol_mapping = [
-        {"name": "SimpleStake", "strategyId": 1, "staking_token": "WMOD", "reward_token": "sWMOD"},
-        {"name": "HappyStake", "strategyId": 2, "staking_token": "WMOD", "reward_token": "sWMOD"},
-        {"name": "EasyStake", "strategyId": 3, "staking_token": "WMOD", "reward_token": "sWMOD"},
-        {"name": "CakeStake", "strategyId": 4, "staking_token": "WMOD", "reward_token": "sWMOD"},
+def _chunks(calls):
+    for start in range(0, len(calls), MULTICALL_CHUNK_SIZE):
+        yield calls[start : start + MULTICALL_CHUNK_SIZE]
+
+
+_selectors = {}
+
+
+def _calldata(contract, fn_name: str, strategyId: int, userAddress: str) -> bytes:
+    """
+    ABI-encode fn_name(uint256 strategyId, address user). Every aggregator view call has
+    that signature, so only the selector comes from web3; encode_abi itself costs ~0.7ms
+    per call, which dominates batch reads over thousands of addresses.
+    """
+    selector = _selectors.get(fn_name)
+    if selector is None:
+        selector = bytes.fromhex(contract.encode_abi(fn_name, args=[0, Web3.to_checksum_address("0x" + "0" * 40)])[2:10])
+        _selectors[fn_name] = selector
+    address = bytes.fromhex(userAddress[2:])
+    if len(address) != 20:
+        raise ValueError(f"Invalid address: {userAddress}")
+    return selector + int(strategyId).to_bytes(32, "big") + address.rjust(32, b"\0")
+
+
+def _encode_calls(chunk, contract):
+    return [
+        (contract.address, True, _calldata(contract, fn_name, strategyId, userAddress))
+        for fn_name, strategyId, userAddress in chunk
     ]
 
+
+def _decode_results(chunk, responses, contract):
+    results = []
+    for (fn_name, strategyId, _), (success, return_data) in zip(chunk, responses):
+        if not success or len(return_data) < 32:
+            print(f"Error calling {fn_name} for strategy {strategyId}: call reverted")
+            results.append(0)
+            continue
+        # A uint256 return value is its first 32 bytes, big-endian
+        results.append(int.from_bytes(bytes(return_data[:32]), "big"))
+    return results
+
+
+def batch_read(calls, contract=None, multicall=None, block_identifier="latest"):
+    """
+    Resolve many aggregator view calls in a single Multicall3 `aggregate3` round trip.
+
+    `calls` is a list of (fn_name, strategyId, userAddress) tuples, e.g.
+    ("getStakedBalance", 1, "0x..."). Returns the raw uint256 results in the same
+    order. Every sub-call is sent with allowFailure=True, so a reverting call
+    yields 0 without affecting the others (same behaviour as the single-call helpers).
+    If the multicall itself fails (e.g. no Multicall3 on the chain), falls back to
+    sequential calls.
+    """
+    contract = contract or aggregator_contract
+    multicall = multicall or multicall_contract
+
+    results = []
+    for chunk in _chunks(calls):
+        try:
+            with metrics.timer("rpc", "aggregate3"):
+                responses = multicall.functions.aggregate3(
+                    _encode_calls(chunk, contract)
+                ).call(block_identifier=block_identifier)
+        except Exception as e:
+            print(f"Error calling aggregate3, falling back to sequential reads: {str(e)}")
+            results.extend(_read_one(*call, contract=contract) for call in chunk)
+            continue
+        results.extend(_decode_results(chunk, responses, contract))
+    return results
+
+
+async def abatch_read(calls, contract=None, multicall=None, block_identifier="latest", strict: bool = False):
+    """
+    Async version of `batch_read`, backed by AsyncWeb3 so it doesn't block the event loop.
+    With strict=True, fallback reads that failed (and were read as 0) raise
+    IncompleteRead carrying the results, so they aren't mistaken for real balances.
+    """
+    contract = contract or async_aggregator_contract
+    multicall = multicall or async_multicall_contract
+
     results = []
-    for protocol in protocol_mapping:
-        sid = protocol["strategyId"]
-        protocol_name = protocol["name"]
-        staking_token = protocol["staking_token"]
-        reward_token = protocol["reward_token"]
+    failed = 0
+    for chunk in _chunks(calls):
+        async with admission.limit("rpc"):
+            try:
+                with metrics.timer("rpc", "aggregate3"):
+                    responses = await multicall.functions.aggregate3(
+                        _encode_calls(chunk, contract)
+                    ).call(block_identifier=block_identifier)
+            except Exception as e:
+                print(f"Error calling aggregate3, falling back to sequential reads: {str(e)}")
+                responses = None
+        if responses is None:
+            # The rpc limit counts RPC calls, so each fallback read takes its own slot
+            for call in chunk:
+                async with admission.limit("rpc"):
+                    value = await _aread_one(*call, contract=contract, block_identifier=block_identifier)
+                failed += value is None
+                results.append(value or 0)
+            continue
+        results.extend(_decode_results(chunk, responses, contract))
+    if strict and failed:
+        raise IncompleteRead(results)
+    return results
+
+
+def _position_calls(userAddress: str, strategy_ids=None):
+    # Collect every (function, strategyId) pair so they resolve in one round trip
+    calls = []
+    for strategyId in strategy_ids or _strategy_ids():
+        calls.append(("getStakedBalance", strategyId, userAddress))
+        calls.append(("getPendingRewards", strategyId, userAddress))
+    return calls
+
 
-        staked = float(getStakedBalance(sid, userAddress))  
-        pending = float(getPendingRewards(sid, userAddress)) 
+def _position_list(values) -> list:
+    """`values` maps strategyId -> (raw staked, raw pending)."""
+    results = []
+    for record in registry.current().records:
+        strategyId = int(record["strategyID"])
+        raw_staked, raw_pending = values.get(strategyId, (0, 0))
+        staked = float(Web3.from_wei(raw_staked, "ether"))
+        pending = float(Web3.from_wei(raw_pending, "ether"))
 
         results.append({
-            "protocol": protocol_name, 
-            "staking_token": staking_token, 
-            "reward_token": reward_token, 
-            "amount_staked": staked, 
+            "strategyId": strategyId,
+            "protocol": record["protocol"],
+            "staking_token": record["stakingToken"],
+            "reward_token": record["rewardToken"],
+            "amount_staked": staked,
             "pending_rewards": pending
         })
-    json_output = json.dumps(results, indent=4)
+    return results
+
+
+def _format_positions(values) -> str:
+    json_output = json.dumps(_position_list(values), indent=4)
     return json_output
 
 
+def _pair_values(strategy_ids, values):
+    return {
+        strategyId: (values[2 * i], values[2 * i + 1])
+        for i, strategyId in enumerate(strategy_ids)
+    }
+
+
+async def _afetch_positions(userAddress: str, block_identifier, strategy_ids):
+    try:
+        values = await abatch_read(
+            _position_calls(userAddress, strategy_ids), block_identifier=block_identifier, strict=True
+        )
+    except IncompleteRead as e:
+        raise IncompleteRead(_pair_values(strategy_ids, e.values))
+    return _pair_values(strategy_ids, values)
+
+
+async def _aget_block_number():
+    async with admission.limit("rpc"):
+        with metrics.timer("rpc", "block_number"):
+            return await async_w3.eth.block_number
+
+
+# Shared across requests so back-to-back turns in the same block reuse the reads
+position_cache = PositionCache(_aget_block_number)
+
+
+def query_all_positions(userAddress: str):
+    userAddress = Web3.to_checksum_address(userAddress)
+    strategy_ids = _strategy_ids()
+    values = batch_read(_position_calls(userAddress, strategy_ids))
+    return _format_positions(_pair_values(strategy_ids, values))
+
+
+async def aquery_all_positions(userAddress: str, fresh: bool = False):
+    """Async, block-cached version of `query_all_positions`; fresh=True bypasses the cache."""
+    userAddress = Web3.to_checksum_address(userAddress)
+    strategy_ids = _strategy_ids()
+    values = await position_cache.get(
+        userAddress,
+        strategy_ids,
+        lambda block_identifier, ids: _afetch_positions(userAddress, block_identifier, ids),
+        fresh=fresh,
+    )
+    return _format_positions(values)
+
+
+async def aquery_total_staked(strategy_ids=None, block_identifier="latest") -> dict:
+    """
+    Total staked per strategy (in staking-token units), one aggregate3 call per
+    MULTICALL_CHUNK_SIZE strategies. Strategies whose read reverts are left out.
+    """
+    strategy_ids = strategy_ids or _strategy_ids()
+    contract = async_aggregator_contract
+    selector = _selectors.get("getTotalStaked")
+    if selector is None:
+        selector = bytes.fromhex(contract.encode_abi("getTotalStaked", args=[0])[2:10])
+        _selectors["getTotalStaked"] = selector
+
+    totals = {}
+    for chunk in _chunks(list(strategy_ids)):
+        async with admission.limit("rpc"):
+            with metrics.timer("rpc", "aggregate3"):
+                responses = await async_multicall_contract.functions.aggregate3(
+                    [(contract.address, True, selector + int(strategyId).to_bytes(32, "big")) for strategyId in chunk]
+                ).call(block_identifier=block_identifier)
+        for strategyId, (success, return_data) in zip(chunk, responses):
+            if success and len(return_data) >= 32:
+                totals[strategyId] = float(Web3.from_wei(int.from_bytes(bytes(return_data[:32]), "big"), "ether"))
+    return totals
+
+
+def _checksum(address: str):
+    try:
+        return Web3.to_checksum_address(address)
+    except (ValueError, TypeError):
+        return None
+
+
+async def _afetch_address_group(group, block_identifier, strategy_ids):
+    """Positions of a group of (index, address) pairs, read in one aggregate3 call."""
+    calls = []
+    for _, address in group:
+        calls.extend(_position_calls(address, strategy_ids))
+    # A failed read must not show up as a zero balance; the caller reports the group as errors
+    values = await abatch_read(calls, block_identifier=block_identifier, strict=True)
+    per_address = 2 * len(strategy_ids)
+    return [
+        (index, address, _position_list(_pair_values(strategy_ids, values[i * per_address : (i + 1) * per_address])))
+        for i, (index, address) in enumerate(group)
+    ]
+
+
+async def aquery_positions_batch(
+    addresses, block_identifier=None, concurrency: int = POSITIONS_BATCH_CONCURRENCY
+):
+    """
+    Positions for many addresses, yielded as dicts in completion order:
+    {"index", "address", "block", "positions"} or {"index", "address", "error"}.
+
+    Addresses are packed into aggregate3 calls of up to MULTICALL_CHUNK_SIZE sub-calls
+    with at most `concurrency` calls in flight, and every read is pinned to one block
+    (the current head unless `block_identifier` is given). `addresses` may be any
+    iterable and is consumed lazily, so memory stays bounded by the in-flight groups.
+    """
+    strategy_ids = _strategy_ids()
+    if block_identifier is None:
+        block_identifier = await _aget_block_number()
+    group_size = max(1, MULTICALL_CHUNK_SIZE // (2 * len(strategy_ids)))
+
+    def groups():
+        group = []
+        for index, address in enumerate(addresses):
+            checksummed = _checksum(address)
+            if checksummed is None:
+                yield {"index": index, "address": address, "error": "invalid address"}
+                continue
+            group.append((index, checksummed))
+            if len(group) == group_size:
+                yield group
+                group = []
+        if group:
+            yield group
+
+    in_flight = {}
+    pending_groups = groups()
+    exhausted = False
+    try:
+        while in_flight or not exhausted:
+            while not exhausted and len(in_flight) < concurrency:
+                group = next(pending_groups, None)
+                if group is None:
+                    exhausted = True
+                elif isinstance(group, dict):
+                    yield group
+                else:
+                    task = asyncio.ensure_future(_afetch_address_group(group, block_identifier, strategy_ids))
+                    in_flight[task] = group
+            if not in_flight:
+                continue
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                group = in_flight.pop(task)
+                try:
+                    rows = task.result()
+                except Exception as e:
+                    print(f"Error reading positions batch: {str(e)}")
+                    for index, address in group:
+                        yield {"index": index, "address": address, "error": str(e)}
+                    continue
+                for index, address, positions in rows:
+                    yield {"index": index, "address": address, "block": block_identifier, "positions": positions}
+    finally:
+        # e.g. the client went away mid-stream
+        for task in in_flight:
+            task.cancel()
+
+
 if __name__ == "__main__":
     # 測試：指定使用者地址
     testUser = "0x563a73211b9A0b777d6CE3944DcB1447a9833C2d"
@@ -0,0 +1,567 @@
+import asyncio
+import queue
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.types import TASKS
+
+from config import (
+    CHECKPOINT_BACKEND,
+    CHECKPOINT_MAX_BYTES,
+    CHECKPOINT_PATH,
+    MAX_THREADS,
+    THREAD_TTL_SECONDS,
+)
+
+
+class BoundedMemorySaver(MemorySaver):
+    """
+    In-process checkpointer with bounded memory.
+
+    - Only the latest `keep_checkpoints` checkpoints of each thread are kept (we never
+      time-travel, the parent is only needed for pending sends).
+    - Threads idle for more than `ttl_seconds` are dropped.
+    - When there are more than `max_threads` threads or the serialized size exceeds
+      `max_bytes`, least-recently-used threads are evicted first.
+    """
+
+    def __init__(
+        self,
+        max_threads: int = MAX_THREADS,
+        ttl_seconds: float = THREAD_TTL_SECONDS,
+        max_bytes: int = CHECKPOINT_MAX_BYTES,
+        keep_checkpoints: int = 2,
+    ):
+        super().__init__()
+        self.max_threads = max_threads
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.keep_checkpoints = keep_checkpoints
+        self.evictions = 0
+        self._last_access = OrderedDict()  # thread_id -> monotonic time, LRU order
+        self._sizes = {}  # thread_id -> serialized bytes
+        self._lock = threading.RLock()
+
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            self._evict_expired()
+            if thread_id not in self._last_access:
+                # Don't let lookups of unknown threads leave empty entries behind
+                self.storage.pop(thread_id, None)
+                return None
+            self._touch(thread_id)
+            return super().get_tuple(config)
+
+    def list(self, config, **kwargs):
+        with self._lock:
+            return iter(list(super().list(config, **kwargs)))
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            next_config = super().put(config, checkpoint, metadata, new_versions)
+            self._prune(thread_id, config["configurable"]["checkpoint_ns"])
+            self._touch(thread_id)
+            self._sizes[thread_id] = self._thread_size(thread_id)
+            self._evict()
+            return next_config
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            super().put_writes(config, writes, task_id, task_path)
+            self._touch(thread_id)
+            self._sizes[thread_id] = self._thread_size(thread_id)
+            self._evict()
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            for checkpoint_ns, checkpoints in self.storage.pop(thread_id, {}).items():
+                for checkpoint_id in checkpoints:
+                    self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+            self._last_access.pop(thread_id, None)
+            self._sizes.pop(thread_id, None)
+
+    def stats(self) -> dict:
+        """Current thread count and serialized checkpoint footprint."""
+        with self._lock:
+            self._evict_expired()
+            return {
+                "threads": len(self._last_access),
+                "bytes": sum(self._sizes.values()),
+                "evictions": self.evictions,
+                "max_threads": self.max_threads,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+    def _touch(self, thread_id):
+        self._last_access[thread_id] = time.monotonic()
+        self._last_access.move_to_end(thread_id)
+
+    def _prune(self, thread_id, checkpoint_ns):
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        for checkpoint_id in sorted(checkpoints)[: -self.keep_checkpoints]:
+            del checkpoints[checkpoint_id]
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+
+    def _thread_size(self, thread_id) -> int:
+        size = 0
+        for checkpoint_ns, checkpoints in self.storage.get(thread_id, {}).items():
+            for checkpoint_id, (checkpoint, metadata, _) in checkpoints.items():
+                size += len(checkpoint[1]) + len(metadata[1])
+                for _, _, value, _ in self.writes.get(
+                    (thread_id, checkpoint_ns, checkpoint_id), {}
+                ).values():
+                    size += len(value[1])
+        return size
+
+    def _evict_expired(self):
+        deadline = time.monotonic() - self.ttl_seconds
+        while self._last_access:
+            thread_id, last_access = next(iter(self._last_access.items()))
+            if last_access > deadline:
+                break
+            self.delete_thread(thread_id)
+            self.evictions += 1
+
+    def _evict(self):
+        self._evict_expired()
+        # Always keep the most recently used thread, even if it alone exceeds the cap
+        while len(self._last_access) > 1 and (
+            len(self._last_access) > self.max_threads
+            or sum(self._sizes.values()) > self.max_bytes
+        ):
+            self.delete_thread(next(iter(self._last_access)))
+            self.evictions += 1
+
+
+class CheckpointStore(ABC):
+    """
+    Storage behind StoreCheckpointer. Checkpoints, metadata and writes arrive already
+    serialized as (type, bytes) pairs, so a network store (Redis, Postgres, a KV
+    service) only has to implement these methods to be shared by any number of
+    worker processes or replicas. Methods are blocking; StoreCheckpointer calls them
+    from worker threads on the async path.
+    """
+
+    @abstractmethod
+    def get_checkpoint(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str = None):
+        """(checkpoint_id, parent_checkpoint_id, checkpoint, metadata) of the given or latest checkpoint, or None."""
+
+    @abstractmethod
+    def list_checkpoints(self, thread_id: str = None, checkpoint_ns: str = None, before: str = None):
+        """(thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, checkpoint, metadata), newest first."""
+
+    @abstractmethod
+    def get_writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str):
+        """(task_id, channel, value, task_path) of one checkpoint, ordered by task_path, task_id, idx."""
+
+    @abstractmethod
+    def write_batch(self, ops) -> None:
+        """
+        Apply a list of operations atomically:
+        ("checkpoint", thread_id, checkpoint_ns, checkpoint_id, parent_id, checkpoint, metadata, keep),
+        ("writes", thread_id, checkpoint_ns, checkpoint_id, [(task_id, idx, channel, value, task_path), ...]),
+        ("delete", thread_id) or ("expire", idle_seconds).
+        `keep` is how many of the thread's newest checkpoints (per namespace) to retain.
+        """
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """Thread count and stored bytes, for /memoryStats."""
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value BLOB NOT NULL,
+    task_path TEXT NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS checkpoints_updated_at ON checkpoints (updated_at);
+"""
+
+
+class SQLiteCheckpointStore(CheckpointStore):
+    """
+    CheckpointStore in a SQLite database in WAL mode, so several processes on one host
+    can share it: readers never block, and writers serialize on a short IMMEDIATE
+    transaction (waiting up to `busy_timeout` seconds for another process's commit).
+    """
+
+    def __init__(self, path: str = CHECKPOINT_PATH, busy_timeout: float = 5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.evictions = 0
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")  # durable across process crashes in WAL mode
+            self._local.conn = conn
+        return conn
+
+    def get_checkpoint(self, thread_id, checkpoint_ns, checkpoint_id=None):
+        query = (
+            "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata "
+            "FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+        )
+        if checkpoint_id:
+            row = self._connection().execute(query + " AND checkpoint_id = ?", (thread_id, checkpoint_ns, checkpoint_id)).fetchone()
+        else:
+            row = self._connection().execute(query + " ORDER BY checkpoint_id DESC LIMIT 1", (thread_id, checkpoint_ns)).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], (row[2], row[3]), (row[4], row[5])
+
+    def list_checkpoints(self, thread_id=None, checkpoint_ns=None, before=None):
+        clauses, params = [], []
+        for clause, value in (("thread_id = ?", thread_id), ("checkpoint_ns = ?", checkpoint_ns), ("checkpoint_id < ?", before)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        rows = self._connection().execute(
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata "
+            f"FROM checkpoints {where}ORDER BY thread_id, checkpoint_ns, checkpoint_id DESC",
+            params,
+        )
+        for row in rows:
+            yield row[0], row[1], row[2], row[3], (row[4], row[5]), (row[6], row[7])
+
+    def get_writes(self, thread_id, checkpoint_ns, checkpoint_id):
+        rows = self._connection().execute(
+            "SELECT task_id, channel, type, value, task_path FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_path, task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return [(task_id, channel, (type_, value), task_path) for task_id, channel, type_, value, task_path in rows]
+
+    def write_batch(self, ops) -> None:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for op in ops:
+                getattr(self, f"_apply_{op[0]}")(conn, *op[1:])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _apply_checkpoint(self, conn, thread_id, checkpoint_ns, checkpoint_id, parent_id, checkpoint, metadata, keep):
+        conn.execute(
+            "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (thread_id, checkpoint_ns, checkpoint_id, parent_id, checkpoint[0], checkpoint[1], metadata[0], metadata[1], time.time()),
+        )
+        stale = [
+            row[0]
+            for row in conn.execute(
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+                (thread_id, checkpoint_ns, keep),
+            )
+        ]
+        for table in ("checkpoints", "writes"):
+            conn.executemany(
+                f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                [(thread_id, checkpoint_ns, stale_id) for stale_id in stale],
+            )
+
+    def _apply_writes(self, conn, thread_id, checkpoint_ns, checkpoint_id, rows):
+        for task_id, idx, channel, value, task_path in rows:
+            # Regular writes are idempotent per (task, idx); special ones (errors, interrupts) overwrite
+            verb = "INSERT OR IGNORE" if idx >= 0 else "INSERT OR REPLACE"
+            conn.execute(
+                f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, value[0], value[1], task_path),
+            )
+
+    def _apply_delete(self, conn, thread_id):
+        for table in ("checkpoints", "writes"):
+            conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    def _apply_expire(self, conn, idle_seconds):
+        expired = [
+            row[0]
+            for row in conn.execute(
+                "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING max(updated_at) < ?",
+                (time.time() - idle_seconds,),
+            )
+        ]
+        for thread_id in expired:
+            self._apply_delete(conn, thread_id)
+        self.evictions += len(expired)
+
+    def stats(self) -> dict:
+        conn = self._connection()
+        threads, checkpoint_bytes = conn.execute(
+            "SELECT count(DISTINCT thread_id), coalesce(sum(length(checkpoint) + length(metadata)), 0) FROM checkpoints"
+        ).fetchone()
+        (write_bytes,) = conn.execute("SELECT coalesce(sum(length(value)), 0) FROM writes").fetchone()
+        return {"path": self.path, "threads": threads, "bytes": checkpoint_bytes + write_bytes, "evictions": self.evictions}
+
+
+class _BatchWriter:
+    """
+    Group commit: operations submitted from any thread or request are queued and a
+    single writer thread applies everything pending in one transaction, so concurrent
+    requests share one commit instead of paying one each.
+    """
+
+    def __init__(self, store: CheckpointStore, max_batch: int = 256):
+        self.store = store
+        self.max_batch = max_batch
+        self.batches = 0
+        self.ops = 0
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, op) -> Future:
+        future = Future()
+        self._queue.put((op, future))
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="checkpoint-writer", daemon=True)
+                    self._thread.start()
+        return future
+
+    def _run(self):
+        while True:
+            pending = [self._queue.get()]
+            while len(pending) < self.max_batch:
+                try:
+                    pending.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.store.write_batch([op for op, _ in pending])
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.ops += len(pending)
+            for _, future in pending:
+                future.set_result(None)
+
+
+class StoreCheckpointer(BaseCheckpointSaver):
+    """
+    LangGraph checkpointer over a CheckpointStore, so conversation state can be shared by
+    several worker processes. Like BoundedMemorySaver it keeps only the latest
+    `keep_checkpoints` checkpoints per thread and drops threads idle for `ttl_seconds`.
+
+    Serialized values over `compress_min_bytes` (message histories, mostly) are
+    zlib-compressed, and all writes go through a group-commit writer.
+    """
+
+    def __init__(
+        self,
+        store: CheckpointStore,
+        ttl_seconds: float = THREAD_TTL_SECONDS,
+        keep_checkpoints: int = 2,
+        compress_min_bytes: int = 512,
+        expire_interval: float = 60.0,
+    ):
+        super().__init__()
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self.keep_checkpoints = keep_checkpoints
+        self.compress_min_bytes = compress_min_bytes
+        self.expire_interval = expire_interval
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self._writer = _BatchWriter(store)
+        self._expired_at = time.monotonic()
+
+    # --- serialization ---
+
+    def _dump(self, obj):
+        type_, data = self.serde.dumps_typed(obj)
+        self.raw_bytes += len(data)
+        if len(data) >= self.compress_min_bytes:
+            compressed = zlib.compress(data, 1)
+            if len(compressed) < len(data):
+                type_, data = f"{type_}+zlib", compressed
+        self.stored_bytes += len(data)
+        return type_, data
+
+    def _load(self, typed):
+        type_, data = typed
+        if type_.endswith("+zlib"):
+            type_, data = type_[: -len("+zlib")], zlib.decompress(data)
+        return self.serde.loads_typed((type_, data))
+
+    # --- reads ---
+
+    def _tuple(self, thread_id, checkpoint_ns, checkpoint_id, parent_id, checkpoint, metadata):
+        writes = self.store.get_writes(thread_id, checkpoint_ns, checkpoint_id)
+        sends = []
+        if parent_id:
+            sends = [
+                self._load(value)
+                for _, channel, value, _ in self.store.get_writes(thread_id, checkpoint_ns, parent_id)
+                if channel == TASKS
+            ]
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}},
+            checkpoint={**self._load(checkpoint), "pending_sends": sends},
+            metadata=self._load(metadata),
+            pending_writes=[(task_id, channel, self._load(value)) for task_id, channel, value, _ in writes],
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id}}
+                if parent_id
+                else None
+            ),
+        )
+
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        row = self.store.get_checkpoint(thread_id, checkpoint_ns, get_checkpoint_id(config))
+        if row is None:
+            return None
+        return self._tuple(thread_id, checkpoint_ns, *row)
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        configurable = config["configurable"] if config else {}
+        checkpoint_id = get_checkpoint_id(config) if config else None
+        rows = self.store.list_checkpoints(
+            configurable.get("thread_id"),
+            configurable.get("checkpoint_ns"),
+            get_checkpoint_id(before) if before else None,
+        )
+        returned = 0
+        for row in rows:
+            if limit is not None and returned >= limit:
+                break
+            if checkpoint_id and row[2] != checkpoint_id:
+                continue
+            if filter and not all(self._load(row[5]).get(k) == v for k, v in filter.items()):
+                continue
+            returned += 1
+            yield self._tuple(*row)
+
+    # Reads can wait up to busy_timeout on a contended database, so keep them off the event loop
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    # --- writes ---
+
+    def _checkpoint_op(self, config, checkpoint, metadata):
+        checkpoint = checkpoint.copy()
+        checkpoint.pop("pending_sends", None)  # rebuilt from the parent's TASKS writes
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        op = (
+            "checkpoint", thread_id, checkpoint_ns, checkpoint["id"],
+            config["configurable"].get("checkpoint_id"),
+            self._dump(checkpoint), self._dump(get_checkpoint_metadata(config, metadata)),
+            self.keep_checkpoints,
+        )
+        next_config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+        return op, next_config
+
+    def _writes_op(self, config, writes, task_id, task_path):
+        rows = [
+            (task_id, WRITES_IDX_MAP.get(channel, idx), channel, self._dump(value), task_path)
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        configurable = config["configurable"]
+        return ("writes", configurable["thread_id"], configurable.get("checkpoint_ns", ""), configurable["checkpoint_id"], rows)
+
+    def _submit(self, op) -> Future:
+        if time.monotonic() - self._expired_at > self.expire_interval:
+            self._expired_at = time.monotonic()
+            self._writer.submit(("expire", self.ttl_seconds))
+        return self._writer.submit(op)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        op, next_config = self._checkpoint_op(config, checkpoint, metadata)
+        self._submit(op).result()
+        return next_config
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        self._submit(self._writes_op(config, writes, task_id, task_path)).result()
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        op, next_config = self._checkpoint_op(config, checkpoint, metadata)
+        await asyncio.wrap_future(self._submit(op))
+        return next_config
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        await asyncio.wrap_future(self._submit(self._writes_op(config, writes, task_id, task_path)))
+
+    def delete_thread(self, thread_id: str) -> None:
+        self._submit(("delete", thread_id)).result()
+
+    def get_next_version(self, current, channel):
+        # Same scheme as MemorySaver: a monotonic counter plus a random tiebreak
+        current_v = 0 if current is None else current if isinstance(current, int) else int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    def stats(self) -> dict:
+        return {
+            **self.store.stats(),
+            "ttl_seconds": self.ttl_seconds,
+            "compression_ratio": round(self.stored_bytes / self.raw_bytes, 3) if self.raw_bytes else None,
+            "write_batches": self._writer.batches,
+            "ops_per_batch": round(self._writer.ops / self._writer.batches, 2) if self._writer.batches else None,
+        }
+
+
+def build_checkpointer(backend: str = CHECKPOINT_BACKEND):
+    """The conversation checkpointer selected by CHECKPOINT_BACKEND."""
+    if backend == "memory":
+        return BoundedMemorySaver()
+    if backend == "sqlite":
+        return StoreCheckpointer(SQLiteCheckpointStore())
+    raise ValueError(f"Unknown CHECKPOINT_BACKEND {backend!r}, expected 'memory' or 'sqlite'")
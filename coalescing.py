@@ -0,0 +1,46 @@
+import asyncio
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one in-flight execution."""
+
+    def __init__(self):
+        self.coalesced = 0
+        self._in_flight = {}
+
+    def __len__(self):
+        return len(self._in_flight)
+
+    def __contains__(self, key):
+        return key in self._in_flight
+
+    def lead(self, key):
+        """
+        Register the caller as the one producing `key`'s result itself (e.g. while
+        streaming it) and return the future to resolve; concurrent `run(key, ...)` calls
+        wait for it. Returns None if a call for `key` is already in flight.
+        """
+        if key in self._in_flight:
+            return None
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        future.add_done_callback(lambda _: self._forget(key, future))
+        return future
+
+    async def run(self, key, fn):
+        """Await `fn()` for `key`, or join the execution already in flight for it."""
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+        else:
+            self.coalesced += 1
+        # Shielded so one caller giving up doesn't cancel the others' shared work
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()  # retrieved, even if nobody else was waiting
@@ -9,3 +9,115 @@ PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "butter-fi")
 
 UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), "uploads")
+
+# Conversation memory (per-user threads)
+MAX_THREADS = int(os.getenv("MAX_THREADS", "1000"))
+THREAD_TTL_SECONDS = float(os.getenv("THREAD_TTL_SECONDS", "3600"))
+CHECKPOINT_MAX_BYTES = int(os.getenv("CHECKPOINT_MAX_BYTES", str(64 * 1024 * 1024)))
+HISTORY_MAX_MESSAGES = int(os.getenv("HISTORY_MAX_MESSAGES", "20"))
+HISTORY_MAX_TOKENS = int(os.getenv("HISTORY_MAX_TOKENS", "3000"))
+
+# Retrieval caches
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))
+# Optional SQLite file for a persistent embedding tier (disabled when empty)
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "")
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "256"))
+# Written by ingestion.py; any change invalidates cached retrieval results
+CATALOG_VERSION_PATH = os.getenv(
+    "CATALOG_VERSION_PATH", os.path.join(os.path.dirname(__file__), ".catalog_version")
+)
+
+# Vector store backend: "pinecone" (remote) or "local" (in-process NumPy index)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")
+# Base path of the local index files (<path>.npy embeddings + <path>.json documents)
+LOCAL_INDEX_PATH = os.getenv(
+    "LOCAL_INDEX_PATH", os.path.join(os.path.dirname(__file__), "local_index")
+)
+
+# Strategy catalog used by ingestion and structured retrieval
+STRATEGY_DATA_PATH = os.getenv(
+    "STRATEGY_DATA_PATH", os.path.join(os.path.dirname(__file__), "protocols_data.json")
+)
+# How often the strategy registry checks STRATEGY_DATA_PATH for changes (hot reload)
+STRATEGY_RELOAD_INTERVAL = float(os.getenv("STRATEGY_RELOAD_INTERVAL", "5"))
+# Live APR/TVL/liquidity polled off the request path and merged into retrieval results
+# at query time: "" (off, catalog values only), "stub" (local) or "onchain"
+STRATEGY_METRICS_SOURCE = os.getenv("STRATEGY_METRICS_SOURCE", "")
+STRATEGY_METRICS_INTERVAL = float(os.getenv("STRATEGY_METRICS_INTERVAL", "30"))
+STRATEGY_METRICS_BATCH_SIZE = int(os.getenv("STRATEGY_METRICS_BATCH_SIZE", "200"))
+# Relative random-walk step per poll for the "stub" source (0 keeps the catalog values)
+STRATEGY_METRICS_DRIFT = float(os.getenv("STRATEGY_METRICS_DRIFT", "0"))
+# Strategies whose metrics are older than this are reported as stale
+STRATEGY_METRICS_MAX_AGE = float(os.getenv("STRATEGY_METRICS_MAX_AGE", "120"))
+# Max strategies handed to the LLM when structured constraints narrow the catalog
+RETRIEVAL_LIMIT = int(os.getenv("RETRIEVAL_LIMIT", "5"))
+
+# Incremental ingestion
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "100"))
+INGEST_PARALLELISM = int(os.getenv("INGEST_PARALLELISM", "4"))
+# Content hash of every ingested strategy document, used to skip unchanged records
+INGESTION_MANIFEST_PATH = os.getenv(
+    "INGESTION_MANIFEST_PATH",
+    os.path.join(os.path.dirname(__file__), ".ingestion_manifest.json"),
+)
+
+# Position cache: values are keyed by block number, so they are exact for that block
+POSITION_CACHE_ENABLED = os.getenv("POSITION_CACHE_ENABLED", "True") == "True"
+POSITION_CACHE_TTL = float(os.getenv("POSITION_CACHE_TTL", "30"))
+# How long a fetched block number is trusted before asking the node again (~ block time)
+BLOCK_NUMBER_TTL = float(os.getenv("BLOCK_NUMBER_TTL", "1.0"))
+
+# Multicall3 is deployed at the same address on most EVM chains (incl. Monad testnet)
+MULTICALL3_ADDRESS = os.getenv(
+    "MULTICALL3_ADDRESS", "0xcA11bde05977b3631167028862bE2a173976CA11"
+)
+# Max number of sub-calls packed into one aggregate3 call
+MULTICALL_CHUNK_SIZE = int(os.getenv("MULTICALL_CHUNK_SIZE", "500"))
+# Max aggregate3 calls in flight at once for batch position queries
+POSITIONS_BATCH_CONCURRENCY = int(os.getenv("POSITIONS_BATCH_CONCURRENCY", "8"))
+
+# Token budget for the generate() prompt (static prefix + tool context + history)
+PROMPT_MAX_TOKENS = int(os.getenv("PROMPT_MAX_TOKENS", "4000"))
+
+# Semantic cache of final answers to address-independent catalog questions
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "True") == "True"
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "600"))
+# Minimum cosine similarity between query embeddings to reuse an answer
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.95"))
+
+# Instrumentation: Prometheus-style /metrics, and one JSON trace line per request
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True") == "True"
+TRACE_REQUESTS = os.getenv("TRACE_REQUESTS", "False") == "True"
+
+# Speculative prefetch: start the position read (and optionally the vector search for
+# catalog questions) alongside the first LLM call instead of after it
+SPECULATIVE_PREFETCH = os.getenv("SPECULATIVE_PREFETCH", "False") == "True"
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "False") == "True"
+
+# Upper bound on addresses accepted by one /positions/batch request
+POSITIONS_BATCH_MAX_ADDRESSES = int(os.getenv("POSITIONS_BATCH_MAX_ADDRESSES", "10000"))
+
+# Local intent router: send obvious queries straight to a tool without the
+# tool-selection LLM call (python eval_router.py to tune the threshold)
+INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER_ENABLED", "False") == "True"
+# Minimum n-gram similarity to a labelled example for the classifier to route
+INTENT_ROUTER_THRESHOLD = float(os.getenv("INTENT_ROUTER_THRESHOLD", "0.5"))
+
+# Conversation checkpoints: "memory" (one process only) or "sqlite" (a WAL database
+# shared by every worker process on the host)
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "memory")
+CHECKPOINT_PATH = os.getenv(
+    "CHECKPOINT_PATH", os.path.join(os.path.dirname(__file__), "checkpoints.sqlite")
+)
+# uvicorn worker processes for `python main.py` (needs a shared CHECKPOINT_BACKEND when > 1)
+WORKERS = int(os.getenv("WORKERS", "1"))
+
+# Admission control: max concurrent calls per backend (0 = unlimited). Calls beyond the
+# limit queue (up to ADMISSION_MAX_QUEUE, for at most ADMISSION_TIMEOUT seconds) and
+# are shed with 429 after that
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "32"))
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "32"))
+RPC_CONCURRENCY = int(os.getenv("RPC_CONCURRENCY", "16"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "256"))
+ADMISSION_TIMEOUT = float(os.getenv("ADMISSION_TIMEOUT", "10"))
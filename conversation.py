@@ -0,0 +1,61 @@
+import uuid
+
+from langchain_core.messages import trim_messages
+
+from config import HISTORY_MAX_MESSAGES, HISTORY_MAX_TOKENS
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+ANONYMOUS_THREAD_PREFIX = "anon:"
+
+
+def thread_id_for(user_address: str, session_id: str = None) -> str:
+    """
+    Conversation thread for a request: the explicit session if given, otherwise the
+    user's wallet address. Anonymous requests without a session get a throwaway thread
+    so they never share history with each other; nobody can read it again, so it is
+    deleted after the request (see is_anonymous_thread).
+    """
+    if session_id:
+        return f"session:{session_id}"
+    if user_address and user_address.lower() != ZERO_ADDRESS:
+        return f"user:{user_address.lower()}"
+    return f"{ANONYMOUS_THREAD_PREFIX}{uuid.uuid4().hex}"
+
+
+def is_anonymous_thread(thread_id: str) -> bool:
+    return thread_id.startswith(ANONYMOUS_THREAD_PREFIX)
+
+
+def count_tokens(messages) -> int:
+    """Cheap local token estimate (~4 characters per token plus per-message overhead)."""
+    total = 0
+    for message in messages:
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        total += len(content) // 4 + 4
+        for tool_call in getattr(message, "tool_calls", None) or []:
+            total += len(str(tool_call.get("args", ""))) // 4 + 4
+    return total
+
+
+def trim_history(
+    messages, max_messages: int = HISTORY_MAX_MESSAGES, max_tokens: int = HISTORY_MAX_TOKENS
+):
+    """
+    Keep only the most recent part of the conversation that fits both the message window
+    and the token budget. The window always starts on a human message so tool results
+    are never separated from the AI message that requested them.
+    """
+    system = [m for m in messages if m.type == "system"]
+    window = [m for m in messages if m.type != "system"][-max_messages:]
+    trimmed = trim_messages(
+        window,
+        max_tokens=max(max_tokens - count_tokens(system), 0),
+        token_counter=count_tokens,
+        strategy="last",
+        start_on="human",
+    )
+    if not trimmed and window:
+        # The latest turn alone is over budget; still send it rather than nothing
+        human_indexes = [i for i, m in enumerate(window) if m.type == "human"]
+        trimmed = window[human_indexes[-1] if human_indexes else 0 :]
+    return system + trimmed
@@ -0,0 +1,129 @@
+import hashlib
+import re
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+
+from config import EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_SIZE, RESULT_CACHE_SIZE
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation so near-identical questions share a key."""
+    query = re.sub(r"\s+", " ", query.strip().lower())
+    return query.rstrip(" ?!.")
+
+
+class LRUCache:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache of query embeddings: an in-memory LRU in front of an optional
+    SQLite file that survives restarts. Keys are normalized queries per model.
+    """
+
+    def __init__(self, model: str, path: str = EMBEDDING_CACHE_PATH, max_size: int = EMBEDDING_CACHE_SIZE):
+        self.model = model
+        self.memory = LRUCache(max_size)
+        self.disk_hits = 0
+        self.disk_misses = 0
+        self._db = None
+        self._db_lock = threading.Lock()
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT, query TEXT, vector BLOB, PRIMARY KEY (model, query))"
+            )
+            self._db.commit()
+
+    def get(self, query: str):
+        key = normalize_query(query)
+        embedding = self.memory.get(key)
+        if embedding is not None or self._db is None:
+            return embedding
+
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT vector FROM embeddings WHERE model = ? AND query = ?", (self.model, key)
+            ).fetchone()
+        if row is None:
+            self.disk_misses += 1
+            return None
+        self.disk_hits += 1
+        embedding = array("d", row[0]).tolist()
+        self.memory.put(key, embedding)
+        return embedding
+
+    def put(self, query: str, embedding) -> None:
+        key = normalize_query(query)
+        self.memory.put(key, embedding)
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO embeddings (model, query, vector) VALUES (?, ?, ?)",
+                    (self.model, key, array("d", embedding).tobytes()),
+                )
+                self._db.commit()
+
+    def embed(self, query: str, embed_fn):
+        embedding = self.get(query)
+        if embedding is None:
+            embedding = embed_fn(normalize_query(query))
+            self.put(query, embedding)
+        return embedding
+
+    async def aembed(self, query: str, aembed_fn):
+        embedding = self.get(query)
+        if embedding is None:
+            embedding = await aembed_fn(normalize_query(query))
+            self.put(query, embedding)
+        return embedding
+
+    def stats(self) -> dict:
+        return {
+            "memory": self.memory.stats(),
+            "disk": {"enabled": self._db is not None, "hits": self.disk_hits, "misses": self.disk_misses},
+        }
+
+
+class ResultCache(LRUCache):
+    """Top-k search results keyed by query embedding, k and catalog version."""
+
+    def __init__(self, max_size: int = RESULT_CACHE_SIZE):
+        super().__init__(max_size)
+
+    @staticmethod
+    def key(embedding, k: int, version: str):
+        digest = hashlib.sha1(array("d", embedding).tobytes()).hexdigest()
+        return (digest, k, version)
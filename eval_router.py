@@ -0,0 +1,131 @@
+"""
+Accuracy and latency of the local intent router on a labelled query set that is kept
+separate from its training examples.
+
+For each threshold it reports how many queries are routed without the LLM (coverage),
+how many of those go to the wrong tool or carry wrong arguments (misroutes), and the
+router's own latency.
+A misroute costs a wrong tool call; a fallback only costs the LLM call we have today,
+so pick the lowest threshold whose misroute rate is acceptable.
+
+Run: python eval_router.py [--thresholds 0.4 0.5 0.6 0.7 0.8] [--llm-ms 600] [--verbose]
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from intent_router import CATALOG, NO_TOOL, POSITIONS, IntentRouter
+from strategy_registry import registry
+
+# (expected tool, query); NO_TOOL means the LLM should answer without a tool
+LABELLED = [
+    (POSITIONS, "Check my positions."),
+    (POSITIONS, "What are my staked balances?"),
+    (POSITIONS, "Show me my positions please"),
+    (POSITIONS, "How much WMOD have I got staked?"),
+    (POSITIONS, "Do I have rewards waiting?"),
+    (POSITIONS, "Claim my rewards."),
+    (POSITIONS, "I'd like to claim my pending rewards from HappyStake."),
+    (POSITIONS, "Harvest everything"),
+    (POSITIONS, "I want to withdraw my staked WMOD."),
+    (POSITIONS, "Withdraw my funds from SimpleStake."),
+    (POSITIONS, "unstake from EasyStake"),
+    (POSITIONS, "What's my balance?"),
+    (POSITIONS, "How are my investments doing?"),
+    (POSITIONS, "what have i deposited so far"),
+    (CATALOG, "Recommend some staking protocols for me, at least 5% APR."),
+    (CATALOG, "Which protocol has the highest TVL?"),
+    (CATALOG, "What lending strategies are available for WMOD?"),
+    (CATALOG, "Any flexible staking options without a lockup?"),
+    (CATALOG, "Where can I get the best yield?"),
+    (CATALOG, "staking over 7% apr"),
+    (CATALOG, "Show liquid staking protocols"),
+    (CATALOG, "What restaking protocols do you support?"),
+    (CATALOG, "Tell me about CakeStake"),
+    (CATALOG, "Is HappyStake audited?"),
+    (CATALOG, "What does EasyStake charge in fees?"),
+    (CATALOG, "I want to stake 100 WMOD"),
+    (CATALOG, "Suggest a low risk strategy"),
+    (CATALOG, "top yields right now"),
+    (NO_TOOL, "Hello!"),
+    (NO_TOOL, "Thank you so much"),
+    (NO_TOOL, "What can you help me with?"),
+    (NO_TOOL, "What did I just ask you?"),
+    (NO_TOOL, "Can you explain that in simpler words?"),
+    (NO_TOOL, "What is DeFi?"),
+    (NO_TOOL, "How does a blockchain work?"),
+    (NO_TOOL, "Who built you?"),
+    (NO_TOOL, "ok"),
+    (NO_TOOL, "What is slashing?"),
+    # Adversarial: bounds, comparisons and explanations a keyword parse can get backwards.
+    # A third element is the constraint args a route may carry; anything else is a misroute.
+    (CATALOG, "at most 6% apr staking", {}),
+    (CATALOG, "staking under 6% apr please", {}),
+    (CATALOG, "Which protocols pay no more than 7% APR?", {}),
+    (CATALOG, "Which is better, staking or lending?", {}),
+    (CATALOG, "Compare liquid staking and restaking", {}),
+    (CATALOG, "lending or restaking for WMOD?", {}),
+    (CATALOG, "Recommend some staking protocols for me, at least 5% APR.", {"min_apr": 5.0}),
+    (CATALOG, "What lending strategies are available for WMOD?", {"category": "lending", "staking_token": "wmod"}),
+    (CATALOG, "what rewards does SimpleStake give"),
+    (CATALOG, "how much is staked in SimpleStake?"),
+    (CATALOG, "show me the staking rewards of HappyStake"),
+    (NO_TOOL, "What does 5% APR mean?"),
+    (NO_TOOL, "Is staking better than lending in general?"),
+    (NO_TOOL, "Why would anyone accept under 3% APR?"),
+]
+
+
+def evaluate(router: IntentRouter, threshold: float, table) -> dict:
+    routed = correct = 0
+    misroutes, latencies = [], []
+    for expected, query, *expected_args in LABELLED:
+        started = time.perf_counter()
+        tool, confidence, method = router.decide(query, table, threshold=threshold)
+        args = router.catalog_args(query, table) if tool == CATALOG else {}
+        latencies.append(time.perf_counter() - started)
+        if tool is NO_TOOL:
+            continue
+        routed += 1
+        if tool == expected and (not expected_args or args == expected_args[0]):
+            correct += 1
+        else:
+            misroutes.append({
+                "query": query, "expected": expected, "routed": tool, "args": args,
+                "method": method, "confidence": round(confidence, 3),
+            })
+    return {
+        "threshold": threshold,
+        "queries": len(LABELLED),
+        "coverage": round(routed / len(LABELLED), 3),
+        "precision": round(correct / routed, 3) if routed else None,
+        "misroutes": misroutes,
+        "latency_us": {
+            "p50": round(float(np.percentile(latencies, 50)) * 1e6, 1),
+            "p95": round(float(np.percentile(latencies, 95)) * 1e6, 1),
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.4, 0.5, 0.6, 0.7, 0.8])
+    parser.add_argument("--llm-ms", type=float, default=600, help="typical tool-selection LLM call, for the savings estimate")
+    parser.add_argument("--verbose", action="store_true", help="print every misroute")
+    args = parser.parse_args()
+
+    router = IntentRouter(enabled=True)
+    table = registry.current()
+    results = [evaluate(router, threshold, table) for threshold in args.thresholds]
+    print(f"{'threshold':>9} {'coverage':>9} {'precision':>9} {'misroutes':>9} {'p50 us':>8} {'p95 us':>8} {'saved ms/query':>14}")
+    for r in results:
+        saved = r["coverage"] * args.llm_ms
+        print(
+            f"{r['threshold']:>9} {r['coverage']:>9} {str(r['precision']):>9} {len(r['misroutes']):>9} "
+            f"{r['latency_us']['p50']:>8} {r['latency_us']['p95']:>8} {saved:>14.0f}"
+        )
+        if args.verbose:
+            for misroute in r["misroutes"]:
+                print(f"    {json.dumps(misroute)}")
@@ -0,0 +1,242 @@
+"""
+Deterministic local stand-ins for the LLM, the vector store and the chain, shared by
+the benchmarks and the load test so they run without OpenAI, Pinecone or an RPC node.
+
+    fakes.install(main, llm_seconds=0.3, vector_seconds=0.05, rpc_seconds=0.1)
+"""
+import asyncio
+import hashlib
+import json
+import re
+import time
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from conversation import count_tokens
+from local_index import LocalVectorStore
+from strategy_registry import registry
+from structured_index import record_to_document
+
+_POSITION_WORDS = r"\b(?:my|position|positions|withdraw|unstake|claim|harvest|rewards?|balance)\b"
+
+
+def _latest(messages, message_type):
+    return next((m for m in reversed(messages) if m.type == message_type), None)
+
+
+def _strategies_from_context(text: str):
+    """Rows of the prompt builder's strategy table (header line starts with strategyID|)."""
+    lines = text.split("Strategies:\n", 1)[1].split("\n\n", 1)[0].splitlines() if "Strategies:\n" in text else []
+    if not lines:
+        return []
+    header = lines[0].split("|")
+    return [dict(zip(header, line.split("|"))) for line in lines[1:]]
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Tool-calling chat model with configurable latency. The first call picks
+    check_user_position for position questions and retrieve_defi_info otherwise;
+    the generate call streams a JSON answer built from the strategies in its prompt.
+    """
+
+    first_token_seconds: float = 0.3
+    token_seconds: float = 0.015
+    chunk_size: int = 8
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _is_generate_call(self, messages):
+        return bool(messages) and messages[0].type == "system" and "JSON format" in messages[0].content
+
+    def _tool_call(self, messages):
+        question = _latest(messages, "human").content
+        if re.search(_POSITION_WORDS, question.lower()):
+            address = re.search(r"Current user address: (0x[0-9a-fA-F]{40})", " ".join(
+                m.content for m in messages if m.type == "system"
+            ))
+            name, args = "check_user_position", {"user_address": address.group(1) if address else "0x" + "0" * 40}
+        else:
+            name, args = "retrieve_defi_info", {"query": question}
+        return {"name": name, "args": json.dumps(args), "id": f"call_{time.monotonic_ns()}", "index": 0}
+
+    def _answer(self, messages):
+        question = _latest(messages, "human").content.lower()
+        context = "\n".join(m.content for m in messages if m.type == "system")
+        if "withdraw" in question:
+            response_type = "WITHDRAW_POSITION"
+        elif "claim" in question:
+            response_type = "CLAIM_REWARD"
+        elif "Strategies:\n" in context:
+            response_type = "EXECUTE_TRANSACTION"
+        else:
+            response_type = "PURE_STRING_RESPONSE"
+        rows = _strategies_from_context(context)[:3] if response_type == "EXECUTE_TRANSACTION" else []
+        summary = ", ".join(f"{r['protocol']} offers {r['APR']}% APR" for r in rows) or "Here is what I found"
+        return json.dumps({
+            "LLM_response": f"{summary}.",
+            "type": response_type,
+            "strategies": [
+                {
+                    "label": r["protocol"],
+                    "description": f"Stake {r['stakingToken']} in {r['protocol']} for {r['APR']}% APR.",
+                    "strategyID": int(r["strategyID"]),
+                    "stakeToken": r["stakingTokenAddress"],
+                }
+                for r in rows
+            ],
+        })
+
+    def _chunks(self, messages):
+        """The scripted response as stream chunks, with usage on the last one."""
+        usage = {"input_tokens": count_tokens(messages), "output_tokens": 0, "total_tokens": 0}
+        if not self._is_generate_call(messages):
+            usage.update(output_tokens=20, total_tokens=usage["input_tokens"] + 20)
+            return [ChatGenerationChunk(
+                message=AIMessageChunk(content="", tool_call_chunks=[self._tool_call(messages)], usage_metadata=usage)
+            )]
+        text = self._answer(messages)
+        output_tokens = len(text) // 4
+        usage.update(output_tokens=output_tokens, total_tokens=usage["input_tokens"] + output_tokens)
+        starts = range(0, len(text), self.chunk_size)
+        return [
+            ChatGenerationChunk(
+                message=AIMessageChunk(
+                    content=text[start : start + self.chunk_size], usage_metadata=usage if start == starts[-1] else None
+                )
+            )
+            for start in starts
+        ]
+
+    @staticmethod
+    def _result(chunks):
+        message = chunks[0].message
+        for chunk in chunks[1:]:
+            message = message + chunk.message
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(**message.model_dump(exclude={"type", "tool_call_chunks"})))]
+        )
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.first_token_seconds)
+        return self._result(self._chunks(messages))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.first_token_seconds)
+        chunks = self._chunks(messages)
+        for i, chunk in enumerate(chunks):
+            yield chunk
+            if i < len(chunks) - 1:
+                await asyncio.sleep(self.token_seconds)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        chunks = [chunk async for chunk in self._astream(messages, stop, run_manager, **kwargs)]
+        return self._result(chunks)
+
+
+class FakeVectorStore:
+    """The strategy catalog in an in-memory LocalVectorStore with fake embeddings and a simulated round trip."""
+
+    def __init__(self, records=None, latency: float = 0.05):
+        self.latency = latency
+        self.embeddings = DeterministicFakeEmbedding(size=256)
+        self.vector_store = LocalVectorStore(self.embeddings, path="")
+        documents = [record_to_document(r) for r in records or registry.current().records]
+        self.vector_store.add_documents(documents, ids=[doc.id for doc in documents])
+        self.searches = 0
+
+    async def aembed_query(self, query):
+        return self.embeddings.embed_query(query)
+
+    async def asimilarity_search(self, query, k=10, filter=None):
+        self.searches += 1
+        await asyncio.sleep(self.latency)
+        return [
+            doc
+            for doc, _ in self.vector_store.similarity_search_by_vector_with_score(
+                await self.aembed_query(query), k=k, filter=filter
+            )
+        ]
+
+    def cache_stats(self):
+        return {"searches": self.searches}
+
+
+class FakeMulticall:
+    """
+    Multicall3 stand-in: `functions.aggregate3(calls).call(block_identifier=...)`
+    answers every sub-call with a deterministic uint256 derived from its calldata.
+    """
+
+    def __init__(self, latency: float = 0.1, zero_ratio: float = 0.5):
+        self.latency = latency
+        self.zero_ratio = zero_ratio
+        self.calls = 0
+        self.functions = self
+
+    def aggregate3(self, calls):
+        return _FakeCall(self, calls)
+
+    def value_for(self, call_data: bytes) -> int:
+        digest = hashlib.sha256(call_data).digest()
+        if digest[0] < 256 * self.zero_ratio:
+            return 0
+        return int.from_bytes(digest[1:4], "big") * 10**12
+
+
+def _calldata_bytes(call_data) -> bytes:
+    # encode_abi returns a 0x-prefixed hex string
+    if isinstance(call_data, str):
+        return bytes.fromhex(call_data.removeprefix("0x"))
+    return bytes(call_data)
+
+
+class _FakeCall:
+    def __init__(self, multicall, calls):
+        self.multicall = multicall
+        self.sub_calls = calls
+
+    async def call(self, block_identifier="latest"):
+        self.multicall.calls += 1
+        await asyncio.sleep(self.multicall.latency)
+        return [
+            (True, self.multicall.value_for(_calldata_bytes(call_data)).to_bytes(32, "big"))
+            for _, _, call_data in self.sub_calls
+        ]
+
+
+def install_chain(positions_module, latency: float = 0.1, block_seconds: float = 1.0):
+    """Point check_user_position's async reads at a FakeMulticall and a local block clock."""
+    from position_cache import PositionCache
+
+    started = time.monotonic()
+
+    async def block_number():
+        await asyncio.sleep(latency / 2)
+        return int((time.monotonic() - started) / block_seconds)
+
+    multicall = FakeMulticall(latency=latency)
+    positions_module.async_multicall_contract = multicall
+    positions_module.position_cache = PositionCache(block_number)
+    return multicall
+
+
+def install(main_module, llm_seconds=0.3, token_seconds=0.015, vector_seconds=0.05, rpc_seconds=0.1):
+    """Replace main's lazy LLM, vector store and chain reads with the fakes above."""
+    import check_user_position
+
+    model = ScriptedChatModel(first_token_seconds=llm_seconds, token_seconds=token_seconds)
+    vector_store = FakeVectorStore(latency=vector_seconds)
+    multicall = install_chain(check_user_position, latency=rpc_seconds)
+    main_module.llm.set(model)
+    main_module.vector_store.set(vector_store)
+    main_module.positions.set(check_user_position)
+    return model, vector_store, multicall
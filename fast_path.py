@@ -0,0 +1,101 @@
+import json
+import re
+
+# Intents that can be answered from check_user_position output alone
+_INTENT_PATTERNS = {
+    "CLAIM_REWARD": r"\b(?:claim|harvest|collect)\b",
+    "WITHDRAW_POSITION": r"\b(?:withdraw|unstake|redeem|take out|pull out)\b",
+    "PURE_STRING_RESPONSE": r"\b(?:check|show|see|view|list|what(?:'s| are| is)?|how much|my)\b.*\b(?:positions?|balances?|staked|stakes?|rewards?|deposits?)\b",
+}
+# Checking positions needs the question to be about the user's own funds: "what rewards
+# does SimpleStake give" and "show me the rewards of HappyStake" are catalog questions
+_FIRST_PERSON = r"\b(?:my|mine|i|i'm|i've|i'd)\b|(?<!show )(?<!tell )(?<!give )\bme\b"
+# Anything beyond reading positions (advice, comparisons, other protocols) goes to the LLM
+_AMBIGUOUS = r"\b(?:recommend|suggest|should|better|best|compare|apr|apy|tvl|why|how do|explain|and then|stake more|invest)\b"
+
+
+def is_first_person(text: str) -> bool:
+    """True when the text refers to the user's own funds ("my rewards", "have I staked")."""
+    return re.search(_FIRST_PERSON, text.lower()) is not None
+
+
+def detect_position_intent(text: str):
+    """Return the response type for an unambiguous check/withdraw/claim question, else None."""
+    text = text.lower()
+    if re.search(_AMBIGUOUS, text):
+        return None
+    if "?" in text.rstrip("?"):
+        return None  # several questions in one message
+    matched = [intent for intent, pattern in _INTENT_PATTERNS.items() if re.search(pattern, text)]
+    actions = [intent for intent in matched if intent != "PURE_STRING_RESPONSE"]
+    if len(actions) > 1:
+        return None
+    if actions:
+        return actions[0]
+    return "PURE_STRING_RESPONSE" if matched and is_first_person(text) else None
+
+
+def _fmt(amount: float) -> str:
+    return f"{amount:.6f}".rstrip("0").rstrip(".")
+
+
+def render_position_response(intent: str, text: str, positions, strategy_table):
+    """
+    Build the ResponseBody dict for a position question directly from the
+    check_user_position output, or return None if it can't be done confidently.
+    """
+    if isinstance(positions, str):
+        positions = json.loads(positions)
+    if any("strategyId" not in position for position in positions):
+        return None
+
+    # Narrow to protocols named in the question, if any
+    named = [p for p in positions if re.search(rf"\b{re.escape(p['protocol'].lower())}\b", text.lower())]
+    positions = named or positions
+    staked = [p for p in positions if p["amount_staked"] > 0]
+    pending = [p for p in positions if p["pending_rewards"] > 0]
+
+    def strategy(position, description):
+        row = strategy_table.row_by_strategy_id.get(str(position["strategyId"]))
+        if row is None:
+            return None
+        return {
+            "label": position["protocol"],
+            "description": description,
+            "strategyID": int(position["strategyId"]),
+            "stakeToken": strategy_table.records[row]["stakingTokenAddress"],
+        }
+
+    if intent == "WITHDRAW_POSITION":
+        if not staked:
+            return {"LLM_response": "You don't have any staked funds to withdraw right now.", "type": "PURE_STRING_RESPONSE", "strategies": []}
+        strategies = [
+            strategy(p, f"Withdraw your {_fmt(p['amount_staked'])} {p['staking_token']} staked in {p['protocol']}.")
+            for p in staked
+        ]
+        summary = ", ".join(f"{_fmt(p['amount_staked'])} {p['staking_token']} in {p['protocol']}" for p in staked)
+        response = {"LLM_response": f"You can withdraw {summary}.", "type": intent, "strategies": strategies}
+    elif intent == "CLAIM_REWARD":
+        if not pending:
+            return {"LLM_response": "You don't have any pending rewards to claim right now.", "type": "PURE_STRING_RESPONSE", "strategies": []}
+        strategies = [
+            strategy(p, f"Claim your {_fmt(p['pending_rewards'])} {p['reward_token']} pending rewards from {p['protocol']}.")
+            for p in pending
+        ]
+        summary = ", ".join(f"{_fmt(p['pending_rewards'])} {p['reward_token']} from {p['protocol']}" for p in pending)
+        response = {"LLM_response": f"You can claim {summary}.", "type": intent, "strategies": strategies}
+    else:
+        active = [p for p in positions if p["amount_staked"] > 0 or p["pending_rewards"] > 0]
+        if not active:
+            message = "You don't have any staked positions or pending rewards right now."
+        else:
+            message = "Your positions: " + "; ".join(
+                f"{p['protocol']}: {_fmt(p['amount_staked'])} {p['staking_token']} staked, "
+                f"{_fmt(p['pending_rewards'])} {p['reward_token']} pending rewards"
+                for p in active
+            ) + "."
+        response = {"LLM_response": message, "type": "PURE_STRING_RESPONSE", "strategies": []}
+
+    if any(s is None for s in response["strategies"]):
+        return None
+    return response
@@ -1,44 +1,152 @@
+import argparse
+import hashlib
+import json
 import os
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.embeddings import OpenAIEmbeddings
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
 from vector_store import ProtocolsVectorStore
-import json
-from langchain.docstore.document import Document
+from catalog import bump_catalog_version
+from config import (
+    INGEST_BATCH_SIZE,
+    INGEST_PARALLELISM,
+    INGESTION_MANIFEST_PATH,
+    STRATEGY_DATA_PATH,
+)
+from strategy_registry import iter_records
+from structured_index import record_to_document
 
 
-def ingest_json() -> None:
-    vector_store = ProtocolsVectorStore()
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
-    with open("protocols_data.json", "r") as f:
-        data = json.load(f)  # data: List[Dict]
-        print(data)
 
+def load_manifest(path: str = INGESTION_MANIFEST_PATH):
     try:
-        documents = []
-        for record in data:
-            # 將 record 轉成文本，例如 key-value pair 的格式
-            text_content = "\n".join([f"{k}: {v}" for k, v in record.items()])
-
-            # 假設我們把整筆 record 當成一個 chunk
-            doc = Document(
-                page_content=text_content,
-                metadata={
-                    "category": record["category"],
-                },  
-            )
-            documents.append(doc)
-
-        print(f"Starting clear all old docs in Pinecone vectorstore")
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_manifest(manifest: dict, path: str = INGESTION_MANIFEST_PATH) -> None:
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f)
+    os.replace(path + ".tmp", path)
+
+
+def _embed_and_upsert(vector_store, batch):
+    """Embed and upsert a batch of (document, content_hash) pairs."""
+    documents = [doc for doc, _ in batch]
+    vectors = vector_store.embeddings.embed_documents([doc.page_content for doc in documents])
+    vector_store.upsert_embeddings([doc.id for doc in documents], vectors, documents)
+
+
+def ingest_json(
+    path: str = STRATEGY_DATA_PATH,
+    batch_size: int = INGEST_BATCH_SIZE,
+    parallelism: int = INGEST_PARALLELISM,
+    full: bool = False,
+) -> dict:
+    """
+    Sync the vector store with the strategy catalog.
+
+    Each strategy has a stable document id and a content hash recorded in the manifest,
+    so only added or changed records are embedded and upserted (in parallel batches) and
+    records missing from the source are deleted. The index stays queryable throughout.
+    Without a manifest (first run) or with full=True, the index is rebuilt from scratch.
+    """
+    started = time.perf_counter()
+    vector_store = ProtocolsVectorStore()
+    previous = None if full else load_manifest()
+    if previous is None:
+        print("No ingestion manifest found, rebuilding the whole index")
         vector_store.delete_all_documents()
+        previous = {}
+
+    manifest = {}
+    seen_ids = set()
+    stats = {"added": 0, "updated": 0, "skipped": 0, "deleted": 0, "failed": 0}
+    in_flight = set()
+    batches = {}  # future -> its batch of (document, content_hash)
 
-        print(f"Starting insert {len(documents)} to Pinecone vectorstore")
-        vector_store.add_documents(documents)
-        
-        print("****** Successfully added to Pinecone vectorstore ******")
+    def collect(done):
+        # Only count documents whose batch was upserted. Failed ones keep their previous
+        # manifest entry (if any), so the next run sees a changed hash and retries them.
+        for future, batch in done:
+            try:
+                future.result()
+            except Exception as e:
+                stats["failed"] += 1
+                print(f"Error during document processing: {str(e)}")
+                for doc, _ in batch:
+                    if doc.id in previous:
+                        manifest[doc.id] = previous[doc.id]
+                continue
+            for doc, digest in batch:
+                stats["updated" if doc.id in previous else "added"] += 1
+                manifest[doc.id] = digest
 
+    def finished(futures):
+        return [(future, batches.pop(future)) for future in futures]
+
+    try:
+        upsert_started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=parallelism) as executor:
+            batch = []
+            for record in iter_records(path):
+                doc = record_to_document(record)
+                seen_ids.add(doc.id)
+                digest = content_hash(doc.page_content)
+                if previous.get(doc.id) == digest:
+                    manifest[doc.id] = digest
+                    stats["skipped"] += 1
+                    continue
+
+                batch.append((doc, digest))
+                if len(batch) >= batch_size:
+                    # Bound the number of pending batches so memory stays flat
+                    if len(in_flight) >= parallelism * 2:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        collect(finished(done))
+                    future = executor.submit(_embed_and_upsert, vector_store, batch)
+                    batches[future] = batch
+                    in_flight.add(future)
+                    batch = []
+            if batch:
+                future = executor.submit(_embed_and_upsert, vector_store, batch)
+                batches[future] = batch
+                in_flight.add(future)
+            done, _ = wait(in_flight)
+            collect(finished(done))
+        stats["upsert_seconds"] = round(time.perf_counter() - upsert_started, 3)
+
+        delete_started = time.perf_counter()
+        removed = [doc_id for doc_id in previous if doc_id not in seen_ids]
+        for start in range(0, len(removed), batch_size):
+            vector_store.delete_documents(removed[start : start + batch_size])
+        stats["deleted"] = len(removed)
+        stats["delete_seconds"] = round(time.perf_counter() - delete_started, 3)
+
+        vector_store.flush()
+        save_manifest(manifest)
+        if stats["added"] or stats["updated"] or stats["deleted"]:
+            # Invalidate cached retrieval results in running servers
+            bump_catalog_version()
     except Exception as e:
         print(f"Error during document processing: {str(e)}")
+        stats["failed"] += 1
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    print(f"****** Ingestion finished: {json.dumps(stats)} ******")
+    return stats
 
 
 if __name__ == "__main__":
-    ingest_json()
+    parser = argparse.ArgumentParser(description="Sync the vector store with the strategy catalog")
+    parser.add_argument("--path", default=STRATEGY_DATA_PATH)
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    parser.add_argument("--parallelism", type=int, default=INGEST_PARALLELISM)
+    parser.add_argument("--full", action="store_true", help="delete everything and re-embed all records")
+    args = parser.parse_args()
+    ingest_json(args.path, args.batch_size, args.parallelism, args.full)
@@ -0,0 +1,184 @@
+"""
+Local intent router for the first graph step. Obvious requests ("check my positions",
+"claim my rewards", "staking with at least 5% APR") are sent straight to the right
+tool with their arguments, skipping the tool-selection LLM call; anything it isn't
+confident about returns None and goes to the LLM as before.
+
+Two stages, cheapest first:
+1. Keyword rules shared with the position fast path and the response cache.
+2. A nearest-neighbour classifier over labelled example queries, using hashed word
+   and character n-gram vectors (no embedding API call, microseconds per query).
+"""
+import re
+import zlib
+
+import numpy as np
+
+import metrics
+from config import INTENT_ROUTER_ENABLED, INTENT_ROUTER_THRESHOLD
+from conversation import ZERO_ADDRESS
+from embedding_cache import normalize_query
+from fast_path import detect_position_intent, is_first_person
+from response_cache import is_cacheable_query
+
+POSITIONS = "check_user_position"
+CATALOG = "retrieve_defi_info"
+NO_TOOL = None  # the LLM answers directly (small talk, follow-ups, general questions)
+
+# Labelled examples for the classifier; add misrouted queries here
+EXAMPLES = [
+    (POSITIONS, "check my positions"),
+    (POSITIONS, "what are my staked balances"),
+    (POSITIONS, "show my staked tokens"),
+    (POSITIONS, "how much do I have staked"),
+    (POSITIONS, "how much have I deposited"),
+    (POSITIONS, "what rewards have I earned"),
+    (POSITIONS, "do I have any pending rewards"),
+    (POSITIONS, "claim my rewards"),
+    (POSITIONS, "harvest my staking rewards"),
+    (POSITIONS, "withdraw my staked WMOD"),
+    (POSITIONS, "unstake everything from SimpleStake"),
+    (POSITIONS, "I want to take my funds out"),
+    (POSITIONS, "what is in my wallet on these protocols"),
+    (POSITIONS, "my portfolio"),
+    (CATALOG, "recommend some staking protocols"),
+    (CATALOG, "staking with at least 5% APR"),
+    (CATALOG, "which protocol has the highest APR"),
+    (CATALOG, "which protocol has the highest TVL"),
+    (CATALOG, "what lending strategies are available"),
+    (CATALOG, "any flexible staking options without a lockup"),
+    (CATALOG, "where can I stake WMOD"),
+    (CATALOG, "best yield for WMOD"),
+    (CATALOG, "tell me about SimpleStake"),
+    (CATALOG, "what is the APR of HappyStake"),
+    (CATALOG, "list liquid staking protocols"),
+    (CATALOG, "restaking options"),
+    (CATALOG, "I want to stake WMOD in SimpleStake"),
+    (CATALOG, "where should I invest for good returns"),
+    (NO_TOOL, "hello"),
+    (NO_TOOL, "hi there, who are you"),
+    (NO_TOOL, "thanks"),
+    (NO_TOOL, "what can you do"),
+    (NO_TOOL, "what did I just ask you"),
+    (NO_TOOL, "explain that again"),
+    (NO_TOOL, "what is a blockchain"),
+    (NO_TOOL, "how does staking work in general"),
+    (NO_TOOL, "what is impermanent loss"),
+    (NO_TOOL, "tell me a joke"),
+]
+
+# Constraints retrieve_defi_info accepts as arguments; anything else parse_constraints finds
+# (max_apr, min_tvl, protocol, ...) is left to the tool's own parse of the query text
+CATALOG_ARGS = ("min_apr", "category", "staking_token", "sort_by")
+
+_DIMENSIONS = 4096
+# Catalog questions that name what they want, beyond just mentioning a catalog word
+_CATALOG_ASK = r"\b(?:recommend|suggest|which|list|options?|available|highest|best|top|where can i|what are the)\b"
+# Comparisons, negations, bounds and explanations a keyword parse can get backwards
+# ("at most 6%", "staking or lending?", "what does 5% APR mean?")
+_AMBIGUOUS = (
+    r"\b(?:or|vs\.?|versus|compare|better|between|than|not|no|except|at most|under|below|up to"
+    r"|mean|means|meaning|explain|why|how)\b"
+)
+
+
+def _features(text: str):
+    text = normalize_query(text)
+    words = re.findall(r"[a-z0-9%.]+", text)
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    padded = f" {text} "
+    features += [padded[i : i + 3] for i in range(len(padded) - 2)]
+    return features
+
+
+def vectorize(text: str) -> np.ndarray:
+    """L2-normalized hashed bag of word unigrams/bigrams and character trigrams."""
+    vector = np.zeros(_DIMENSIONS, dtype=np.float32)
+    for feature in _features(text):
+        vector[zlib.crc32(feature.encode("utf-8")) % _DIMENSIONS] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class IntentRouter:
+    def __init__(self, examples=EXAMPLES, threshold: float = INTENT_ROUTER_THRESHOLD, enabled: bool = INTENT_ROUTER_ENABLED):
+        self.threshold = threshold
+        self.enabled = enabled
+        self.labels = [label for label, _ in examples]
+        self.matrix = np.stack([vectorize(text) for _, text in examples])
+        self.routed = {}  # (tool, method) -> count
+        self.fallbacks = 0
+
+    def classify(self, text: str):
+        """(label, similarity) of the nearest labelled example."""
+        similarities = self.matrix @ vectorize(text)
+        best = int(np.argmax(similarities))
+        return self.labels[best], float(similarities[best])
+
+    def decide(self, text: str, strategy_table=None, threshold: float = None):
+        """
+        (tool, confidence, method) for `text`, without any address checks. tool is None
+        when the LLM should decide; method is "keyword", "classifier" or "fallback".
+        """
+        threshold = self.threshold if threshold is None else threshold
+        if detect_position_intent(text):
+            return POSITIONS, 1.0, "keyword"
+        if is_cacheable_query(text) and (
+            re.search(_CATALOG_ASK, text.lower()) or self.catalog_args(text, strategy_table)
+        ):
+            return CATALOG, 1.0, "keyword"
+        label, similarity = self.classify(text)
+        if label == POSITIONS and not is_first_person(text):
+            # Looks like a position question but isn't about the user's own funds
+            return NO_TOOL, similarity, "fallback"
+        if label is not NO_TOOL and similarity >= threshold:
+            return label, similarity, "classifier"
+        return NO_TOOL, similarity, "fallback"
+
+    def catalog_args(self, text: str, strategy_table=None) -> dict:
+        """
+        Constraints to pass to retrieve_defi_info, only when the parse is unambiguous and
+        every constraint is one the tool accepts; otherwise {} and the tool parses the
+        query itself.
+        """
+        if strategy_table is None or re.search(_AMBIGUOUS, text.lower()):
+            return {}
+        constraints = strategy_table.parse_constraints(text)
+        if any(key not in CATALOG_ARGS for key in constraints):
+            return {}
+        return constraints
+
+    def route(self, text: str, user_address: str = None, strategy_table=None):
+        """
+        The tool call to make instead of asking the LLM, as {"name", "args", "confidence",
+        "method"}, or None to fall back to the LLM.
+        """
+        if not self.enabled:
+            return None
+        tool, confidence, method = self.decide(text, strategy_table)
+        if tool == POSITIONS and (not user_address or user_address.lower() == ZERO_ADDRESS):
+            tool = NO_TOOL  # the LLM explains that a wallet is needed
+        if tool is NO_TOOL:
+            self.fallbacks += 1
+            if metrics.METRICS_ENABLED:
+                metrics.ROUTER.inc(tool="llm", method="fallback")
+            return None
+        if tool == POSITIONS:
+            args = {"user_address": user_address}
+        else:
+            args = {"query": text, **self.catalog_args(text, strategy_table)}
+        key = (tool, method)
+        self.routed[key] = self.routed.get(key, 0) + 1
+        if metrics.METRICS_ENABLED:
+            metrics.ROUTER.inc(tool=tool, method=method)
+        return {"name": tool, "args": args, "confidence": round(confidence, 3), "method": method}
+
+    def stats(self) -> dict:
+        routed = sum(self.routed.values())
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "routed": {f"{tool}/{method}": count for (tool, method), count in sorted(self.routed.items())},
+            "fallbacks": self.fallbacks,
+            "route_rate": round(routed / (routed + self.fallbacks), 3) if routed + self.fallbacks else None,
+        }
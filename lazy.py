@@ -0,0 +1,76 @@
+import asyncio
+import threading
+import time
+
+# name -> Lazy, used for warm-up and readiness reporting
+COMPONENTS = {}
+
+
+class Lazy:
+    """Build a heavy component on first use (thread-safe) and record how long it took."""
+
+    def __init__(self, name: str, factory):
+        self.name = name
+        self.factory = factory
+        self.seconds = None
+        self.error = None
+        self._value = None
+        self._ready = False
+        self._lock = threading.Lock()
+        COMPONENTS[name] = self
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def get(self):
+        if self._ready:
+            return self._value
+        with self._lock:
+            if not self._ready:
+                started = time.perf_counter()
+                try:
+                    self._value = self.factory()
+                except Exception as e:
+                    self.error = str(e)
+                    raise
+                self.seconds = time.perf_counter() - started
+                self.error = None
+                self._ready = True
+        return self._value
+
+    async def aget(self):
+        """Like get(), but builds in a worker thread so the event loop isn't blocked."""
+        if self._ready:
+            return self._value
+        return await asyncio.to_thread(self.get)
+
+    def set(self, value) -> None:
+        """Replace the component (e.g. with a stub in tests and benchmarks)."""
+        with self._lock:
+            self._value = value
+            self._ready = True
+            self.error = None
+
+    def status(self) -> dict:
+        return {
+            "ready": self._ready,
+            "seconds": round(self.seconds, 3) if self.seconds is not None else None,
+            "error": self.error,
+        }
+
+
+async def warm_up(names=None) -> bool:
+    """Build the given (default: all) components in parallel; returns True if all succeeded."""
+    components = [COMPONENTS[name] for name in names or COMPONENTS]
+    results = await asyncio.gather(
+        *(component.aget() for component in components), return_exceptions=True
+    )
+    for component, result in zip(components, results):
+        if isinstance(result, Exception):
+            print(f"Error warming up {component.name}: {str(result)}")
+    return not any(isinstance(result, Exception) for result in results)
+
+
+def readiness() -> dict:
+    return {name: component.status() for name, component in COMPONENTS.items()}
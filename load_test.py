@@ -0,0 +1,217 @@
+"""
+Offline load test: boots the FastAPI app in-process against the deterministic fakes in
+fakes.py (scripted LLM, in-memory vector store, mocked Multicall3) and drives
+/userQuery and /userQuery/stream at several concurrency levels.
+
+Reports throughput and p50/p95/p99 latency per endpoint and per intent
+(recommendation, position check, withdraw, claim), writes them as JSON, and can
+compare against an earlier result file to flag regressions.
+
+Run: python load_test.py [--concurrency 1 8 32] [--requests 64] [--output load_test.json]
+                         [--baseline previous.json --tolerance 0.2]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-stub")
+os.environ.setdefault("QUICKNODE_API_KEY", "stub")
+os.environ.setdefault("AGGREGATOR_CONTRACT_ADDRESS", "0x0000000000000000000000000000000000000001")
+os.environ.setdefault("METRICS_ENABLED", "True")
+
+INTENTS = {
+    "recommendation": [
+        "Recommend some staking protocols for me, at least 5% APR.",
+        "Which protocol has the highest TVL?",
+        "What lending strategies are available for WMOD?",
+        "Any flexible staking options without a lockup?",
+    ],
+    "position_check": ["Check my positions.", "What are my staked balances?"],
+    "withdraw": ["I want to withdraw my staked WMOD.", "Withdraw my funds from SimpleStake."],
+    "claim": ["Claim my rewards.", "I'd like to claim my pending rewards from HappyStake."],
+}
+ENDPOINTS = ("/userQuery", "/userQuery/stream")
+
+
+def addresses(n: int = 64):
+    from web3 import Web3
+
+    return [Web3.to_checksum_address(f"0x{i:040x}") for i in range(1, n + 1)]
+
+
+def workload(n: int):
+    """Deterministic round-robin over intents, questions and addresses."""
+    questions = itertools.cycle(
+        [(intent, question) for intent, questions in INTENTS.items() for question in questions]
+    )
+    users = itertools.cycle(addresses())
+    return [(intent, {"userInput": question, "userAddress": next(users)}) for (intent, question), _ in zip(questions, range(n))]
+
+
+def percentiles(values) -> dict:
+    if not values:
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": len(values),
+        "mean": round(float(np.mean(values)), 4),
+        "p50": round(float(p50), 4),
+        "p95": round(float(p95), 4),
+        "p99": round(float(p99), 4),
+    }
+
+
+async def call_blocking(client, body):
+    response = await client.post("/userQuery", json=body)
+    response.raise_for_status()
+    return {}
+
+
+async def call_streaming(main, body):
+    # Iterate the StreamingResponse directly: httpx's ASGI transport buffers whole bodies
+    started = time.perf_counter()
+    ttft = None
+    response = await main.userQueryStream(main.RequestBody(**body))
+    async for message in response.body_iterator:
+        event = message.split("\n", 1)[0][len("event: "):]
+        if event == "token" and ttft is None:
+            ttft = time.perf_counter() - started
+        if event == "error":
+            raise RuntimeError(message)
+    return {"ttft": ttft}
+
+
+async def run_level(main, client, endpoint: str, concurrency: int, n_requests: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+
+    async def one(intent, body):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                if endpoint == "/userQuery":
+                    extra = await call_blocking(client, body)
+                else:
+                    extra = await call_streaming(main, body)
+                error = None
+            except Exception as e:
+                extra, error = {}, str(e)
+            samples.append({"intent": intent, "seconds": time.perf_counter() - started, "error": error, **extra})
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(intent, body) for intent, body in workload(n_requests)))
+    elapsed = time.perf_counter() - started
+
+    ok = [s for s in samples if s["error"] is None]
+    result = {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": n_requests,
+        "errors": len(samples) - len(ok),
+        "seconds": round(elapsed, 4),
+        "throughput_rps": round(len(ok) / elapsed, 3),
+        "latency": {"all": percentiles([s["seconds"] for s in ok])},
+    }
+    for intent in INTENTS:
+        result["latency"][intent] = percentiles([s["seconds"] for s in ok if s["intent"] == intent])
+    if endpoint == "/userQuery/stream":
+        result["ttft"] = percentiles([s["ttft"] for s in ok if s.get("ttft") is not None])
+    if result["errors"]:
+        result["first_error"] = next(s["error"] for s in samples if s["error"])
+    return result
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """p95 latency and throughput regressions beyond `tolerance` (relative) vs. the baseline."""
+    previous = {(r["endpoint"], r["concurrency"]): r for r in baseline["runs"]}
+    regressions = []
+    for run in results["runs"]:
+        before = previous.get((run["endpoint"], run["concurrency"]))
+        if before is None:
+            continue
+        where = f"{run['endpoint']} @ concurrency {run['concurrency']}"
+        if run["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{where}: throughput {before['throughput_rps']} -> {run['throughput_rps']} req/s")
+        for intent, stats in run["latency"].items():
+            old = before["latency"].get(intent, {})
+            if stats.get("p95") and old.get("p95") and stats["p95"] > old["p95"] * (1 + tolerance):
+                regressions.append(f"{where} [{intent}]: p95 {old['p95']}s -> {stats['p95']}s")
+    return regressions
+
+
+async def run(args) -> dict:
+    import httpx
+
+    import fakes
+    import main
+
+    fakes.install(
+        main,
+        llm_seconds=args.llm_ms / 1000,
+        token_seconds=args.token_ms / 1000,
+        vector_seconds=args.vector_ms / 1000,
+        rpc_seconds=args.rpc_ms / 1000,
+    )
+    main.response_cache.enabled = args.response_cache
+
+    runs = []
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=300) as client:
+        for endpoint in args.endpoints:
+            for concurrency in args.concurrency:
+                result = await run_level(main, client, endpoint, concurrency, args.requests)
+                print(
+                    f"{endpoint:<18} concurrency={concurrency:<4} {result['throughput_rps']:>8.2f} req/s  "
+                    f"p50={result['latency']['all'].get('p50')}s p95={result['latency']['all'].get('p95')}s "
+                    f"p99={result['latency']['all'].get('p99')}s errors={result['errors']}",
+                    file=sys.stderr,
+                )
+                runs.append(result)
+
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "runs": runs,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=64, help="requests per endpoint and concurrency level")
+    parser.add_argument("--endpoints", nargs="+", default=list(ENDPOINTS), choices=ENDPOINTS)
+    parser.add_argument("--llm-ms", type=float, default=300, help="time to first token of each LLM call")
+    parser.add_argument("--token-ms", type=float, default=15, help="delay between streamed chunks")
+    parser.add_argument("--vector-ms", type=float, default=50)
+    parser.add_argument("--rpc-ms", type=float, default=100)
+    parser.add_argument("--response-cache", action="store_true", help="keep the semantic response cache on")
+    parser.add_argument("--speculative", action="store_true", help="prefetch positions/retrieval alongside the first LLM call")
+    parser.add_argument("--intent-router", action="store_true", help="route obvious queries without the tool-selection LLM call")
+    parser.add_argument("--output", default="load_test.json")
+    parser.add_argument("--baseline", help="earlier result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+    if args.speculative:
+        os.environ["SPECULATIVE_PREFETCH"] = os.environ["SPECULATIVE_RETRIEVAL"] = "True"
+    if args.intent_router:
+        os.environ["INTENT_ROUTER_ENABLED"] = "True"
+
+    results = asyncio.run(run(args))
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=4)
+    print(f"Saved results to {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,216 @@
+import json
+import os
+import threading
+import uuid
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from config import LOCAL_INDEX_PATH
+
+
+def _matches(metadata: dict, filter: dict) -> bool:
+    """Evaluate a Pinecone-style metadata filter ($eq/$ne/$in/$nin/$gt/$gte/$lt/$lte)."""
+    for key, condition in filter.items():
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, target in condition.items():
+            if op == "$eq" and value != target:
+                return False
+            if op == "$ne" and value == target:
+                return False
+            if op == "$in" and value not in target:
+                return False
+            if op == "$nin" and value in target:
+                return False
+            if op in ("$gt", "$gte", "$lt", "$lte"):
+                if value is None:
+                    return False
+                if op == "$gt" and not value > target:
+                    return False
+                if op == "$gte" and not value >= target:
+                    return False
+                if op == "$lt" and not value < target:
+                    return False
+                if op == "$lte" and not value <= target:
+                    return False
+    return True
+
+
+def _file_version(path: str):
+    # Every save replaces the file, so the inode changes even within one mtime tick
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_ino, st.st_size
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector index for small catalogs.
+
+    Embeddings are L2-normalized and kept in one contiguous float32 matrix, so cosine
+    top-k is a single matrix-vector product. When `path` is set the index is persisted
+    as `<path>.npy` + `<path>.json` and loaded memory-mapped; the files are re-read
+    whenever another process (e.g. ingestion.py) rewrites them.
+    """
+
+    def __init__(self, embedding, path: str = LOCAL_INDEX_PATH, mmap: bool = True):
+        self._embedding = embedding
+        self.path = path
+        self.mmap = mmap
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._records = []  # [{"id", "text", "metadata"}], row-aligned with _matrix
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._maybe_reload()
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    def __len__(self):
+        self._maybe_reload()
+        return len(self._records)
+
+    def _files(self):
+        return self.path + ".npy", self.path + ".json"
+
+    def _maybe_reload(self):
+        if not self.path:
+            return
+        matrix_path, records_path = self._files()
+        try:
+            mtime = _file_version(records_path)
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            with open(records_path, "r") as f:
+                records = json.load(f)
+            if records:
+                matrix = np.load(matrix_path, mmap_mode="r" if self.mmap else None)
+            else:
+                matrix = np.zeros((0, 0), dtype=np.float32)
+            self._matrix, self._records, self._mtime = matrix, records, mtime
+
+    def save(self):
+        if not self.path:
+            return
+        matrix_path, records_path = self._files()
+        # Write the matrix first: readers reload when the records file changes
+        with open(matrix_path + ".tmp", "wb") as f:
+            np.save(f, np.ascontiguousarray(self._matrix, dtype=np.float32))
+        os.replace(matrix_path + ".tmp", matrix_path)
+        with open(records_path + ".tmp", "w") as f:
+            json.dump(self._records, f)
+        os.replace(records_path + ".tmp", records_path)
+        self._mtime = _file_version(records_path)
+
+    def add_vectors(self, vectors, texts, metadatas=None, ids=None, save=True):
+        """Insert or replace (by id) pre-computed embeddings. Pass save=False to batch writes and call save() once."""
+        self._maybe_reload()
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = [id or str(uuid.uuid4()) for id in (ids or [None] * len(texts))]
+
+        with self._lock:
+            matrix = np.array(self._matrix, dtype=np.float32)
+            if matrix.size == 0:
+                matrix = np.zeros((0, vectors.shape[1]), dtype=np.float32)
+            records = list(self._records)
+            row_by_id = {record["id"]: row for row, record in enumerate(records)}
+
+            new_rows = []
+            for vector, text, metadata, id in zip(vectors, texts, metadatas, ids):
+                record = {"id": id, "text": text, "metadata": metadata}
+                if id in row_by_id:
+                    matrix[row_by_id[id]] = vector
+                    records[row_by_id[id]] = record
+                else:
+                    row_by_id[id] = len(records)
+                    records.append(record)
+                    new_rows.append(vector)
+            if new_rows:
+                matrix = np.vstack([matrix, np.stack(new_rows)])
+            self._matrix, self._records = matrix, records
+            if save:
+                self.save()
+        return list(ids)
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        vectors = self._embedding.embed_documents(texts)
+        return self.add_vectors(vectors, texts, metadatas, ids)
+
+    def delete(self, ids=None, delete_all=None, save=True, **kwargs):
+        self._maybe_reload()
+        with self._lock:
+            if delete_all:
+                keep = []
+            else:
+                ids = set(ids or [])
+                keep = [row for row, record in enumerate(self._records) if record["id"] not in ids]
+            if keep:
+                self._matrix = np.array(self._matrix, dtype=np.float32)[keep]
+            else:
+                self._matrix = np.zeros((0, 0), dtype=np.float32)
+            self._records = [self._records[row] for row in keep]
+            if save:
+                self.save()
+        return True
+
+    def similarity_search_by_vector_with_score(self, embedding, *, k=4, filter=None, **kwargs):
+        self._maybe_reload()
+        matrix, records = self._matrix, self._records
+        if not records:
+            return []
+
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        scores = matrix @ (query / norm if norm else query)
+        if filter:
+            mask = np.fromiter(
+                (_matches(record["metadata"], filter) for record in records),
+                dtype=bool,
+                count=len(records),
+            )
+            scores = np.where(mask, scores, -np.inf)
+            k = min(k, int(mask.sum()))
+        k = min(k, len(records))
+        if k <= 0:
+            return []
+
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (
+                Document(
+                    id=records[row]["id"],
+                    page_content=records[row]["text"],
+                    metadata=dict(records[row]["metadata"]),
+                ),
+                float(scores[row]),
+            )
+            for row in top
+        ]
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        return [
+            doc
+            for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter)
+        ]
+
+    def similarity_search(self, query, k=4, filter=None, **kwargs):
+        return self.similarity_search_by_vector(
+            self._embedding.embed_query(query), k=k, filter=filter
+        )
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, path="", **kwargs):
+        store = cls(embedding, path=path)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
@@ -1,62 +1,137 @@
+import time
+
+# Measured from the very first import so /ready can report import and time-to-ready
+STARTUP = {"started": time.perf_counter(), "import_seconds": None, "ready_seconds": None}
+
+import asyncio
 import getpass
+import importlib
 import os
-from vector_store import ProtocolsVectorStore
+import uuid
+from contextlib import asynccontextmanager
 
 from langgraph.graph import MessagesState, StateGraph
 from langchain_core.tools import tool
 
-from langchain_core.messages import SystemMessage
+from langchain_core.messages import AIMessage, SystemMessage
 from langgraph.prebuilt import ToolNode
 from langgraph.graph import END
 from langgraph.prebuilt import ToolNode, tools_condition
+from langgraph.prebuilt.tool_node import TOOL_CALL_ERROR_TEMPLATE
 from collections import defaultdict
-from langgraph.checkpoint.memory import MemorySaver
+from checkpointer import build_checkpointer
+from conversation import ZERO_ADDRESS, is_anonymous_thread, thread_id_for, trim_history
 
 import re
 import json
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 import uvicorn
-from check_user_position import query_all_positions
+from catalog import catalog_version
+from coalescing import SingleFlight
+from config import (
+    CHECKPOINT_BACKEND,
+    POSITIONS_BATCH_MAX_ADDRESSES,
+    RETRIEVAL_LIMIT,
+    SPECULATIVE_PREFETCH,
+    SPECULATIVE_RETRIEVAL,
+    WORKERS,
+)
+from embedding_cache import normalize_query
+from fast_path import detect_position_intent, render_position_response
+from intent_router import IntentRouter
+import admission
+import metrics
+import prefetch
+from lazy import Lazy, readiness, warm_up
+from prompt_builder import build_prompt, format_positions, format_strategies, get_encoding
+from response_cache import CACHEABLE_TYPES, SemanticResponseCache, is_cacheable_query, query_fingerprint
+from streaming_json import JsonFieldStreamer
+from strategy_monitor import monitor
+from strategy_registry import registry
+from structured_index import LIVE_METRIC_FIELDS, record_to_document
 
 
 if not os.environ.get("OPENAI_API_KEY"):
     os.environ["OPENAI_API_KEY"] = getpass.getpass("Enter API key for OpenAI: ")
 
-from langchain.chat_models import init_chat_model
 
-llm = init_chat_model("gpt-4o-mini", model_provider="openai")
+def _build_llm():
+    from langchain.chat_models import init_chat_model
+
+    return init_chat_model("gpt-4o-mini", model_provider="openai")
+
+
+def _build_vector_store():
+    from vector_store import ProtocolsVectorStore
+
+    return ProtocolsVectorStore()
+
 
-vector_store = ProtocolsVectorStore()
+def _load_registry():
+    registry.current()  # first load; raises if the catalog is missing or invalid
+    return registry
 
-graph_builder = StateGraph(MessagesState)
+
+# Heavy components are built on first use, or in the background by the lifespan warm-up
+llm = Lazy("llm", _build_llm)
+vector_store = Lazy("vector_store", _build_vector_store)
+# Loaded once and hot-reloaded when the catalog file changes; take a snapshot per use
+strategy_registry = Lazy("strategy_registry", _load_registry)
+positions = Lazy("positions", lambda: importlib.import_module("check_user_position"))
+# May download the BPE file, so it is loaded by the warm-up rather than on the first prompt
+tokenizer = Lazy("tokenizer", get_encoding)
+
+
+async def _strategy_table():
+    """Current snapshot of the strategy catalog, with the latest polled APR/TVL merged in."""
+    return monitor.view((await strategy_registry.aget()).current())
+
+
+def _catalog_version() -> str:
+    # Ingested index, registry snapshot and live metrics, so any change invalidates cached answers
+    return f"{catalog_version()}/{registry.version}/{monitor.version}"
 
 
 @tool(response_format="content_and_artifact")
-def check_user_position(user_address: str):
+async def check_user_position(user_address: str):
     """
     Use this tool if a user wants to check or withdraw his/her DeFi positions, or claim his/her reward(e.g., staked tokens, balances, rewards).
     Returns (serialized_info, raw_positions).
     """
-    user_positions = query_all_positions(user_address)
-    serialized = "User Positions:\n" + "\n".join(str(pos) for pos in user_positions)
+    user_positions = await prefetch.take("positions", user_address.lower())
+    if user_positions is None:
+        user_positions = await (await positions.aget()).aquery_all_positions(user_address)
+    serialized = "User Positions:\n" + format_positions(user_positions)
     return serialized, user_positions
 
 
 @tool(response_format="content_and_artifact")
-def retrieve_defi_info(query: str):
+async def retrieve_defi_info(
+    query: str,
+    min_apr: float | None = None,
+    category: str | None = None,
+    staking_token: str | None = None,
+    sort_by: str | None = None,
+):
     """
     Use this tool to retrieve relevant DeFi investment strategy information
     from the vector store based on the user's query (e.g., desired APR,
     specific protocol name, or general DeFi strategies). 
     If user wants to stake specific token on a protocol, use this tool to fetch the strategy details.
 
+    Optional structured constraints narrow the results without a semantic search:
+    - min_apr: minimum APR in percent (e.g. 5 for "at least 5% APR").
+    - category: e.g. "Liquid Staking", "Lending", "Restaking", "Staking".
+    - staking_token: token symbol to stake, e.g. "WMOD".
+    - sort_by: "APR", "TVL" or "liquidity" for "highest ..." questions.
+
     When called, it performs a similarity search on the underlying vector
     database (vector_store) and returns:
 
-    1. A serialized text block (content) that includes metadata and a summary
-       of each retrieved document. This is useful for LLM responses where you
-       want to display or reason about the content in plain text.
+    1. A compact table (content) with one row per retrieved strategy and only
+       the fields needed to answer (ID, protocol, token, APR, TVL, ...).
 
     2. The raw document objects (artifact) themselves, allowing further
        programmatic inspection or specialized handling.
@@ -66,21 +141,54 @@ def retrieve_defi_info(query: str):
       use this tool to fetch relevant documents about stablecoin staking or
       lending protocols and then incorporate those details into your response.
     """
-    retrieved_docs = vector_store.similarity_search(query)
-    serialized = "\n\n".join(
-        (f"Source: {doc.metadata}\n" f"Content: {doc.page_content}")
-        for doc in retrieved_docs
-    )
+    table = await _strategy_table()
+    constraints = table.parse_constraints(query)
+    explicit = {"min_apr": min_apr, "category": category, "staking_token": staking_token, "sort_by": sort_by}
+    constraints.update({k: v for k, v in explicit.items() if v is not None})
+
+    # Pre-filter and rank on the structured fields; only fall back to semantic ranking
+    # when the constraints leave more candidates than we want to show, and to a plain
+    # semantic search when they match nothing (likely a misparse rather than a real filter).
+    candidates = table.query(**constraints) if constraints else []
+    if candidates:
+        if len(candidates) > RETRIEVAL_LIMIT and "sort_by" not in constraints:
+            candidate_ids = [str(r["strategyID"]) for r in candidates]
+            ranked = await (await vector_store.aget()).asimilarity_search(
+                query, k=RETRIEVAL_LIMIT, filter={"strategyID": {"$in": candidate_ids}}
+            )
+            if ranked:
+                candidates = [
+                    table.records[table.row_by_strategy_id[doc.metadata["strategyID"]]]
+                    for doc in ranked
+                    if doc.metadata.get("strategyID") in table.row_by_strategy_id
+                ]
+        retrieved_docs = [record_to_document(r) for r in candidates[:RETRIEVAL_LIMIT]]
+    else:
+        retrieved_docs = await prefetch.take("retrieval", normalize_query(query))
+        if retrieved_docs is None:
+            retrieved_docs = await (await vector_store.aget()).asimilarity_search(query)
+    serialized = format_strategies(retrieved_docs, table)
     return serialized, retrieved_docs
 
 
 # Step 1: Generate an AIMessage that may include a tool-call to be sent.
-def query_or_respond(state: MessagesState):
+async def query_or_respond(state: MessagesState):
     """Generate tool call for tool-calling or respond."""
     
+    # Obvious requests go straight to their tool without the tool-selection LLM call
+    last = state["messages"][-1]
+    if last.type == "human" and intent_router.enabled:
+        route = intent_router.route(
+            last.content, last.additional_kwargs.get("user_address"), await _strategy_table()
+        )
+        if route is not None:
+            print(f"intent router: {route['name']} ({route['method']}, confidence {route['confidence']})")
+            call = {"name": route["name"], "args": route["args"], "id": f"route_{uuid.uuid4().hex[:12]}", "type": "tool_call"}
+            return {"messages": [AIMessage(content="", tool_calls=[call])]}
+
     # Check user address
     user_context = None
-    for message in state["messages"]:
+    for message in reversed(state["messages"]):
         if hasattr(message, "additional_kwargs") and "user_address" in message.additional_kwargs:
             user_context = f"""
             Current user address: {message.additional_kwargs['user_address']}
@@ -89,11 +197,13 @@ def query_or_respond(state: MessagesState):
             """
             break
     
+    messages = trim_history(state["messages"])
     if user_context:
-        state["messages"].insert(0, SystemMessage(content=user_context))
+        messages.insert(0, SystemMessage(content=user_context))
     
-    llm_with_tools = llm.bind_tools([retrieve_defi_info, check_user_position])
-    response = llm_with_tools.invoke(state["messages"])
+    llm_with_tools = (await llm.aget()).bind_tools([retrieve_defi_info, check_user_position])
+    async with admission.limit("llm"):
+        response = await llm_with_tools.ainvoke(messages)
     
     # If LLM decide not to use tools, format the response as a JSON string and respond directly
     if response.tool_calls == []:
@@ -107,11 +217,18 @@ def query_or_respond(state: MessagesState):
     return {"messages": [response]}
 
 
+def _tool_error(e: Exception) -> str:
+    # Shedding must reach the client as a 429, not become a tool result the LLM answers from
+    if isinstance(e, admission.Overloaded):
+        raise e
+    return TOOL_CALL_ERROR_TEMPLATE.format(error=repr(e))
+
+
 # Step 2: Execute the retrieval.
-tools = ToolNode([retrieve_defi_info, check_user_position])
+tools = ToolNode([retrieve_defi_info, check_user_position], handle_tool_errors=_tool_error)
 
 # Step 3: Generate a response using the retrieved content.
-def generate(state: MessagesState):
+async def generate(state: MessagesState):
     """Generate answer."""
     # collect tool messages by tool name
     tool_messages_by_name = defaultdict(list)
@@ -121,76 +238,22 @@ def generate(state: MessagesState):
         else:
             break
 
-    # compose system prompts based on different tool messages
-    system_prompts = []
-
-    if "retrieve_defi_info" in tool_messages_by_name:
-        retrieve_contents = "\n\n".join(
-            m.content for m in tool_messages_by_name["retrieve_defi_info"]
-        )
-        system_prompts.append(
-            "You have retrieved some DeFi strategy info which we offer for users to stake or yield:\n"
-            f"{retrieve_contents}\n"
-            """Consider these strategies when answering the user's question.\n 
-            In this scenario, the type would be "EXECUTE_TRANSACTION"
-            """
-        )
-
-    if "check_user_position" in tool_messages_by_name:
-        pos_contents = "\n\n".join(
-            m.content for m in tool_messages_by_name["check_user_position"]
-        )
-        system_prompts.append(
-            "You have retrieved the user's staked position and pending reward details:\n"
-            f"{pos_contents}\n"
-            "When the user inquires about their staked tokens, summarize their positions concisely.\n"
-            "- If the user only wants to check their positions, set the response type to 'PURE_STRING_RESPONSE'.\n"
-            "- If the user intends to withdraw, set the response type to 'WITHDRAW_POSITION' and provide only the strategies where the user has deposited funds."
-            "- If the user intends to claim rewards, set the response type to 'CLAIM_REWARD' and provide only the strategies where the user has pending rewards."
-        )
-
-    # Combine system prompts
-    combined_system_prompt = (
-        "You are an assistant for DeFi yeild & staking related question-answering tasks.\n\n"
-        + "\n".join(system_prompts)
-    )
-    combined_system_prompt += (
-        "\n"
-        "Now provide a response accordingly. If you don't know the answer, say that you "
-        "don't know. Use three sentences maximum and keep the answer concise.\n"
-        """
-        I want your answer strictly follow this JSON format:
-            1. LLM_response: A concise answer for the user's question about yields or protocols. This is the response directly showing to the user.\n"
-            2. type: "EXECUTE_TRANSACTION" or "PURE_STRING_RESPONSE" or "WITHDRAW_POSITION" based on the information above.\n"
-            3. strategies: A list of strategies (Can be empty if not applicable), each with the following fields:
-                - label: A short name for the strategy.
-                - description: "A brief strategy description. If the type is EXECUTE_TRANSACTION, provide a recommended action for the user. If it is WITHDRAW_POSITION, provide withdrawal action along with the user's balances. If it is CLAIM_REWARD, specify the action for claiming rewards, including the pending reward balances.
-                - strategyID: The unique ID for the strategy.
-                - stakeToken: The token address for staking.
-
-            For example:
-            {{
-                "LLM_response": "Here are some staking protocols with at least 5% APR for you to consider: \n
-                    1. Earn 6% APR by staking in ether.fi, a non-custodial staking service.\n
-                    2. Earn 5% APR with Ethena, a stable LSD protocol for Ethereum collateral.\n",
-                "type": "EXECUTE_TRANSACTION",
-                "strategies": [
-                        {
-                            "label": "ether.fi",
-                            "description": "Earn 6% APR by staking in ether.fi, a non-custodial staking service.",
-                            "strategyID": 1,
-                            "stakeToken": "0x........"
-                        },
-                        {
-                            "label": "Ethena",
-                            "description": "Earn 5% APR with Ethena, a stable LSD protocol for Ethereum collateral.",
-                            "strategyID": 2,
-                            "stakeToken": "0x........""
-                        }
-                ]
-            }}
-        """
-    )
+    # Fast path: plain check/withdraw/claim questions are rendered from the positions
+    # themselves, skipping the second LLM call. Anything ambiguous falls through.
+    if set(tool_messages_by_name) == {"check_user_position"}:
+        question = next((m.content for m in reversed(state["messages"]) if m.type == "human"), "")
+        intent = detect_position_intent(question)
+        position_message = tool_messages_by_name["check_user_position"][0]
+        if intent and position_message.artifact:
+            try:
+                response = render_position_response(
+                    intent, question, position_message.artifact, await _strategy_table()
+                )
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"Error rendering position response, falling back to LLM: {str(e)}")
+                response = None
+            if response:
+                return {"messages": [AIMessage(content=json.dumps(response))]}
 
     conversation_messages = [
         message
@@ -198,39 +261,79 @@ def generate(state: MessagesState):
         if message.type in ("human", "system")
         or (message.type == "ai" and not message.tool_calls)
     ]
-    prompt = [SystemMessage(combined_system_prompt)] + conversation_messages
+    prompt, prompt_tokens = build_prompt(
+        tool_messages_by_name, conversation_messages, await _strategy_table()
+    )
+    print(f"generate prompt: {prompt_tokens} tokens ({len(prompt)} messages)")
 
     # Run
-    response = llm.invoke(prompt)
+    async with admission.limit("llm"):
+        response = await (await llm.aget()).ainvoke(prompt)
     return {"messages": [response]}
 
 
-graph_builder.add_node(query_or_respond)
-graph_builder.add_node(tools)
-graph_builder.add_node(generate)
+def _build_graph():
+    graph_builder = StateGraph(MessagesState)
+    graph_builder.add_node(query_or_respond)
+    graph_builder.add_node(tools)
+    graph_builder.add_node(generate)
+
+    graph_builder.set_entry_point("query_or_respond")
+    graph_builder.add_conditional_edges(
+        "query_or_respond",
+        tools_condition,
+        {END: END, "tools": "tools"},
+    )
+    graph_builder.add_edge("tools", "generate")
+    graph_builder.add_edge("generate", END)
+    return graph_builder.compile(checkpointer=checkpointer)
 
-graph_builder.set_entry_point("query_or_respond")
-graph_builder.add_conditional_edges(
-    "query_or_respond",
-    tools_condition,
-    {END: END, "tools": "tools"},
-)
-graph_builder.add_edge("tools", "generate")
-graph_builder.add_edge("generate", END)
 
-graph = graph_builder.compile()
+# Per-thread conversation memory: bounded in-process, or shared by all workers (CHECKPOINT_BACKEND)
+checkpointer = build_checkpointer()
+graph = Lazy("graph", _build_graph)
+# Answers to address-independent catalog questions, reused across users
+response_cache = SemanticResponseCache()
+# Routes obvious queries to their tool locally (INTENT_ROUTER_ENABLED)
+intent_router = IntentRouter()
+# Identical address-independent questions in flight share one graph run
+identical_requests = SingleFlight()
 
-# Specify an ID for the thread
-config = {"configurable": {"thread_id": "abc123"}}
 
 # --- FastAPI Backend ---
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm components in the background so the server accepts connections right away
+    async def warm():
+        if await warm_up():
+            STARTUP["ready_seconds"] = time.perf_counter() - STARTUP["started"]
+            print(f"Ready in {STARTUP['ready_seconds']:.2f}s")
+
+    task = asyncio.create_task(warm())
+    monitor.start()
+    yield
+    monitor.stop()
+    task.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.exception_handler(admission.Overloaded)
+async def overloaded(request, e: admission.Overloaded):
+    return JSONResponse({"detail": str(e)}, status_code=429, headers={"Retry-After": str(e.retry_after)})
 
 
 # Data type of Request and Response
 class RequestBody(BaseModel):
     userInput: str
     userAddress: str = "0x0000000000000000000000000000000000000000"  # 預設地址
+    sessionId: str | None = None
+
+
+class PositionsBatchRequest(BaseModel):
+    addresses: list[str]
+    block: int | None = None  # defaults to the current head
 
 
 class Strategy(BaseModel):
@@ -250,23 +353,237 @@ class ResponseBody(BaseModel):
 async def root():
     return "Hello World! This is the root endpoint."
 
-@app.post("/userQuery", response_model=ResponseBody)
-async def userQuery(request: RequestBody):
+@app.get("/ready")
+async def ready():
+    components = readiness()
+    body = {
+        "ready": all(c["ready"] for c in components.values()),
+        "components": components,
+        "import_seconds": STARTUP["import_seconds"],
+        "ready_seconds": STARTUP["ready_seconds"],
+    }
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+@app.get("/memoryStats")
+async def memoryStats():
+    # The SQLite backend queries the database
+    return await asyncio.to_thread(checkpointer.stats)
+
+@app.get("/cacheStats")
+async def cacheStats():
+    return {
+        "retrieval": vector_store.get().cache_stats() if vector_store.ready else None,
+        "positions": positions.get().position_cache.stats() if positions.ready else None,
+        "responses": response_cache.stats(),
+        "prefetch": prefetch.stats(),
+        "strategies": registry.stats(),
+        "strategy_metrics": monitor.stats(),
+        "router": intent_router.stats(),
+    }
+
+
+@app.get("/strategyMetrics")
+async def strategyMetrics():
+    """Current APR/TVL/liquidity per strategy and how long ago each was polled."""
+    table = await _strategy_table()
+    staleness = monitor.staleness()
+    return {
+        "source": monitor.source.name if monitor.enabled else None,
+        "strategies": {
+            record["strategyID"]: {
+                **{field: record.get(field) for field in LIVE_METRIC_FIELDS},
+                **staleness.get(record["strategyID"], {}),
+            }
+            for record in table.records
+        },
+    }
+
+
+@app.get("/admissionStats")
+async def admissionStats():
+    """Per-backend slots in use, queue depth and wait time, plus coalesced duplicate requests."""
+    return {
+        "backends": admission.stats(),
+        "coalescing": {"in_flight": len(identical_requests), "coalesced": identical_requests.coalesced},
+    }
+
+
+@app.get("/metrics")
+async def metricsEndpoint():
+    """Prometheus text exposition of stage latencies, token counts and cache hit/miss counters."""
+    return PlainTextResponse(metrics.render(await cacheStats()), media_type="text/plain; version=0.0.4")
+
+def _graph_input(request: RequestBody):
     # init user message
     user_message = {
         "role": "user", 
         "content": request.userInput,
         "additional_kwargs": {"user_address": request.userAddress}
     }
+    config = {
+        "configurable": {"thread_id": thread_id_for(request.userAddress, request.sessionId)},
+        "callbacks": metrics.callbacks(),
+    }
+    return {"messages": [user_message]}, config
+
+
+async def _answer_from_cache(request: RequestBody, inputs, config):
+    """
+    Look the question up in the response cache. Returns (cache key, cached response);
+    the key is None for questions that can't be cached. A hit is still recorded in the
+    conversation history, without running the graph.
+    """
+    if not response_cache.enabled or not is_cacheable_query(request.userInput):
+        return None, None
+    try:
+        embedding = await (await vector_store.aget()).aembed_query(request.userInput)
+        key = (embedding, query_fingerprint(request.userInput, await _strategy_table()), _catalog_version())
+    except Exception as e:
+        print(f"Error computing response cache key: {str(e)}")
+        return None, None
+
+    cached = response_cache.lookup(*key)
+    if cached is not None:
+        await _record_answer(inputs, config, cached)
+    return key, cached
+
+
+async def _record_answer(inputs, config, response: dict) -> None:
+    """Add a turn answered without running the graph to the conversation history."""
+    if is_anonymous_thread(config["configurable"]["thread_id"]):
+        return
+    await (await graph.aget()).aupdate_state(
+        config,
+        {"messages": inputs["messages"] + [AIMessage(content=json.dumps(response))]},
+        as_node="generate",
+    )
+
+
+def _forget_anonymous(config) -> None:
+    """
+    Delete a throwaway anonymous thread once its request is done, so it doesn't take a
+    checkpointer slot (or SQLite rows) from users whose history can be read again. Runs
+    in the background: it must also work while a disconnected stream is being closed.
+    """
+    thread_id = config["configurable"]["thread_id"]
+    if is_anonymous_thread(thread_id):
+        asyncio.get_running_loop().run_in_executor(None, checkpointer.delete_thread, thread_id)
+
+
+class _LeaderGone(Exception):
+    """The request whose graph run was being shared ended before producing an answer."""
+
+
+def _coalescing_key(request: RequestBody):
+    """Key shared by literally identical address-independent questions, else None."""
+    if not is_cacheable_query(request.userInput):
+        return None
+    return normalize_query(request.userInput), _catalog_version()
+
+
+def _store_response(key, messages, response: dict) -> None:
+    """Cache the answer if this turn only consulted the strategy catalog."""
+    if key is None or response.get("type") not in CACHEABLE_TYPES:
+        return
+    tools_used = set()
+    for message in reversed(messages):
+        if message.type == "human":
+            break
+        if message.type == "tool":
+            tools_used.add(message.name)
+    if tools_used == {"retrieve_defi_info"}:
+        response_cache.store(*key, response)
+
+
+def _speculate(request: RequestBody) -> prefetch.Speculation:
+    """
+    Start the fetches the tools will probably need while the first LLM call runs:
+    the user's positions when an address is set, and (optionally) the vector search
+    for catalog questions that the structured index won't answer on its own.
+    """
+    speculation = prefetch.Speculation()
+    address = request.userAddress.lower()
+    if SPECULATIVE_PREFETCH and address and address != ZERO_ADDRESS:
+        speculation.start(
+            "positions",
+            address,
+            lambda: _prefetch_positions(request.userAddress),
+        )
+    if (
+        SPECULATIVE_RETRIEVAL
+        and strategy_registry.ready
+        and is_cacheable_query(request.userInput)
+        and not registry.current().parse_constraints(request.userInput)
+    ):
+        speculation.start(
+            "retrieval",
+            normalize_query(request.userInput),
+            lambda: _prefetch_retrieval(request.userInput),
+        )
+    return speculation
+
+
+async def _prefetch_positions(user_address: str):
+    return await (await positions.aget()).aquery_all_positions(user_address)
+
+
+async def _prefetch_retrieval(query: str):
+    return await (await vector_store.aget()).asimilarity_search(query)
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/userQuery", response_model=ResponseBody)
+async def userQuery(request: RequestBody):
+    with metrics.request_trace("/userQuery"):
+        return await _run_user_query(request)
+
+
+async def _run_user_query(request: RequestBody):
+    inputs, config = _graph_input(request)
+    try:
+        return await _answer_user_query(request, inputs, config)
+    finally:
+        _forget_anonymous(config)
+
+
+async def _answer_user_query(request: RequestBody, inputs, config):
+    cache_key, cached = await _answer_from_cache(request, inputs, config)
+    if cached is not None:
+        return ResponseBody(**cached)
+
+    key = _coalescing_key(request)
+    if key is None:
+        return await _run_graph(request, inputs, config, cache_key)
+    leader = False
+
+    async def run():
+        nonlocal leader
+        leader = True
+        return await _run_graph(request, inputs, config, cache_key)
+
+    try:
+        response = await identical_requests.run(key, run)
+    except _LeaderGone:
+        return await _run_graph(request, inputs, config, cache_key)
+    if not leader:
+        await _record_answer(inputs, config, response.model_dump())
+    return response
+
+
+async def _run_graph(request: RequestBody, inputs, config, cache_key):
     final_message = None
     
     # Run the graph
-    for step in graph.stream(
-        {"messages": [user_message]},
-        stream_mode="values",
-        config=config,
-    ):
-        final_message = step["messages"][-1]
+    with _speculate(request):
+        async for step in (await graph.aget()).astream(
+            inputs,
+            stream_mode="values",
+            config=config,
+        ):
+            final_message = step["messages"][-1]
     
     if final_message is None:
         raise HTTPException(status_code=500, detail="No response from LLM.")
@@ -274,13 +591,157 @@ async def userQuery(request: RequestBody):
     try:
         # Parse the JSON response
         response_dict = json.loads(final_message.content)
-        return ResponseBody(**response_dict)
+        response = ResponseBody(**response_dict)
     except json.JSONDecodeError as e:
         raise HTTPException(status_code=500, detail=f"Invalid JSON response from LLM: {str(e)}")
+    _store_response(cache_key, step["messages"], response.model_dump())
+    return response
+
+
+@app.post("/userQuery/stream")
+async def userQueryStream(request: RequestBody):
+    """
+    Server-Sent Events variant of /userQuery. Emits `tool_start`/`tool_end` progress
+    events, `token` events with the LLM_response text as it is generated, a `final`
+    event with the validated ResponseBody (or `error`), and a closing `done` event
+    with time-to-first-token and total time.
+    """
+    inputs, config = _graph_input(request)
+
+    async def events():
+        started = time.perf_counter()
+        first_token_at = None
+        streamer = JsonFieldStreamer("LLM_response")
+        key = _coalescing_key(request)
+        shared = None  # set while other requests wait for this stream's answer
+        try:
+            cache_key, cached = await _answer_from_cache(request, inputs, config)
+            if cached is None and key is not None and key in identical_requests:
+                # The same question is already being answered for someone else; share it
+                try:
+                    cached = (await identical_requests.run(key, lambda: _run_graph(request, inputs, config, cache_key))).model_dump()
+                    await _record_answer(inputs, config, cached)
+                except _LeaderGone:
+                    pass
+            if cached is not None:
+                first_token_at = time.perf_counter()
+                yield _sse("token", {"text": cached["LLM_response"]})
+                yield _sse("final", cached)
+                yield _sse("done", {"time_to_first_token": first_token_at - started, "total_seconds": time.perf_counter() - started, "cached": True})
+                return
+            if key is not None:
+                shared = identical_requests.lead(key)
+
+            compiled = await graph.aget()
+            with _speculate(request):
+                async for event in compiled.astream_events(inputs, config=config, version="v2"):
+                    kind = event["event"]
+                    node = event.get("metadata", {}).get("langgraph_node")
+                    if kind == "on_tool_start":
+                        yield _sse("tool_start", {"name": event["name"], "args": event["data"].get("input")})
+                    elif kind == "on_tool_end":
+                        yield _sse("tool_end", {"name": event["name"]})
+                    elif kind == "on_tool_error":
+                        yield _sse("tool_end", {"name": event["name"], "error": str(event["data"].get("error"))})
+                    elif kind == "on_chat_model_stream":
+                        chunk = event["data"]["chunk"]
+                        content = chunk.content if isinstance(chunk.content, str) else ""
+                        text = ""
+                        if node == "generate":
+                            # generate answers in JSON; only stream the LLM_response string
+                            text = streamer.feed(content)
+                        elif node == "query_or_respond" and not chunk.tool_call_chunks:
+                            # A direct answer's content becomes LLM_response as-is
+                            text = content
+                        if text:
+                            first_token_at = first_token_at or time.perf_counter()
+                            yield _sse("token", {"text": text})
+
+            state = await compiled.aget_state(config)
+            final_message = state.values["messages"][-1]
+            response = ResponseBody(**json.loads(final_message.content))
+            if first_token_at is None:
+                # Answered without streaming an LLM (e.g. the position fast path)
+                first_token_at = time.perf_counter()
+                yield _sse("token", {"text": response.LLM_response})
+            _store_response(cache_key, state.values["messages"], response.model_dump())
+            if shared is not None:
+                shared.set_result(response)
+            yield _sse("final", response.model_dump())
+        except admission.Overloaded as e:
+            if shared is not None and not shared.done():
+                shared.set_exception(e)
+            yield _sse("error", {"detail": str(e), "status": 429, "retry_after": e.retry_after})
+        except Exception as e:
+            if shared is not None and not shared.done():
+                shared.set_exception(e)
+            yield _sse("error", {"detail": str(e)})
+        finally:
+            if shared is not None and not shared.done():
+                shared.set_exception(_LeaderGone())  # e.g. the client disconnected mid-stream
+            _forget_anonymous(config)
+
+        yield _sse(
+            "done",
+            {
+                "time_to_first_token": first_token_at - started if first_token_at else None,
+                "total_seconds": time.perf_counter() - started,
+            },
+        )
+
+    async def traced_events():
+        with metrics.request_trace("/userQuery/stream"):
+            async for message in events():
+                yield message
+
+    return StreamingResponse(traced_events(), media_type="text/event-stream")
+
+
+@app.post("/positions/batch")
+async def positionsBatch(request: PositionsBatchRequest):
+    """
+    Positions for many wallets as NDJSON, one line per address in completion order
+    ({"index", "address", "block", "positions"} or {"index", "address", "error"}).
+    All reads are pinned to the same block.
+    """
+    if len(request.addresses) > POSITIONS_BATCH_MAX_ADDRESSES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {POSITIONS_BATCH_MAX_ADDRESSES} addresses per request.",
+        )
+    module = await positions.aget()
+    block = request.block
+    if block is None:
+        # Resolved before streaming starts, so an RPC failure is still a proper error status
+        try:
+            block = await module._aget_block_number()
+        except admission.Overloaded:
+            raise
+        except Exception as e:
+            print(f"Error reading block number: {str(e)}")
+            raise HTTPException(status_code=502, detail=f"Error reading block number: {str(e)}")
+
+    async def lines():
+        try:
+            async for row in module.aquery_positions_batch(request.addresses, block_identifier=block):
+                yield json.dumps(row) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": str(e)}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+STARTUP["import_seconds"] = time.perf_counter() - STARTUP["started"]
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    if WORKERS > 1:
+        if CHECKPOINT_BACKEND == "memory":
+            raise SystemExit("WORKERS > 1 needs a shared checkpointer, e.g. CHECKPOINT_BACKEND=sqlite")
+        # Each worker process imports main:app on its own
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=WORKERS)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
 
     # input_message = "Recommend some staking protocols for me, at least 5% APR."
     # final_message = None
@@ -0,0 +1,287 @@
+"""
+Minimal Prometheus-style metrics (counters and histograms rendered in the text
+exposition format) plus optional per-request trace logs.
+
+    with metrics.timer("rpc", "aggregate3"):
+        ...
+
+When METRICS_ENABLED is off, `timer` returns a shared no-op context manager and
+nothing is recorded.
+"""
+import contextvars
+import json
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from config import METRICS_ENABLED, TRACE_REQUESTS
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+GRAPH_NODES = ("query_or_respond", "tools", "generate")
+
+# Spans of the request being handled (None when tracing is off)
+_trace = contextvars.ContextVar("trace", default=None)
+_NOOP = nullcontext()
+
+
+def _label_key(labels: dict):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(key)} {value}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self._series = {}  # label key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for key, series in sorted(self._series.items()):
+            for bound, count in zip(self.buckets, series):
+                yield f"{self.name}_bucket{_format_labels(key, [('le', bound)])} {count}"
+            yield f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {series[-1]}"
+            yield f"{self.name}_sum{_format_labels(key)} {series[-2]}"
+            yield f"{self.name}_count{_format_labels(key)} {series[-1]}"
+
+
+class Gauge:
+    """Current values read from `collect()` ({label key: value}) at render time."""
+
+    def __init__(self, name: str, help: str, collect):
+        self.name = name
+        self.help = help
+        self.collect = collect
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        for key, value in sorted(self.collect().items()):
+            yield f"{self.name}{_format_labels(key)} {value}"
+
+
+STAGE_SECONDS = Histogram("defi_stage_seconds", "Latency of each pipeline stage (graph node, tool, RPC, embedding, vector search).")
+REQUEST_SECONDS = Histogram("defi_request_seconds", "End-to-end request latency per endpoint.")
+LLM_TOKENS = Counter("defi_llm_tokens_total", "LLM tokens per graph node and direction.")
+LLM_CALLS = Counter("defi_llm_calls_total", "LLM calls per graph node.")
+ERRORS = Counter("defi_stage_errors_total", "Failed pipeline stages.")
+PREFETCH = Counter("defi_prefetch_total", "Speculative fetches per kind and outcome (started, used, wasted, cancelled, failed).")
+ROUTER = Counter("defi_router_total", "Intent router decisions per tool and method (keyword, classifier, fallback).")
+ADMISSION_WAIT = Histogram("defi_admission_wait_seconds", "Time spent queued for a backend slot (LLM, embeddings, RPC).")
+ADMISSION_SHED = Counter("defi_admission_shed_total", "Calls rejected by admission control per backend and reason (queue_full, timeout).")
+_REGISTRY = [STAGE_SECONDS, REQUEST_SECONDS, LLM_TOKENS, LLM_CALLS, ERRORS, PREFETCH, ROUTER, ADMISSION_WAIT, ADMISSION_SHED]
+
+
+def register(metric) -> None:
+    """Add a metric defined elsewhere (e.g. a Gauge over another module's state) to /metrics."""
+    _REGISTRY.append(metric)
+
+
+def observe(stage: str, name: str, seconds: float, error: bool = False) -> None:
+    STAGE_SECONDS.observe(seconds, stage=stage, name=name)
+    if error:
+        ERRORS.inc(stage=stage, name=name)
+    spans = _trace.get()
+    if spans is not None:
+        spans.append({"stage": stage, "name": name, "ms": round(seconds * 1000, 2), **({"error": True} if error else {})})
+
+
+class _Timer:
+    __slots__ = ("stage", "name", "started")
+
+    def __init__(self, stage, name):
+        self.stage = stage
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.stage, self.name, time.perf_counter() - self.started, error=exc_type is not None)
+        return False
+
+
+def timer(stage: str, name: str):
+    """Context manager timing one call of `stage` (e.g. "rpc", "embedding", "vector")."""
+    if not METRICS_ENABLED:
+        return _NOOP
+    return _Timer(stage, name)
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    Records graph node, tool and LLM timings plus token usage from LangChain callbacks.
+    Pass it in the graph run's config: {"callbacks": [metrics_handler]}.
+    """
+
+    run_inline = True  # cheap bookkeeping; no need for a thread hop in async runs
+
+    def __init__(self):
+        self._started = {}
+
+    def _start(self, run_id, stage, name):
+        self._started[run_id] = (stage, name, time.perf_counter())
+
+    def _end(self, run_id, error=False):
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            stage, name, t0 = started
+            observe(stage, name, time.perf_counter() - t0, error=error)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, name=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        if node in GRAPH_NODES and name == node:
+            self._start(run_id, "node", node)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=True)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, name=None, **kwargs):
+        self._start(run_id, "tool", name or (serialized or {}).get("name", "unknown"))
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=True)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, "llm", (metadata or {}).get("langgraph_node", "unknown"))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        started = self._started.get(run_id)
+        node = started[1] if started else "unknown"
+        self._end(run_id)
+        LLM_CALLS.inc(node=node)
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                if usage:
+                    LLM_TOKENS.inc(usage.get("input_tokens", 0), node=node, direction="in")
+                    LLM_TOKENS.inc(usage.get("output_tokens", 0), node=node, direction="out")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=True)
+
+
+handler = MetricsCallbackHandler()
+
+
+def callbacks() -> list:
+    """Callbacks to attach to a graph run (empty when metrics are off)."""
+    return [handler] if METRICS_ENABLED else []
+
+
+class request_trace:
+    """
+    Times a whole request and, with TRACE_REQUESTS on, collects every span recorded
+    while it runs and prints them as one JSON line when it finishes.
+    """
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.spans = [] if TRACE_REQUESTS else None
+        self._token = _trace.set(self.spans)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.started
+        try:
+            _trace.reset(self._token)
+        except ValueError:
+            pass  # closed from another context, e.g. a streaming client disconnected
+        if METRICS_ENABLED:
+            REQUEST_SECONDS.observe(seconds, endpoint=self.endpoint)
+        if self.spans is not None:
+            print(json.dumps({
+                "trace": uuid.uuid4().hex[:12],
+                "endpoint": self.endpoint,
+                "ms": round(seconds * 1000, 2),
+                "error": exc_type is not None,
+                "spans": self.spans,
+            }))
+        return False
+
+
+def _cache_lines(cache_stats: dict):
+    """Flatten the /cacheStats dict into hit/miss counters per cache."""
+    caches = {}
+
+    def collect(prefix, stats):
+        if not isinstance(stats, dict):
+            return
+        if "hits" in stats and "misses" in stats:
+            caches[prefix] = stats
+        for key, value in stats.items():
+            if isinstance(value, dict):
+                collect(f"{prefix}_{key}" if prefix else key, value)
+
+    collect("", cache_stats)
+    yield "# HELP defi_cache_hits_total Cache hits per cache."
+    yield "# TYPE defi_cache_hits_total counter"
+    for name, stats in caches.items():
+        yield f'defi_cache_hits_total{{cache="{name}"}} {stats["hits"]}'
+    yield "# HELP defi_cache_misses_total Cache misses per cache."
+    yield "# TYPE defi_cache_misses_total counter"
+    for name, stats in caches.items():
+        yield f'defi_cache_misses_total{{cache="{name}"}} {stats["misses"]}'
+
+
+def render(cache_stats: dict = None) -> str:
+    lines = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    if cache_stats:
+        lines.extend(_cache_lines(cache_stats))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,116 @@
+import time
+
+from coalescing import SingleFlight
+from config import BLOCK_NUMBER_TTL, POSITION_CACHE_ENABLED, POSITION_CACHE_TTL
+
+
+class IncompleteRead(Exception):
+    """A fetch's values with some reads defaulted to 0 after RPC errors: served, never cached."""
+
+    def __init__(self, values):
+        super().__init__("some position reads failed")
+        self.values = values
+
+
+class PositionCache:
+    """
+    Staked/pending values per (user, strategyId, block number).
+
+    A value read at block N is exact for as long as the chain head is N, so freshness is
+    decided by block height: the head is re-fetched at most every `block_ttl` seconds
+    (about one block time) and entries from older blocks are dropped as soon as it moves.
+    `ttl` additionally bounds how long any entry is served. Concurrent misses for the same
+    (user, block) share one in-flight read.
+    """
+
+    def __init__(
+        self,
+        get_block_number,
+        enabled: bool = POSITION_CACHE_ENABLED,
+        ttl: float = POSITION_CACHE_TTL,
+        block_ttl: float = BLOCK_NUMBER_TTL,
+    ):
+        self.get_block_number = get_block_number
+        self.enabled = enabled
+        self.ttl = ttl
+        self.block_ttl = block_ttl
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.incomplete = 0  # reads served but not cached because some calls failed
+        self._block = None  # (block_number, fetched_at)
+        self._entries = {}  # (user, strategyId) -> (staked, pending, fetched_at), all at self._entries_block
+        self._entries_block = None
+        self._flight = SingleFlight()
+
+    async def block_number(self) -> int:
+        now = time.monotonic()
+        if self._block is None or now - self._block[1] > self.block_ttl:
+            block = await self._flight.run("block_number", self.get_block_number)
+            self._block = (block, time.monotonic())
+        return self._block[0]
+
+    async def get(self, user: str, strategy_ids, fetch, fresh: bool = False):
+        """
+        Return {strategyId: (staked, pending)} for `user`.
+
+        `fetch(block_identifier, strategy_ids)` performs the actual read and must return
+        the same mapping, or raise IncompleteRead with it; it is called pinned to the
+        current block on a miss.
+        """
+        if fresh or not self.enabled:
+            self.bypassed += 1
+            return await self._uncached(fetch, "latest", strategy_ids)
+
+        try:
+            block = await self.block_number()
+        except Exception as e:
+            print(f"Error fetching block number, bypassing position cache: {str(e)}")
+            self.bypassed += 1
+            return await self._uncached(fetch, "latest", strategy_ids)
+
+        if block != self._entries_block:
+            self._entries = {}
+            self._entries_block = block
+
+        user = user.lower()
+        now = time.monotonic()
+        cached = {}
+        for strategy_id in strategy_ids:
+            entry = self._entries.get((user, strategy_id))
+            if entry is not None and now - entry[2] <= self.ttl:
+                cached[strategy_id] = entry[:2]
+        if len(cached) == len(strategy_ids):
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        try:
+            values = await self._flight.run((user, block), lambda: fetch(block, strategy_ids))
+        except IncompleteRead as e:
+            self.incomplete += 1
+            return e.values
+        if self._entries_block == block:
+            fetched_at = time.monotonic()
+            for strategy_id, (staked, pending) in values.items():
+                self._entries[(user, strategy_id)] = (staked, pending, fetched_at)
+        return values
+
+    async def _uncached(self, fetch, block_identifier, strategy_ids):
+        try:
+            return await fetch(block_identifier, strategy_ids)
+        except IncompleteRead as e:
+            self.incomplete += 1
+            return e.values
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "incomplete": self.incomplete,
+            "coalesced": self._flight.coalesced,
+            "entries": len(self._entries),
+            "block": self._entries_block,
+        }
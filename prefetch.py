@@ -0,0 +1,87 @@
+import asyncio
+import contextvars
+
+import metrics
+
+# Speculative fetches of the request being handled (None outside a request)
+_current = contextvars.ContextVar("speculation", default=None)
+
+_OUTCOMES = ("started", "used", "wasted", "cancelled", "failed")
+_stats = {outcome: {} for outcome in _OUTCOMES}
+
+
+def _count(kind: str, outcome: str) -> None:
+    _stats[outcome][kind] = _stats[outcome].get(kind, 0) + 1
+    if metrics.METRICS_ENABLED:
+        metrics.PREFETCH.inc(kind=kind, outcome=outcome)
+
+
+class Speculation:
+    """
+    Fetches started before we know whether the graph will need them, e.g. the user's
+    positions while the first LLM call is still deciding which tool to use. Tools
+    `take()` a result whose key matches their own arguments; whatever is left when the
+    request ends is cancelled and counted as wasted.
+
+        with Speculation() as speculation:
+            speculation.start("positions", address, fetch)
+            ...  # tools call prefetch.take("positions", address)
+    """
+
+    def __init__(self):
+        self._tasks = {}  # kind -> (key, task)
+
+    def start(self, kind: str, key, fn) -> None:
+        self._tasks[kind] = (key, asyncio.ensure_future(fn()))
+        _count(kind, "started")
+
+    async def take(self, kind: str, key):
+        """The prefetched result for `kind` if it was started for `key`, else None."""
+        entry = self._tasks.get(kind)
+        if entry is None or entry[0] != key:
+            return None
+        del self._tasks[kind]
+        try:
+            result = await entry[1]
+        except Exception as e:
+            print(f"Error in speculative {kind} fetch, fetching again: {str(e)}")
+            _count(kind, "failed")
+            return None
+        _count(kind, "used")
+        return result
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            pass  # closed from another context, e.g. a streaming client disconnected
+        for kind, (_, task) in self._tasks.items():
+            _count(kind, "wasted")
+            if not task.done():
+                task.cancel()
+                _count(kind, "cancelled")
+            elif not task.cancelled():
+                task.exception()  # mark a failure as retrieved
+        self._tasks.clear()
+        return False
+
+
+async def take(kind: str, key):
+    """Consume a speculative result of the current request, if there is a matching one."""
+    speculation = _current.get()
+    if speculation is None:
+        return None
+    return await speculation.take(kind, key)
+
+
+def stats() -> dict:
+    used = sum(_stats["used"].values())
+    wasted = sum(_stats["wasted"].values())
+    return {
+        **{outcome: dict(counts) for outcome, counts in _stats.items()},
+        "hit_rate": round(used / (used + wasted), 3) if used + wasted else None,
+    }
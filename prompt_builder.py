@@ -0,0 +1,171 @@
+import json
+from functools import lru_cache
+
+from langchain_core.messages import SystemMessage
+
+from config import PROMPT_MAX_TOKENS
+from conversation import count_tokens, trim_history
+
+# Columns handed to the LLM; everything else in a strategy record is left out
+STRATEGY_COLUMNS = (
+    "strategyID", "protocol", "category", "stakingToken", "stakingTokenAddress",
+    "APR", "TVL", "lockupPeriod", "keyDescription",
+)
+# Added only when some row has them (totalStaked comes from the on-chain metrics source)
+OPTIONAL_STRATEGY_COLUMNS = ("totalStaked",)
+POSITION_COLUMNS = ("strategyId", "protocol", "staking_token", "amount_staked", "reward_token", "pending_rewards")
+
+# Identical on every call and always sent first, so provider-side prompt caching can reuse it
+STATIC_PREFIX = """You are an assistant for DeFi yield & staking related question-answering tasks.
+Answer using only the context below. If you don't know the answer, say that you don't know. Use three sentences maximum and keep the answer concise.
+
+Strategies are given as a table of offered strategies for users to stake or yield; consider them when answering, and in this scenario the type is "EXECUTE_TRANSACTION".
+Positions are the user's staked amounts and pending rewards (strategies with nothing staked or pending are omitted). When the user inquires about their staked tokens, summarize their positions concisely:
+- If the user only wants to check their positions, the type is "PURE_STRING_RESPONSE".
+- If the user intends to withdraw, the type is "WITHDRAW_POSITION"; list only strategies where the user has deposited funds.
+- If the user intends to claim rewards, the type is "CLAIM_REWARD"; list only strategies where the user has pending rewards.
+
+Reply strictly in this JSON format:
+1. LLM_response: A concise answer for the user's question about yields or protocols. This is the response directly shown to the user.
+2. type: "EXECUTE_TRANSACTION", "PURE_STRING_RESPONSE", "WITHDRAW_POSITION" or "CLAIM_REWARD" based on the information above.
+3. strategies: A list of strategies (can be empty if not applicable), each with the following fields:
+    - label: A short name for the strategy.
+    - description: A brief strategy description. For EXECUTE_TRANSACTION, a recommended action for the user. For WITHDRAW_POSITION, the withdrawal action along with the user's balances. For CLAIM_REWARD, the claim action including the pending reward balances.
+    - strategyID: The unique ID for the strategy.
+    - stakeToken: The token address for staking.
+
+For example:
+{"LLM_response": "Here are some staking protocols with at least 5% APR for you to consider:\\n1. Earn 6% APR by staking in ether.fi, a non-custodial staking service.\\n2. Earn 5% APR with Ethena, a stable LSD protocol for Ethereum collateral.", "type": "EXECUTE_TRANSACTION", "strategies": [{"label": "ether.fi", "description": "Earn 6% APR by staking in ether.fi, a non-custodial staking service.", "strategyID": 1, "stakeToken": "0x..."}, {"label": "Ethena", "description": "Earn 5% APR with Ethena, a stable LSD protocol for Ethereum collateral.", "strategyID": 2, "stakeToken": "0x..."}]}"""
+
+STATIC_PREFIX_MESSAGE = SystemMessage(STATIC_PREFIX)
+
+
+@lru_cache(maxsize=1)
+def get_encoding():
+    """
+    The tiktoken encoding, loaded on first use rather than at import: it may download
+    the BPE file. None when tiktoken isn't installed or the file can't be fetched.
+    """
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        print(f"Error loading tiktoken encoding, estimating prompt tokens instead: {str(e)}")
+        return None
+
+
+def count_text_tokens(text: str) -> int:
+    """Exact token count with tiktoken when available, otherwise the ~4 chars/token estimate."""
+    encoding = get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return len(text) // 4
+
+
+def count_prompt_tokens(messages) -> int:
+    if get_encoding() is None:
+        return count_tokens(messages)
+    return sum(count_text_tokens(m.content if isinstance(m.content, str) else str(m.content)) + 4 for m in messages)
+
+
+def _cell(value) -> str:
+    if isinstance(value, float):
+        value = f"{value:.6f}".rstrip("0").rstrip(".")
+    return str(value).replace("|", "/").replace("\n", " ")
+
+
+def _table(columns, rows) -> str:
+    return "\n".join(["|".join(columns)] + ["|".join(_cell(row.get(c, "")) for c in columns) for row in rows])
+
+
+def _parse_page_content(text: str) -> dict:
+    """Inverse of structured_index.record_to_text for the flat fields we need."""
+    record = {}
+    for line in text.splitlines():
+        key, sep, value = line.partition(": ")
+        if sep:
+            record[key] = value
+    return record
+
+
+def strategy_rows(documents, strategy_table=None) -> list:
+    """Strategy records behind the retrieved documents, deduplicated by strategyID."""
+    rows, seen = [], set()
+    for doc in documents:
+        strategy_id = str(doc.metadata.get("strategyID", ""))
+        record = None
+        if strategy_table is not None and strategy_id in strategy_table.row_by_strategy_id:
+            record = strategy_table.records[strategy_table.row_by_strategy_id[strategy_id]]
+        if record is None:
+            record = _parse_page_content(doc.page_content)
+        key = str(record.get("strategyID", strategy_id)) or doc.page_content
+        if key in seen:
+            continue
+        seen.add(key)
+        rows.append(record)
+    return rows
+
+
+def position_rows(positions) -> list:
+    """Positions with something staked or pending; `positions` is the tool's JSON string or list."""
+    if isinstance(positions, str):
+        positions = json.loads(positions)
+    return [p for p in positions if p.get("amount_staked") or p.get("pending_rewards")]
+
+
+def _strategy_table(rows) -> str:
+    columns = STRATEGY_COLUMNS + tuple(c for c in OPTIONAL_STRATEGY_COLUMNS if any(c in row for row in rows))
+    return _table(columns, rows)
+
+
+def format_strategies(documents, strategy_table=None) -> str:
+    return _strategy_table(strategy_rows(documents, strategy_table))
+
+
+def format_positions(positions) -> str:
+    rows = position_rows(positions)
+    if not rows:
+        return "The user has nothing staked and no pending rewards."
+    return _table(POSITION_COLUMNS, rows)
+
+
+def _context_message(strategies, positions):
+    sections = []
+    if strategies:
+        sections.append("Strategies:\n" + _strategy_table(strategies))
+    if positions is not None:
+        sections.append(
+            "Positions:\n" + (_table(POSITION_COLUMNS, positions) if positions else "The user has nothing staked and no pending rewards.")
+        )
+    return SystemMessage("\n\n".join(sections)) if sections else None
+
+
+def build_prompt(tool_messages_by_name, conversation_messages, strategy_table=None, max_tokens: int = PROMPT_MAX_TOKENS):
+    """
+    Assemble the generate() prompt: the cached static prefix, a compact context message
+    built from the tools' artifacts, and as much recent conversation as fits the budget.
+    Strategies are dropped from the end (lowest ranked first) if the context alone is
+    over budget. Returns (messages, token_count).
+    """
+    strategies = []
+    for message in tool_messages_by_name.get("retrieve_defi_info", []):
+        strategies.extend(message.artifact or [])
+    strategies = strategy_rows(strategies, strategy_table)
+
+    positions = None
+    if "check_user_position" in tool_messages_by_name:
+        positions = []
+        for message in tool_messages_by_name["check_user_position"][:1]:  # latest read only
+            positions = position_rows(message.artifact or "[]")
+
+    fixed_tokens = count_prompt_tokens([STATIC_PREFIX_MESSAGE])
+    context = _context_message(strategies, positions)
+    while strategies and fixed_tokens + count_prompt_tokens([context]) > max_tokens:
+        strategies.pop()
+        context = _context_message(strategies, positions)
+
+    prompt = [STATIC_PREFIX_MESSAGE] + ([context] if context else [])
+    history_budget = max(max_tokens - count_prompt_tokens(prompt), 0)
+    prompt += trim_history(conversation_messages, max_tokens=history_budget)
+    return prompt, count_prompt_tokens(prompt)
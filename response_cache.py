@@ -0,0 +1,132 @@
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from config import (
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_SIZE,
+    RESPONSE_CACHE_THRESHOLD,
+    RESPONSE_CACHE_TTL,
+)
+
+# Questions about the user's own funds, or follow-ups that depend on earlier turns
+_PERSONAL = r"\b(?:my|mine|position|positions|balance|balances|withdraw|claim|pending|unstake|wallet|address)\b"
+_FOLLOW_UP = r"\b(?:it|its|that|those|these|them|this one|first|second|third|last one|above|previous|again|more about)\b"
+# Has to be about the strategy catalog at all
+_CATALOG = r"(?:stak|apr|apy|yield|protocol|strateg|lend|tvl|liquidity|earn|invest)"
+# Only the parsed constraints and literal numbers decide correctness, not wording
+_NUMBER = r"\d+(?:\.\d+)?"
+# Answers that only depend on the catalog, never on positions
+CACHEABLE_TYPES = ("EXECUTE_TRANSACTION", "PURE_STRING_RESPONSE")
+
+
+def is_cacheable_query(text: str) -> bool:
+    """True for self-contained, address-independent questions about the strategy catalog."""
+    text = text.lower()
+    return (
+        re.search(_CATALOG, text) is not None
+        and re.search(_PERSONAL, text) is None
+        and re.search(_FOLLOW_UP, text) is None
+    )
+
+
+def query_fingerprint(text: str, strategy_table=None) -> str:
+    """
+    Exact part of the cache key: the structured constraints and numbers in the question.
+    "at least 5% APR" and "at least 6% APR" embed almost identically but must not share an answer.
+    """
+    constraints = strategy_table.parse_constraints(text) if strategy_table is not None else {}
+    numbers = sorted(set(re.findall(_NUMBER, text)))
+    return json.dumps({"constraints": constraints, "numbers": numbers}, sort_keys=True)
+
+
+class SemanticResponseCache:
+    """
+    Final /userQuery responses keyed by query embedding similarity, the query's
+    fingerprint and the catalog version. Entries are evicted LRU and by TTL, and the
+    whole cache is dropped as soon as a new catalog version is seen.
+    """
+
+    def __init__(
+        self,
+        threshold: float = RESPONSE_CACHE_THRESHOLD,
+        max_size: int = RESPONSE_CACHE_SIZE,
+        ttl: float = RESPONSE_CACHE_TTL,
+        enabled: bool = RESPONSE_CACHE_ENABLED,
+    ):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidations = 0
+        self._version = None
+        self._next_id = 0
+        # id -> (fingerprint, unit vector, response, stored_at)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_version(self, version: str):
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._version = version
+
+    def lookup(self, embedding, fingerprint: str, version: str):
+        """Cached response for the closest stored question above the threshold, or None."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector /= np.linalg.norm(vector) or 1.0
+        now = time.monotonic()
+        with self._lock:
+            self._check_version(version)
+            for entry_id in [i for i, e in self._entries.items() if now - e[3] > self.ttl]:
+                del self._entries[entry_id]
+            candidates = [(i, e) for i, e in self._entries.items() if e[0] == fingerprint]
+            if candidates:
+                scores = np.stack([e[1] for _, e in candidates]) @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    entry_id, entry = candidates[best]
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    return entry[2]
+            self.misses += 1
+            return None
+
+    def store(self, embedding, fingerprint: str, version: str, response: dict) -> None:
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector /= np.linalg.norm(vector) or 1.0
+        with self._lock:
+            self._check_version(version)
+            self._entries[self._next_id] = (fingerprint, vector, response, time.monotonic())
+            self._next_id += 1
+            self.stores += 1
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "stores": self.stores,
+            "invalidations": self.invalidations,
+            "catalog_version": self._version,
+        }
@@ -0,0 +1,194 @@
+import asyncio
+import importlib
+import random
+import time
+
+import metrics
+from config import (
+    STRATEGY_METRICS_BATCH_SIZE,
+    STRATEGY_METRICS_DRIFT,
+    STRATEGY_METRICS_INTERVAL,
+    STRATEGY_METRICS_MAX_AGE,
+    STRATEGY_METRICS_SOURCE,
+)
+from strategy_registry import registry
+from structured_index import LIVE_METRIC_FIELDS, StrategyTable
+
+
+class StubMetricsSource:
+    """
+    Local stand-in for a live feed: the catalog's own numbers with an optional random
+    walk (`drift` is the relative step per poll), for development and load tests.
+    """
+
+    name = "stub"
+
+    def __init__(self, drift: float = 0.0, seed: int = 0):
+        self.drift = drift
+        self._random = random.Random(seed)
+        self._walk = {}  # strategyID -> multiplier
+
+    async def fetch(self, records) -> dict:
+        values = {}
+        for record in records:
+            strategy_id = record["strategyID"]
+            walk = self._walk.get(strategy_id, 1.0) * (1 + self._random.uniform(-self.drift, self.drift))
+            self._walk[strategy_id] = walk
+            values[strategy_id] = {
+                field: round(float(record[field]) * walk, 4) for field in LIVE_METRIC_FIELDS if field in record
+            }
+        return values
+
+
+class OnchainMetricsSource:
+    """
+    Total staked per strategy from the aggregator contract's `getTotalStaked` through
+    Multicall3. It is in staking-token units, so it goes into its own `totalStaked`
+    field rather than over the catalog's USD `TVL` (that would need a price feed).
+    The contract has no APR or liquidity view, so those stay at the catalog's values.
+    """
+
+    name = "onchain"
+
+    def __init__(self):
+        self._module = None
+
+    async def fetch(self, records) -> dict:
+        if self._module is None:
+            self._module = await asyncio.to_thread(importlib.import_module, "check_user_position")
+        totals = await self._module.aquery_total_staked([int(r["strategyID"]) for r in records])
+        return {str(strategy_id): {"totalStaked": total} for strategy_id, total in totals.items()}
+
+
+SOURCES = {"stub": StubMetricsSource, "onchain": OnchainMetricsSource}
+
+
+class StrategyMonitor:
+    """
+    Polls a metrics source in the background and keeps the latest APR/TVL/liquidity per
+    strategy in memory. `view(table)` overlays them on a registry snapshot, so retrieval
+    ranks and answers with fresh numbers while the embedded documents (which leave these
+    fields out) never need re-embedding for a metric change.
+
+        monitor = StrategyMonitor(StubMetricsSource())
+        monitor.start()
+        table = monitor.view(registry.current())
+    """
+
+    def __init__(
+        self,
+        source=None,
+        interval: float = STRATEGY_METRICS_INTERVAL,
+        batch_size: int = STRATEGY_METRICS_BATCH_SIZE,
+        max_age: float = STRATEGY_METRICS_MAX_AGE,
+    ):
+        self.source = source
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_age = max_age
+        self.polls = 0
+        self.errors = 0
+        self.error = None
+        self.poll_seconds = None
+        self.version = 0  # bumped whenever a merged value changes
+        self._metrics = {}  # strategyID -> (values, updated_at)
+        self._view = None  # (table, version, merged table)
+        self._task = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.source is not None
+
+    async def poll_once(self) -> int:
+        """Fetch metrics for every strategy in batches; returns how many strategies changed."""
+        records = registry.current().records
+        started = time.perf_counter()
+        changed = 0
+        with metrics.timer("monitor", self.source.name):
+            for start in range(0, len(records), self.batch_size):
+                values = await self.source.fetch(records[start : start + self.batch_size])
+                now = time.time()
+                for strategy_id, fields in values.items():
+                    previous = self._metrics.get(strategy_id)
+                    if previous is None or previous[0] != fields:
+                        changed += 1
+                    self._metrics[strategy_id] = (fields, now)
+        self.polls += 1
+        self.poll_seconds = time.perf_counter() - started
+        if changed:
+            self.version += 1
+        return changed
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self.poll_once()
+                self.error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                self.error = str(e)
+                print(f"Error polling strategy metrics, keeping the last values: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def view(self, table: StrategyTable) -> StrategyTable:
+        """`table` with the latest polled metrics merged in; rebuilt only when either changes."""
+        if not self._metrics:
+            return table
+        cached = self._view
+        if cached is not None and cached[0] is table and cached[1] == self.version:
+            return cached[2]
+        merged = StrategyTable(
+            {**record, **self._metrics[record["strategyID"]][0]} if record["strategyID"] in self._metrics else record
+            for record in table.records
+        )
+        self._view = (table, self.version, merged)
+        return merged
+
+    def staleness(self) -> dict:
+        """Per strategy: seconds since its metrics were last updated (None if never) and whether that exceeds max_age."""
+        if not self.enabled:
+            return {}
+        now = time.time()
+        report = {}
+        for record in registry.current().records:
+            entry = self._metrics.get(record["strategyID"])
+            age = round(now - entry[1], 3) if entry is not None else None
+            report[record["strategyID"]] = {"age_seconds": age, "stale": age is None or age > self.max_age}
+        return report
+
+    def stats(self) -> dict:
+        staleness = self.staleness()
+        return {
+            "source": self.source.name if self.enabled else None,
+            "polls": self.polls,
+            "errors": self.errors,
+            "error": self.error,
+            "poll_seconds": round(self.poll_seconds, 4) if self.poll_seconds is not None else None,
+            "version": self.version,
+            "stale": sorted(strategy_id for strategy_id, s in staleness.items() if s["stale"]),
+        }
+
+
+def build_monitor(source_name: str = STRATEGY_METRICS_SOURCE, drift: float = STRATEGY_METRICS_DRIFT) -> StrategyMonitor:
+    if source_name and source_name not in SOURCES:
+        raise ValueError(f"Unknown STRATEGY_METRICS_SOURCE {source_name!r}, expected one of {sorted(SOURCES)}")
+    if not source_name:
+        return StrategyMonitor(None)
+    if source_name == "stub":
+        return StrategyMonitor(StubMetricsSource(drift=drift))
+    return StrategyMonitor(SOURCES[source_name]())
+
+
+# Process-wide monitor; disabled (catalog values only) unless STRATEGY_METRICS_SOURCE is set
+monitor = build_monitor()
@@ -0,0 +1,129 @@
+import json
+import os
+import threading
+import time
+
+from config import STRATEGY_DATA_PATH, STRATEGY_RELOAD_INTERVAL
+from structured_index import StrategyTable
+
+
+def iter_json_array(path: str, chunk_size: int = 1 << 16):
+    """Yield the elements of a top-level JSON array one at a time without loading the whole file."""
+    decoder = json.JSONDecoder()
+    with open(path, "r") as f:
+        buffer = ""
+        started = False
+        eof = False
+        while not eof:
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            pos = 0
+            while True:
+                while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                    pos += 1
+                if pos >= len(buffer):
+                    break
+                if not started:
+                    if buffer[pos] != "[":
+                        raise ValueError(f"{path} is not a JSON array")
+                    started = True
+                    pos += 1
+                    continue
+                if buffer[pos] == "]":
+                    return
+                try:
+                    item, pos = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    break  # element continues in the next chunk
+                yield item
+            buffer = buffer[pos:]
+    if buffer.strip():
+        raise ValueError(f"{path} ends with an incomplete JSON array")
+
+
+def iter_records(path: str = STRATEGY_DATA_PATH):
+    """
+    Strategy records from the catalog file, validated and normalized the same way for
+    every consumer (strategyID as a string, rewardToken defaulting to the staking token).
+    """
+    for record in iter_json_array(path):
+        if "strategyID" not in record or "protocol" not in record:
+            raise ValueError(f"{path}: strategy without strategyID/protocol: {record}")
+        record["strategyID"] = str(record["strategyID"])
+        record.setdefault("rewardToken", record.get("stakingToken", ""))
+        yield record
+
+
+class StrategyRegistry:
+    """
+    The strategy catalog, loaded once and shared by retrieval, position reads and
+    ingestion. `current()` returns an immutable StrategyTable snapshot; the source file
+    is re-checked at most every `check_interval` seconds and reloaded when it changes,
+    so edits take effect without a restart. A file that fails to parse keeps the
+    previous snapshot in place.
+    """
+
+    def __init__(self, path: str = STRATEGY_DATA_PATH, check_interval: float = STRATEGY_RELOAD_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self.reloads = 0
+        self.error = None
+        self._table = None
+        self._mtime = None
+        self._failed_mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> str:
+        """Changes whenever a new snapshot is loaded."""
+        return str(self._mtime)
+
+    def current(self) -> StrategyTable:
+        if self._table is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return self._table
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError as e:
+                if self._table is None:
+                    raise
+                self.error = str(e)
+                return self._table
+            if mtime != self._mtime and mtime != self._failed_mtime:
+                self._load(mtime)
+        return self._table
+
+    def _load(self, mtime):
+        try:
+            records = {}
+            for record in iter_records(self.path):
+                if record["strategyID"] in records:
+                    print(f"Duplicate strategyID {record['strategyID']} in {self.path}, keeping the last one")
+                records[record["strategyID"]] = record
+            table = StrategyTable(records.values())
+        except (OSError, ValueError) as e:
+            if self._table is None:
+                raise
+            print(f"Error reloading {self.path}, keeping the previous catalog: {str(e)}")
+            self.error = str(e)
+            self._failed_mtime = mtime
+            return
+        if self._table is not None:
+            self.reloads += 1
+            print(f"Reloaded {len(table)} strategies from {self.path}")
+        self._table, self._mtime, self.error = table, mtime, None
+
+    def stats(self) -> dict:
+        return {
+            "strategies": len(self._table) if self._table is not None else None,
+            "version": self.version,
+            "reloads": self.reloads,
+            "error": self.error,
+        }
+
+
+# Process-wide registry over STRATEGY_DATA_PATH
+registry = StrategyRegistry()
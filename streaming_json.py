@@ -0,0 +1,95 @@
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class JsonFieldStreamer:
+    """
+    Incrementally extract one top-level string field from a JSON object that arrives in
+    chunks, e.g. the `LLM_response` of the generate node's output, so it can be shown
+    before the rest of the object (like the `strategies` array) has been generated.
+
+        streamer = JsonFieldStreamer("LLM_response")
+        for chunk in chunks:
+            text = streamer.feed(chunk)  # newly decoded characters of the field, or ""
+    """
+
+    def __init__(self, field: str):
+        self.field = field
+        self.done = False
+        self._depth = 0
+        self._expect_key = False
+        self._last_key = None
+        self._in_string = False
+        self._string_role = None  # "key", "target" or None
+        self._key_buffer = []
+        self._escape = None  # None, "" after a backslash, or the hex digits of \uXXXX
+        self._high_surrogate = None
+
+    def feed(self, chunk: str) -> str:
+        out = []
+        for ch in chunk:
+            if self._in_string:
+                self._feed_string(ch, out)
+            else:
+                self._feed_structure(ch)
+        return "".join(out)
+
+    def _feed_structure(self, ch):
+        if ch == '"':
+            self._in_string = True
+            if self._depth == 1 and self._expect_key:
+                self._string_role = "key"
+                self._key_buffer = []
+            elif self._depth == 1 and self._last_key == self.field and not self.done:
+                self._string_role = "target"
+            else:
+                self._string_role = None
+        elif ch in "{[":
+            self._depth += 1
+            self._expect_key = ch == "{" and self._depth == 1
+        elif ch in "}]":
+            self._depth -= 1
+        elif ch == "," and self._depth == 1:
+            self._expect_key = True
+            self._last_key = None
+
+    def _feed_string(self, ch, out):
+        if self._escape is not None:
+            if self._escape == "" and ch != "u":
+                self._emit(_ESCAPES.get(ch, ch), out)
+                self._escape = None
+            elif self._escape == "":
+                self._escape = "u"
+            else:
+                self._escape += ch
+                if len(self._escape) == 5:
+                    self._emit_codepoint(int(self._escape[1:], 16), out)
+                    self._escape = None
+            return
+
+        if ch == "\\":
+            self._escape = ""
+        elif ch == '"':
+            self._in_string = False
+            if self._string_role == "key":
+                self._last_key = "".join(self._key_buffer)
+                self._expect_key = False
+            elif self._string_role == "target":
+                self.done = True
+            self._string_role = None
+        else:
+            self._emit(ch, out)
+
+    def _emit_codepoint(self, codepoint, out):
+        if 0xD800 <= codepoint <= 0xDBFF:
+            self._high_surrogate = codepoint
+            return
+        if 0xDC00 <= codepoint <= 0xDFFF and self._high_surrogate is not None:
+            codepoint = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (codepoint - 0xDC00)
+        self._high_surrogate = None
+        self._emit(chr(codepoint), out)
+
+    def _emit(self, text, out):
+        if self._string_role == "key":
+            self._key_buffer.append(text)
+        elif self._string_role == "target":
+            out.append(text)
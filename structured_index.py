@@ -0,0 +1,201 @@
+import re
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+SORT_COLUMNS = {"APR": "apr", "TVL": "tvl", "liquidity": "liquidity"}
+# Numbers that move constantly; kept out of the embedded text and merged in at query time.
+# TVL is in USD; totalStaked (staking-token units) only comes from the on-chain source.
+LIVE_METRIC_FIELDS = ("APR", "TVL", "liquidity", "totalStaked")
+FLEXIBLE_LOCKUPS = ("flexible", "no strict lock", "no lock", "none")
+# Too generic to narrow the category ("recommend some staking protocols")
+GENERIC_CATEGORY_WORDS = ("staking", "stake")
+
+_NUMBER = r"(\d+(?:\.\d+)?)"
+_APR_RANGE = [
+    rf"between\s*{_NUMBER}\s*%?\s*(?:apr|apy)?\s*and\s*{_NUMBER}\s*%",
+    rf"{_NUMBER}\s*%?\s*(?:-|–|to)\s*{_NUMBER}\s*%",
+]
+_MIN_APR = [
+    rf"(?:at least|min(?:imum)?|above|over|more than|greater than|>=?|≥)\s*{_NUMBER}\s*%",
+    rf"{_NUMBER}\s*%\s*(?:apr|apy|yield)?\s*(?:or more|or higher|or above|and above|\+)",
+]
+# A lone "5% APR" with no bound word is read as a minimum
+_BARE_APR = rf"{_NUMBER}\s*%\s*(?:apr|apy)"
+_MAX_APR = [
+    rf"(?:at most|no more than|not more than|up to|below|under|less than|max(?:imum)?|<=?|≤)\s*{_NUMBER}\s*%",
+    rf"{_NUMBER}\s*%\s*(?:apr|apy|yield)?\s*(?:or less|or lower|or below|and below|max)\b",
+]
+_MIN_TVL = rf"tvl\s*(?:of\s*)?(?:at least|above|over|more than|>=?)\s*\$?{_NUMBER}\s*(k|m|b|million|billion)?\b"
+_COMPARISON = r"\b(?:or|vs\.?|versus|compare[ds]?|comparison|better|difference|between)\b"
+_SCALES = {"k": 1e3, "m": 1e6, "million": 1e6, "b": 1e9, "billion": 1e9}
+_SORTS = [
+    (r"(?:highest|largest|biggest|most|top)\s+tvl", "TVL"),
+    (r"(?:most liquid|highest liquidity|deepest liquidity)", "liquidity"),
+    (r"(?:highest|best|top|max(?:imum)?)\s+(?:apr|apy|yield|return)", "APR"),
+]
+
+
+def _blank(text: str, match) -> str:
+    return text[: match.start()] + " " * (match.end() - match.start()) + text[match.end() :]
+
+
+def record_to_text(record: dict) -> str:
+    # 將 record 轉成文本，例如 key-value pair 的格式
+    return "\n".join([f"{k}: {v}" for k, v in record.items()])
+
+
+def descriptive_text(record: dict) -> str:
+    """The record's text without live metrics, so APR/TVL updates don't change its embedding."""
+    return record_to_text({k: v for k, v in record.items() if k not in LIVE_METRIC_FIELDS})
+
+
+def strategy_document_id(record: dict) -> str:
+    """Stable vector-store id, so re-ingesting a strategy replaces its document."""
+    return f"strategy-{record['strategyID']}"
+
+
+def record_to_document(record: dict) -> Document:
+    return Document(
+        id=strategy_document_id(record),
+        page_content=descriptive_text(record),
+        metadata={
+            "category": record["category"],
+            "strategyID": str(record["strategyID"]),
+        },
+    )
+
+
+class StrategyTable:
+    """
+    Columnar in-memory index over the strategy catalog's numeric and categorical fields,
+    used to filter and rank strategies without a vector search.
+    """
+
+    def __init__(self, records):
+        self.records = list(records)
+        self.apr = np.array([float(r.get("APR", 0)) for r in self.records])
+        self.tvl = np.array([float(r.get("TVL", 0)) for r in self.records])
+        self.liquidity = np.array([float(r.get("liquidity", 0)) for r in self.records])
+        self.category = np.array([r.get("category", "").lower() for r in self.records], dtype=object)
+        self.staking_token = np.array([r.get("stakingToken", "").lower() for r in self.records], dtype=object)
+        self.protocol = np.array([r.get("protocol", "").lower() for r in self.records], dtype=object)
+        self.flexible = np.array(
+            [str(r.get("lockupPeriod", "")).lower() in FLEXIBLE_LOCKUPS for r in self.records]
+        )
+        self.row_by_strategy_id = {str(r["strategyID"]): row for row, r in enumerate(self.records)}
+        self.rows_by_token_address = {}
+        self.rows_by_category = {}
+        for row, r in enumerate(self.records):
+            self.rows_by_token_address.setdefault(r.get("stakingTokenAddress", "").lower(), []).append(row)
+            self.rows_by_category.setdefault(r.get("category", "").lower(), []).append(row)
+
+    def __len__(self):
+        return len(self.records)
+
+    def get(self, strategy_id):
+        """The record for `strategy_id` (int or str), or None."""
+        row = self.row_by_strategy_id.get(str(strategy_id))
+        return self.records[row] if row is not None else None
+
+    def by_token_address(self, address: str) -> list:
+        return [self.records[row] for row in self.rows_by_token_address.get(address.lower(), [])]
+
+    def by_category(self, category: str) -> list:
+        return [self.records[row] for row in self.rows_by_category.get(category.lower(), [])]
+
+    def parse_constraints(self, query: str) -> dict:
+        """Extract numeric/categorical constraints from free text, e.g. "at least 5% APR"."""
+        text = query.lower()
+        constraints = {}
+
+        # Ranges, then upper bounds, blanking each out so "at most 6% APR" isn't also read as a minimum
+        apr_text = text
+        for pattern in _APR_RANGE:
+            if match := re.search(pattern, apr_text):
+                constraints["min_apr"], constraints["max_apr"] = sorted(map(float, match.groups()))
+                apr_text = _blank(apr_text, match)
+                break
+        for pattern in _MAX_APR:
+            if "max_apr" not in constraints and (match := re.search(pattern, apr_text)):
+                constraints["max_apr"] = float(match.group(1))
+                apr_text = _blank(apr_text, match)
+                break
+        for pattern in _MIN_APR:
+            if "min_apr" not in constraints and (match := re.search(pattern, apr_text)):
+                constraints["min_apr"] = float(match.group(1))
+                apr_text = _blank(apr_text, match)
+                break
+        # "5% or 7% APR?" names two numbers without saying which is the bound
+        if "min_apr" not in constraints and len(re.findall(rf"{_NUMBER}\s*%", apr_text)) == 1:
+            if match := re.search(_BARE_APR, apr_text):
+                constraints["min_apr"] = float(match.group(1))
+        if match := re.search(_MIN_TVL, text):
+            constraints["min_tvl"] = float(match.group(1)) * _SCALES.get(match.group(2), 1)
+        for pattern, column in _SORTS:
+            if re.search(pattern, text):
+                constraints["sort_by"] = column
+                break
+
+        # Longest first so "liquid staking" is consumed before "staking" is looked for
+        mentioned, category_text = [], text
+        for category in sorted(set(self.category), key=len, reverse=True):
+            if category and (match := re.search(rf"\b{re.escape(category)}\b", category_text)):
+                mentioned.append(category)
+                category_text = category_text[: match.start()] + " " + category_text[match.end() :]
+        specific = [c for c in mentioned if c not in GENERIC_CATEGORY_WORDS]
+        # "Which is better, staking or lending?" is a comparison, not a filter
+        comparison = len(mentioned) > 1 and re.search(_COMPARISON, text)
+        if len(specific) == 1 and not comparison:
+            constraints["category"] = specific[0]
+        for protocol in set(self.protocol):
+            if protocol and re.search(rf"\b{re.escape(protocol)}\b", text):
+                constraints["protocol"] = protocol
+                break
+        for token in set(self.staking_token):
+            if token and re.search(rf"\b{re.escape(token)}\b", text):
+                constraints["staking_token"] = token
+                break
+        if re.search(r"\b(?:no lock(?:up)?|without lock(?:up)?|flexible|unlocked)\b", text):
+            constraints["flexible"] = True
+        return constraints
+
+    def query(
+        self,
+        min_apr=None,
+        max_apr=None,
+        min_tvl=None,
+        min_liquidity=None,
+        category=None,
+        staking_token=None,
+        protocol=None,
+        flexible=None,
+        sort_by=None,
+        limit=None,
+    ):
+        """Return matching records, best first (by `sort_by`, default APR)."""
+        mask = np.ones(len(self.records), dtype=bool)
+        if min_apr is not None:
+            mask &= self.apr >= min_apr
+        if max_apr is not None:
+            mask &= self.apr <= max_apr
+        if min_tvl is not None:
+            mask &= self.tvl >= min_tvl
+        if min_liquidity is not None:
+            mask &= self.liquidity >= min_liquidity
+        if category:
+            mask &= self.category == category.lower()
+        if staking_token:
+            mask &= self.staking_token == staking_token.lower()
+        if protocol:
+            mask &= self.protocol == protocol.lower()
+        if flexible:
+            mask &= self.flexible
+
+        column = getattr(self, SORT_COLUMNS.get(sort_by or "APR", "apr"))
+        rows = np.flatnonzero(mask)
+        rows = rows[np.argsort(-column[rows], kind="stable")]
+        if limit is not None:
+            rows = rows[:limit]
+        return [self.records[row] for row in rows]
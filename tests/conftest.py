@@ -0,0 +1,30 @@
+import os
+import sys
+
+import httpx
+import pytest
+import pytest_asyncio
+
+# The tests import the top-level modules and never talk to OpenAI, Pinecone or an RPC node
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "sk-stub")
+os.environ.setdefault("QUICKNODE_API_KEY", "stub")
+os.environ.setdefault("AGGREGATOR_CONTRACT_ADDRESS", "0x0000000000000000000000000000000000000001")
+
+
+@pytest.fixture
+def fake_main():
+    """main with the deterministic fakes from fakes.py and the response cache off."""
+    import fakes
+    import main
+
+    fakes.install(main, llm_seconds=0.05, token_seconds=0, vector_seconds=0.01, rpc_seconds=0.01)
+    main.response_cache.enabled = False
+    return main
+
+
+@pytest_asyncio.fixture
+async def client(fake_main):
+    transport = httpx.ASGITransport(app=fake_main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+        yield client
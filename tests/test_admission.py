@@ -0,0 +1,154 @@
+import asyncio
+
+import pytest
+
+import admission
+from admission import Limiter, Overloaded
+
+QUESTION = "Recommend some staking protocols for me, at least 5% APR."
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_slots_are_handed_over_in_arrival_order():
+    limiter = Limiter("test", 1, max_queue=10, timeout=5)
+    order = []
+
+    async def worker(i):
+        async with limiter:
+            order.append(i)
+            await asyncio.sleep(0.01)
+
+    await limiter.acquire()
+    tasks = [asyncio.create_task(worker(i)) for i in range(5)]
+    await _settle()
+    assert limiter.queued == 5
+    limiter.release()
+    await asyncio.gather(*tasks)
+    assert order == [0, 1, 2, 3, 4]
+    assert (limiter.in_flight, limiter.queued) == (0, 0)
+
+
+@pytest.mark.asyncio
+async def test_sheds_when_the_queue_is_full():
+    limiter = Limiter("test", 1, max_queue=1, timeout=5)
+    await limiter.acquire()
+    waiter = asyncio.create_task(limiter.acquire())
+    await _settle()
+    with pytest.raises(Overloaded) as e:
+        await limiter.acquire()
+    assert e.value.reason == "queue full"
+    limiter.release()
+    await waiter
+    limiter.release()
+    assert limiter.in_flight == 0
+    assert limiter.shed == {"queue_full": 1, "timeout": 0}
+
+
+@pytest.mark.asyncio
+async def test_sheds_after_the_timeout():
+    limiter = Limiter("test", 1, max_queue=10, timeout=0.05)
+    await limiter.acquire()
+    with pytest.raises(Overloaded) as e:
+        await limiter.acquire()
+    assert e.value.reason == "timeout"
+    assert limiter.queued == 0
+    limiter.release()
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_leak_a_slot():
+    limiter = Limiter("test", 1, max_queue=10, timeout=5)
+
+    async def waiter():
+        async with limiter:
+            pass
+
+    for settle_before_cancel in (False, True):
+        await limiter.acquire()
+        task = asyncio.create_task(waiter())
+        await _settle()
+        limiter.release()  # hands the slot to the waiter...
+        if settle_before_cancel:
+            await asyncio.sleep(0)
+        task.cancel()  # ...which is cancelled before it gets to run
+        await asyncio.gather(task, return_exceptions=True)
+        assert (limiter.in_flight, limiter.queued) == (0, 0)
+
+    # A cancelled waiter that never got a slot just leaves the queue
+    await limiter.acquire()
+    task = asyncio.create_task(waiter())
+    await _settle()
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    limiter.release()
+    assert (limiter.in_flight, limiter.queued) == (0, 0)
+    await asyncio.wait_for(limiter.acquire(), 0.1)
+    limiter.release()
+
+
+@pytest.mark.asyncio
+async def test_unlimited():
+    limiter = Limiter("test", 0)
+    for _ in range(100):
+        await limiter.acquire()
+    assert limiter.in_flight == 0
+
+
+@pytest.fixture
+def graph_runs(fake_main, monkeypatch):
+    runs = []
+    run_graph = fake_main._run_graph
+
+    async def counted(*args, **kwargs):
+        runs.append(args[0].userInput)
+        return await run_graph(*args, **kwargs)
+
+    monkeypatch.setattr(fake_main, "_run_graph", counted)
+    return runs
+
+
+@pytest.mark.asyncio
+async def test_identical_questions_share_one_graph_run(client, graph_runs):
+    responses = await asyncio.gather(*(client.post("/userQuery", json={"userInput": QUESTION}) for _ in range(8)))
+    assert all(r.status_code == 200 for r in responses)
+    assert len({r.text for r in responses}) == 1
+    assert graph_runs == [QUESTION]
+
+
+@pytest.mark.asyncio
+async def test_follower_reruns_when_the_leader_goes_away(fake_main, client, graph_runs):
+    # A streaming request leads the question, then disconnects without an answer
+    key = fake_main._coalescing_key(fake_main.RequestBody(userInput=QUESTION))
+    shared = fake_main.identical_requests.lead(key)
+    coalesced = fake_main.identical_requests.coalesced
+    follower = asyncio.create_task(client.post("/userQuery", json={"userInput": QUESTION}))
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        if fake_main.identical_requests.coalesced > coalesced:
+            break
+    assert fake_main.identical_requests.coalesced == coalesced + 1
+    assert graph_runs == []
+    shared.set_exception(fake_main._LeaderGone())
+
+    response = await follower
+    assert response.status_code == 200
+    assert graph_runs == [QUESTION]
+    assert key not in fake_main.identical_requests
+
+
+@pytest.mark.asyncio
+async def test_overloaded_backend_returns_429(client, monkeypatch):
+    monkeypatch.setitem(admission.LIMITERS, "llm", Limiter("llm", 1, max_queue=0, timeout=1))
+    await admission.limit("llm").acquire()
+    try:
+        response = await client.post("/userQuery", json={"userInput": "Check my positions.", "userAddress": "0x" + "1" * 40})
+    finally:
+        admission.limit("llm").release()
+    assert response.status_code == 429
+    assert response.headers["Retry-After"]
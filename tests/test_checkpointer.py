@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage
+from langgraph.graph import MessagesState, StateGraph
+
+from checkpointer import CheckpointStore, SQLiteCheckpointStore, StoreCheckpointer
+
+
+def _graph(checkpointer):
+    def echo(state: MessagesState):
+        return {"messages": [AIMessage(content=f"echo: {state['messages'][-1].content}")]}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node(echo)
+    builder.set_entry_point("echo")
+    return builder.compile(checkpointer=checkpointer)
+
+
+def _config(thread_id):
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def test_store_interface_is_abstract():
+    with pytest.raises(TypeError):
+        CheckpointStore()
+
+
+@pytest.mark.asyncio
+async def test_round_trip_and_retention(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    graph = _graph(StoreCheckpointer(SQLiteCheckpointStore(path), compress_min_bytes=64))
+    for turn in range(4):
+        await graph.ainvoke({"messages": [("user", f"turn {turn} " + "x" * 100)]}, _config("a"))
+
+    # A second process opening the same file sees the whole history
+    reader = StoreCheckpointer(SQLiteCheckpointStore(path))
+    state = await _graph(reader).aget_state(_config("a"))
+    messages = state.values["messages"]
+    assert [m.type for m in messages] == ["human", "ai"] * 4
+    assert messages[-1].content.startswith("echo: turn 3")
+    assert len([c async for c in reader.alist(_config("a"))]) == 2
+
+
+@pytest.mark.asyncio
+async def test_idle_threads_expire(tmp_path):
+    store = SQLiteCheckpointStore(str(tmp_path / "checkpoints.sqlite"))
+    graph = _graph(StoreCheckpointer(store, ttl_seconds=0.2, expire_interval=0))
+    await graph.ainvoke({"messages": [("user", "hello")]}, _config("idle"))
+    await asyncio.sleep(0.3)
+    await graph.ainvoke({"messages": [("user", "hello")]}, _config("active"))
+
+    assert await graph.checkpointer.aget_tuple(_config("idle")) is None
+    assert await graph.checkpointer.aget_tuple(_config("active")) is not None
+    assert store.stats()["evictions"] == 1
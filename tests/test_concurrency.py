@@ -0,0 +1,53 @@
+"""
+/userQuery against the deterministic fakes (no API keys needed). Every backend call just
+sleeps, so with a truly async pipeline N concurrent requests finish in roughly the time
+of one instead of N times as long.
+"""
+import asyncio
+import time
+
+import pytest
+
+REQUESTS = 16
+
+
+def _address(i: int) -> str:
+    return f"0x{i + 1:040x}"
+
+
+@pytest.mark.asyncio
+async def test_recommendation(client):
+    response = await client.post(
+        "/userQuery", json={"userInput": "Recommend some staking protocols for me, at least 5% APR."}
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["type"] == "EXECUTE_TRANSACTION"
+    assert body["strategies"]
+    assert all(float(s["description"].split(" for ")[1].split("%")[0]) >= 5 for s in body["strategies"])
+
+
+@pytest.mark.asyncio
+async def test_position_check(client):
+    response = await client.post("/userQuery", json={"userInput": "Check my positions.", "userAddress": _address(0)})
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_overlap(client):
+    async def one(i):
+        # Distinct questions and addresses, so nothing is cached or coalesced
+        return await client.post(
+            "/userQuery", json={"userInput": f"Recommend staking protocols, option {i}", "userAddress": _address(i)}
+        )
+
+    started = time.perf_counter()
+    assert (await one(REQUESTS)).status_code == 200
+    serial = time.perf_counter() - started
+
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(one(i) for i in range(REQUESTS)))
+    concurrent = time.perf_counter() - started
+
+    assert all(r.status_code == 200 for r in responses)
+    assert concurrent < serial * REQUESTS / 4, f"{REQUESTS} concurrent requests took {concurrent:.2f}s, one took {serial:.2f}s"
@@ -0,0 +1,38 @@
+import asyncio
+
+import pytest
+
+from conversation import is_anonymous_thread, thread_id_for
+
+USER = "0x00000000000000000000000000000000000000aa"
+
+
+def test_thread_ids():
+    assert thread_id_for(USER) == f"user:{USER}"
+    assert thread_id_for(USER, "abc") == "session:abc"
+    anonymous = thread_id_for(None)
+    assert is_anonymous_thread(anonymous)
+    assert anonymous != thread_id_for(None)
+    assert not is_anonymous_thread(thread_id_for(USER))
+
+
+async def _threads(main):
+    # Anonymous threads are deleted in the background after the response
+    for _ in range(50):
+        await asyncio.sleep(0.01)
+        threads = set(main.checkpointer.storage)
+        if not any(is_anonymous_thread(t) for t in threads):
+            break
+    return threads
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("endpoint", ["/userQuery", "/userQuery/stream"])
+async def test_anonymous_threads_are_not_kept(fake_main, client, endpoint):
+    fake_main.checkpointer.storage.clear()
+    for _ in range(3):
+        response = await client.post(endpoint, json={"userInput": "Recommend some staking protocols"})
+        assert response.status_code == 200
+    await client.post(endpoint, json={"userInput": "Recommend some staking protocols", "userAddress": USER})
+
+    assert await _threads(fake_main) == {thread_id_for(USER)}
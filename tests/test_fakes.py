@@ -0,0 +1,25 @@
+import json
+
+import pytest
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from fakes import ScriptedChatModel
+
+GENERATE_PROMPT = SystemMessage(
+    "Reply in JSON format.\nStrategies:\nstrategyID|protocol|stakingToken|stakingTokenAddress|APR\n1|SimpleStake|WMOD|0x01|8.0"
+)
+
+
+@pytest.mark.asyncio
+async def test_sync_and_async_paths_agree():
+    model = ScriptedChatModel(first_token_seconds=0, token_seconds=0)
+    for messages in ([HumanMessage("Check my positions")], [GENERATE_PROMPT, HumanMessage("Recommend staking")]):
+        sync, async_ = model.invoke(messages), await model.ainvoke(messages)
+        assert sync.content == async_.content
+        assert [c["name"] for c in sync.tool_calls] == [c["name"] for c in async_.tool_calls]
+        assert sync.usage_metadata["output_tokens"] == async_.usage_metadata["output_tokens"]
+
+    answer = json.loads(model.invoke([GENERATE_PROMPT, HumanMessage("Recommend staking")]).content)
+    assert answer["type"] == "EXECUTE_TRANSACTION"
+    assert answer["strategies"][0]["label"] == "SimpleStake"
+    assert model.invoke([HumanMessage("Check my positions")]).tool_calls[0]["name"] == "check_user_position"
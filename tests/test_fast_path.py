@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from fast_path import render_position_response
+from strategy_registry import registry
+
+
+def _position(strategy_id, protocol, staked, pending):
+    return {
+        "strategyId": strategy_id,
+        "protocol": protocol,
+        "staking_token": "WMOD",
+        "reward_token": "sWMOD",
+        "amount_staked": staked,
+        "pending_rewards": pending,
+    }
+
+
+POSITIONS = [
+    _position(1, "SimpleStake", 2.5, 0.0),
+    _position(2, "HappyStake", 0.0, 0.1),
+    _position(3, "EasyStake", 1.0, 0.5),
+    _position(4, "CakeStake", 0.0, 0.0),
+]
+
+
+@pytest.fixture
+def table():
+    return registry.current()
+
+
+def _ids(response):
+    return [s["strategyID"] for s in response["strategies"]]
+
+
+def test_withdraw_lists_only_staked_strategies(table):
+    response = render_position_response("WITHDRAW_POSITION", "withdraw everything", json.dumps(POSITIONS), table)
+    assert response["type"] == "WITHDRAW_POSITION"
+    assert _ids(response) == [1, 3]
+    record = table.records[table.row_by_strategy_id["1"]]
+    assert response["strategies"][0]["stakeToken"] == record["stakingTokenAddress"]
+
+
+def test_claim_lists_only_strategies_with_pending_rewards(table):
+    response = render_position_response("CLAIM_REWARD", "claim my rewards", POSITIONS, table)
+    assert response["type"] == "CLAIM_REWARD"
+    assert _ids(response) == [2, 3]
+
+
+def test_narrows_to_the_protocol_in_the_question(table):
+    response = render_position_response("WITHDRAW_POSITION", "withdraw my EasyStake stake", POSITIONS, table)
+    assert _ids(response) == [3]
+    response = render_position_response("CLAIM_REWARD", "claim from happystake", POSITIONS, table)
+    assert _ids(response) == [2]
+    # Nothing staked in the named protocol
+    response = render_position_response("WITHDRAW_POSITION", "withdraw from HappyStake", POSITIONS, table)
+    assert (response["type"], response["strategies"]) == ("PURE_STRING_RESPONSE", [])
+
+
+def test_check_summarizes_active_positions(table):
+    response = render_position_response("PURE_STRING_RESPONSE", "show my positions", POSITIONS, table)
+    assert response["type"] == "PURE_STRING_RESPONSE"
+    assert "SimpleStake" in response["LLM_response"] and "HappyStake" in response["LLM_response"]
+    assert "CakeStake" not in response["LLM_response"]
+
+
+def test_falls_back_to_the_llm_on_unknown_strategies(table):
+    unknown = POSITIONS + [_position(99, "GhostStake", 1.0, 0.0)]
+    assert render_position_response("WITHDRAW_POSITION", "withdraw everything", unknown, table) is None
+    malformed = [{k: v for k, v in p.items() if k != "strategyId"} for p in POSITIONS]
+    assert render_position_response("PURE_STRING_RESPONSE", "show my positions", malformed, table) is None
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+import ingestion
+
+
+class FlakyVectorStore:
+    """Records upserted ids; fails every batch containing one of `fail_ids`."""
+
+    def __init__(self, fail_ids=()):
+        self.fail_ids = set(fail_ids)
+        self.upserted = []
+        self.embeddings = self
+
+    def embed_documents(self, texts):
+        return [[0.0] for _ in texts]
+
+    def upsert_embeddings(self, ids, vectors, documents):
+        if self.fail_ids & set(ids):
+            raise RuntimeError("upsert failed")
+        self.upserted += ids
+
+    def delete_documents(self, ids):
+        pass
+
+    def delete_all_documents(self):
+        pass
+
+    def flush(self):
+        pass
+
+
+@pytest.fixture
+def run(tmp_path, monkeypatch):
+    manifest_path = str(tmp_path / "manifest.json")
+    load_manifest, save_manifest = ingestion.load_manifest, ingestion.save_manifest
+    monkeypatch.setattr(ingestion, "load_manifest", lambda: load_manifest(manifest_path))
+    monkeypatch.setattr(ingestion, "save_manifest", lambda manifest: save_manifest(manifest, manifest_path))
+    monkeypatch.setattr(ingestion, "bump_catalog_version", lambda: None)
+    records = [
+        {"strategyID": i, "category": "Staking", "protocol": f"P{i}", "APR": 5.0} for i in range(1, 7)
+    ]
+    data_path = tmp_path / "strategies.json"
+    data_path.write_text(json.dumps(records))
+
+    def run(vector_store):
+        monkeypatch.setattr(ingestion, "ProtocolsVectorStore", lambda: vector_store)
+        stats = ingestion.ingest_json(str(data_path), batch_size=2, parallelism=1)
+        return stats, load_manifest(manifest_path)
+
+    return run
+
+
+def test_failed_batches_are_not_counted_and_retried(run):
+    stats, manifest = run(FlakyVectorStore(fail_ids={"strategy-3"}))
+    assert (stats["added"], stats["failed"]) == (4, 1)
+    assert set(manifest) == {"strategy-1", "strategy-2", "strategy-5", "strategy-6"}
+
+    store = FlakyVectorStore()
+    stats, manifest = run(store)
+    assert store.upserted == ["strategy-3", "strategy-4"]
+    assert (stats["added"], stats["skipped"], stats["failed"]) == (2, 4, 0)
+    assert len(manifest) == 6
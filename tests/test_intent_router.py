@@ -0,0 +1,60 @@
+import pytest
+
+from eval_router import evaluate
+from fast_path import detect_position_intent
+from intent_router import CATALOG, POSITIONS, IntentRouter
+from strategy_registry import registry
+
+USER = "0x00000000000000000000000000000000000000aa"
+
+
+@pytest.fixture
+def router():
+    return IntentRouter(enabled=True)
+
+
+@pytest.mark.parametrize(
+    "query, args",
+    [
+        ("Recommend some staking protocols for me, at least 5% APR.", {"min_apr": 5.0}),
+        ("lending strategies for WMOD", {"category": "lending", "staking_token": "wmod"}),
+        ("at most 6% apr staking", {}),
+        ("Which is better, staking or lending?", {}),
+    ],
+)
+def test_catalog_routes_only_carry_unambiguous_args(router, query, args):
+    route = router.route(query, USER, registry.current())
+    assert route is not None and route["name"] == CATALOG
+    assert route["args"] == {"query": query, **args}
+
+
+def test_explanations_go_to_the_llm(router):
+    assert router.route("What does 5% APR mean?", USER, registry.current()) is None
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "what rewards does SimpleStake give",
+        "how much is staked in SimpleStake?",
+        "show me the staking rewards of HappyStake",
+    ],
+)
+def test_questions_about_protocols_are_not_position_checks(router, query):
+    assert detect_position_intent(query) is None
+    route = router.route(query, USER, registry.current())
+    assert route is None or route["name"] != POSITIONS
+
+
+@pytest.mark.parametrize(
+    "query",
+    ["show me my staking rewards", "how much have I staked in SimpleStake?", "claim rewards from HappyStake"],
+)
+def test_own_positions_are_checked(router, query):
+    assert detect_position_intent(query) is not None
+    assert router.route(query, USER, registry.current())["name"] == POSITIONS
+
+
+def test_no_misroutes_on_the_labelled_set(router):
+    result = evaluate(router, router.threshold, registry.current())
+    assert result["misroutes"] == []
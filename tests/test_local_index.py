@@ -0,0 +1,57 @@
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from local_index import LocalVectorStore, _matches
+
+
+def _store(path=""):
+    return LocalVectorStore(DeterministicFakeEmbedding(size=32), path=path)
+
+
+def test_metadata_filters():
+    metadata = {"strategyID": "2", "protocol": "SimpleStake", "APR": 6.5}
+    assert _matches(metadata, {"protocol": "SimpleStake"})
+    assert _matches(metadata, {"strategyID": {"$in": ["1", "2"]}})
+    # strategyIDs are stored as strings, so integer ids don't match
+    assert not _matches(metadata, {"strategyID": {"$in": [1, 2]}})
+    assert not _matches(metadata, {"strategyID": {"$nin": ["2"]}})
+    assert not _matches(metadata, {"protocol": {"$ne": "SimpleStake"}})
+    assert _matches(metadata, {"APR": {"$gte": 6.5, "$lt": 7}})
+    assert not _matches(metadata, {"APR": {"$gt": 6.5}})
+    # Range operators never match a missing field
+    assert not _matches(metadata, {"TVL": {"$lte": 100}})
+
+
+def test_upsert_by_id_replaces_the_record():
+    store = _store()
+    store.add_texts(["alpha", "beta"], metadatas=[{"strategyID": "1"}, {"strategyID": "2"}], ids=["a", "b"])
+    store.add_texts(["gamma"], metadatas=[{"strategyID": "1"}], ids=["a"])
+    assert len(store) == 2
+    [doc] = store.similarity_search("gamma", k=1)
+    assert (doc.id, doc.page_content) == ("a", "gamma")
+    docs = store.similarity_search("alpha", k=5, filter={"strategyID": {"$in": ["2"]}})
+    assert [doc.id for doc in docs] == ["b"]
+
+
+def test_delete():
+    store = _store()
+    store.add_texts(["alpha", "beta", "gamma"], ids=["a", "b", "c"])
+    store.delete(ids=["b"])
+    assert sorted(doc.id for doc in store.similarity_search("beta", k=5)) == ["a", "c"]
+    store.delete(delete_all=True)
+    assert len(store) == 0
+    assert store.similarity_search("beta") == []
+
+
+def test_reloads_from_disk(tmp_path):
+    path = str(tmp_path / "index")
+    writer = _store(path)
+    writer.add_texts(["alpha", "beta"], metadatas=[{"strategyID": "1"}, {"strategyID": "2"}], ids=["a", "b"])
+
+    reader = _store(path)
+    assert len(reader) == 2
+    [doc] = reader.similarity_search("beta", k=1, filter={"strategyID": "2"})
+    assert (doc.id, doc.page_content) == ("b", "beta")
+
+    # The reader picks up later writes from another store
+    writer.delete(ids=["a"])
+    assert [doc.id for doc in reader.similarity_search("alpha", k=5)] == ["b"]
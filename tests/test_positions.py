@@ -0,0 +1,134 @@
+import pytest
+
+import admission
+import check_user_position
+from fakes import FakeMulticall
+from position_cache import IncompleteRead, PositionCache
+
+USER = "0x00000000000000000000000000000000000000aa"
+
+
+class BrokenMulticall:
+    """aggregate3 always fails, forcing the sequential fallback."""
+
+    def __init__(self):
+        self.functions = self
+
+    def aggregate3(self, calls):
+        return self
+
+    async def call(self, block_identifier="latest"):
+        raise RuntimeError("no multicall")
+
+
+class Contract:
+    """Aggregator stand-in recording the block of every call; strategy 2 errors."""
+
+    address = "0x0000000000000000000000000000000000000001"
+
+    def __init__(self):
+        self.functions = self
+        self.blocks = []
+
+    def __getattr__(self, fn_name):
+        def function(strategy_id, user):
+            return _Call(self, strategy_id)
+
+        return function
+
+
+class _Call:
+    def __init__(self, contract, strategy_id):
+        self.contract = contract
+        self.strategy_id = strategy_id
+
+    async def call(self, block_identifier="latest"):
+        self.contract.blocks.append(block_identifier)
+        if self.strategy_id == 2:
+            raise RuntimeError("rpc error")
+        return 10**18
+
+
+@pytest.mark.asyncio
+async def test_batch_read_decodes_multicall_results():
+    multicall = FakeMulticall(latency=0)
+    contract = check_user_position.async_aggregator_contract
+    calls = [(fn_name, strategy_id, USER) for strategy_id in range(1, 21) for fn_name in ("getStakedBalance", "getPendingRewards")]
+    results = await check_user_position.abatch_read(calls, multicall=multicall)
+    expected = [multicall.value_for(check_user_position._calldata(contract, *call)) for call in calls]
+    assert results == expected
+    assert 0 in results and any(results)
+    assert multicall.calls == 1
+
+
+def test_reverted_sub_calls_decode_as_zero():
+    calls = [("getStakedBalance", 1, USER), ("getPendingRewards", 1, USER), ("getStakedBalance", 2, USER)]
+    responses = [(True, (5 * 10**18).to_bytes(32, "big")), (False, b""), (True, b"\x01")]
+    assert check_user_position._decode_results(calls, responses, None) == [5 * 10**18, 0, 0]
+
+
+@pytest.mark.asyncio
+async def test_fallback_reads_are_pinned_and_report_errors():
+    contract = Contract()
+    calls = [("getStakedBalance", 1, USER), ("getStakedBalance", 2, USER)]
+    admitted = admission.limit("rpc").admitted
+    results = await check_user_position.abatch_read(calls, contract, BrokenMulticall(), block_identifier=123)
+    assert results == [10**18, 0]
+    assert contract.blocks == [123, 123]
+    # The failed aggregate3 plus one rpc slot per fallback read
+    assert admission.limit("rpc").admitted == admitted + 3
+
+    with pytest.raises(IncompleteRead) as e:
+        await check_user_position.abatch_read(calls, contract, BrokenMulticall(), block_identifier=123, strict=True)
+    assert e.value.values == [10**18, 0]
+
+
+@pytest.mark.asyncio
+async def test_incomplete_reads_are_not_cached():
+    async def block_number():
+        return 7
+
+    reads = []
+
+    async def fetch(block_identifier, strategy_ids):
+        reads.append(block_identifier)
+        values = {strategy_id: (1, 0) for strategy_id in strategy_ids}
+        if len(reads) == 1:
+            raise IncompleteRead(values)
+        return values
+
+    cache = PositionCache(block_number)
+    for _ in range(3):
+        assert await cache.get(USER, [1, 2], fetch) == {1: (1, 0), 2: (1, 0)}
+    assert reads == [7, 7]
+    assert (cache.incomplete, cache.misses, cache.hits) == (1, 2, 1)
+
+
+@pytest.mark.asyncio
+async def test_invalid_addresses_are_rejected():
+    contract = check_user_position.async_aggregator_contract
+    with pytest.raises(ValueError):
+        check_user_position._calldata(contract, "getStakedBalance", 1, "0x1234")
+    with pytest.raises(ValueError):
+        await check_user_position.aquery_all_positions("0x1234")
+
+
+@pytest.mark.asyncio
+async def test_batch_reports_failed_reads_as_errors(monkeypatch):
+    monkeypatch.setattr(check_user_position, "async_aggregator_contract", Contract())
+    monkeypatch.setattr(check_user_position, "async_multicall_contract", BrokenMulticall())
+    rows = [row async for row in check_user_position.aquery_positions_batch([USER, "not an address"], block_identifier=5)]
+    assert sorted(rows, key=lambda row: row["index"]) == [
+        {"index": 0, "address": check_user_position.Web3.to_checksum_address(USER), "error": "some position reads failed"},
+        {"index": 1, "address": "not an address", "error": "invalid address"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_batch_endpoint_fails_before_streaming_without_a_block(fake_main, client, monkeypatch):
+    async def block_number():
+        raise RuntimeError("rpc down")
+
+    monkeypatch.setattr(check_user_position, "_aget_block_number", block_number)
+    response = await client.post("/positions/batch", json={"addresses": [USER]})
+    assert response.status_code == 502
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.messages import HumanMessage, ToolMessage
+
+from prompt_builder import STATIC_PREFIX_MESSAGE, _context_message, build_prompt, count_prompt_tokens, strategy_rows
+from strategy_registry import registry
+from structured_index import record_to_document
+
+
+@pytest.fixture
+def table():
+    return registry.current()
+
+
+def _tool_message(name, artifact):
+    return ToolMessage(content="", artifact=artifact, name=name, tool_call_id=name)
+
+
+def _strategy_ids(rows):
+    return [str(row["strategyID"]) for row in rows]
+
+
+def test_strategies_are_deduplicated_by_strategy_id(table):
+    documents = [record_to_document(r) for r in table.records]
+    rows = strategy_rows(documents + documents[:2], table)
+    assert _strategy_ids(rows) == [str(r["strategyID"]) for r in table.records]
+
+
+def test_unknown_strategies_are_read_from_the_document_text(table):
+    document = Document(page_content="strategyID: 99\nprotocol: GhostStake", metadata={"strategyID": "99"})
+    assert strategy_rows([document, document], table) == [{"strategyID": "99", "protocol": "GhostStake"}]
+
+
+def test_context_holds_strategies_and_active_positions(table):
+    documents = [record_to_document(r) for r in table.records]
+    positions = [
+        {"strategyId": 1, "protocol": "SimpleStake", "staking_token": "WMOD", "amount_staked": 2.0, "reward_token": "sWMOD", "pending_rewards": 0.0},
+        {"strategyId": 2, "protocol": "HappyStake", "staking_token": "WMOD", "amount_staked": 0.0, "reward_token": "sWMOD", "pending_rewards": 0.0},
+    ]
+    tool_messages = {
+        "retrieve_defi_info": [_tool_message("retrieve_defi_info", documents)],
+        "check_user_position": [_tool_message("check_user_position", json.dumps(positions))],
+    }
+    prompt, tokens = build_prompt(tool_messages, [HumanMessage("what can I do?")], table)
+    assert prompt[0] is STATIC_PREFIX_MESSAGE
+    context = prompt[1].content
+    assert all(r["protocol"] in context for r in table.records)
+    positions_section = context.split("Positions:")[1]
+    assert "SimpleStake" in positions_section and "HappyStake" not in positions_section
+    assert prompt[-1].content == "what can I do?"
+    assert tokens == count_prompt_tokens(prompt)
+
+
+def test_lowest_ranked_strategies_are_dropped_to_fit_the_budget(table):
+    documents = [record_to_document(r) for r in table.records]
+    rows = strategy_rows(documents, table)
+    budget = count_prompt_tokens([STATIC_PREFIX_MESSAGE, _context_message(rows[:2], None)])
+    tool_messages = {"retrieve_defi_info": [_tool_message("retrieve_defi_info", documents)]}
+    prompt, tokens = build_prompt(tool_messages, [], table, max_tokens=budget)
+    assert prompt[1].content == _context_message(rows[:2], None).content
+    assert tokens <= budget
@@ -0,0 +1,93 @@
+import types
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+import response_cache
+from response_cache import SemanticResponseCache, query_fingerprint
+from strategy_registry import registry
+
+ANSWER = {"LLM_response": "SimpleStake", "type": "EXECUTE_TRANSACTION", "strategies": []}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(response_cache, "time", types.SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+def test_fingerprint_separates_different_numbers():
+    table = registry.current()
+    assert query_fingerprint("staking with 5% APR", table) != query_fingerprint("staking with 6% APR", table)
+    assert query_fingerprint("at least 5% APR", table) != query_fingerprint("at most 5% APR", table)
+    assert query_fingerprint("staking with at least 5% APR", table) == query_fingerprint("at least 5% APR staking", table)
+
+
+def test_similarity_threshold():
+    cache = SemanticResponseCache(threshold=0.8, enabled=True)
+    cache.store([1.0, 0.0], "f", "v1", ANSWER)
+    assert cache.lookup([0.8, 0.6], "f", "v1") == ANSWER
+    assert cache.lookup([0.6, 0.8], "f", "v1") is None
+    # Identical embeddings still miss when the fingerprint differs
+    assert cache.lookup([1.0, 0.0], "g", "v1") is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_entries_expire(clock):
+    cache = SemanticResponseCache(ttl=10, enabled=True)
+    cache.store([1.0, 0.0], "f", "v1", ANSWER)
+    clock.now = 9
+    assert cache.lookup([1.0, 0.0], "f", "v1") == ANSWER
+    clock.now = 11
+    assert cache.lookup([1.0, 0.0], "f", "v1") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticResponseCache(max_size=2, enabled=True)
+    cache.store([1.0, 0.0], "a", "v1", {"answer": "a"})
+    cache.store([1.0, 0.0], "b", "v1", {"answer": "b"})
+    assert cache.lookup([1.0, 0.0], "a", "v1") == {"answer": "a"}
+    cache.store([1.0, 0.0], "c", "v1", {"answer": "c"})
+    assert cache.lookup([1.0, 0.0], "b", "v1") is None
+    assert cache.lookup([1.0, 0.0], "a", "v1") == {"answer": "a"}
+    assert cache.lookup([1.0, 0.0], "c", "v1") == {"answer": "c"}
+
+
+def test_new_catalog_version_clears_the_cache():
+    cache = SemanticResponseCache(enabled=True)
+    cache.store([1.0, 0.0], "f", "v1", ANSWER)
+    assert cache.lookup([1.0, 0.0], "f", "v2") is None
+    assert cache.lookup([1.0, 0.0], "f", "v1") is None
+    assert cache.invalidations == 1
+
+
+def _turn(*tool_names):
+    messages = [HumanMessage("earlier question"), ToolMessage(content="", name="check_user_position", tool_call_id="0")]
+    messages += [HumanMessage("which staking has the best APR?"), AIMessage("")]
+    messages += [ToolMessage(content="", name=name, tool_call_id=str(i)) for i, name in enumerate(tool_names, 1)]
+    return messages + [AIMessage("answer")]
+
+
+def test_only_catalog_only_turns_are_stored(fake_main, monkeypatch):
+    cache = SemanticResponseCache(enabled=True)
+    monkeypatch.setattr(fake_main, "response_cache", cache)
+    key = ([1.0, 0.0], "f", "v1")
+
+    fake_main._store_response(key, _turn("retrieve_defi_info", "check_user_position"), ANSWER)
+    fake_main._store_response(key, _turn("retrieve_defi_info"), {**ANSWER, "type": "WITHDRAW_POSITION"})
+    fake_main._store_response(None, _turn("retrieve_defi_info"), ANSWER)
+    assert cache.stores == 0
+
+    # A position read in an earlier turn doesn't count
+    fake_main._store_response(key, _turn("retrieve_defi_info"), ANSWER)
+    assert cache.lookup(*key) == ANSWER
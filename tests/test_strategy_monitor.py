@@ -0,0 +1,38 @@
+import pytest
+
+from strategy_monitor import OnchainMetricsSource, StrategyMonitor, build_monitor
+from strategy_registry import registry
+
+
+class FakePositions:
+    @staticmethod
+    async def aquery_total_staked(strategy_ids):
+        return {strategy_id: 1234.5 for strategy_id in strategy_ids}
+
+
+@pytest.mark.asyncio
+async def test_onchain_total_staked_does_not_overwrite_usd_tvl():
+    source = OnchainMetricsSource()
+    source._module = FakePositions()
+    monitor = StrategyMonitor(source)
+    await monitor.poll_once()
+
+    catalog = registry.current()
+    view = monitor.view(catalog)
+    for record, merged in zip(catalog.records, view.records):
+        assert merged["TVL"] == record["TVL"]
+        assert merged["totalStaked"] == 1234.5
+    assert list(view.tvl) == list(catalog.tvl)
+
+
+@pytest.mark.asyncio
+async def test_stub_drift_is_configurable():
+    catalog = registry.current()
+    steady = build_monitor("stub", drift=0.0)
+    await steady.poll_once()
+    assert [r["APR"] for r in steady.view(catalog).records] == [float(r["APR"]) for r in catalog.records]
+
+    drifting = build_monitor("stub", drift=0.2)
+    assert drifting.source.drift == 0.2
+    await drifting.poll_once()
+    assert [r["APR"] for r in drifting.view(catalog).records] != [float(r["APR"]) for r in catalog.records]
@@ -0,0 +1,56 @@
+import pytest
+
+from strategy_registry import registry
+
+
+@pytest.fixture
+def table():
+    return registry.current()
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("Recommend some staking protocols for me, at least 5% APR.", {"min_apr": 5.0}),
+        ("staking over 7% apr", {"min_apr": 7.0}),
+        ("5% apr or more", {"min_apr": 5.0}),
+        ("at most 6% APR", {"max_apr": 6.0}),
+        ("under 6% apr please", {"max_apr": 6.0}),
+        ("staking below 7% APR", {"max_apr": 7.0}),
+        ("no more than 6% apr", {"max_apr": 6.0}),
+        ("between at least 5% and at most 8% APR", {"min_apr": 5.0, "max_apr": 8.0}),
+        ("staking between 5% and 7% APR", {"min_apr": 5.0, "max_apr": 7.0}),
+        ("between 5 and 7% apy", {"min_apr": 5.0, "max_apr": 7.0}),
+        ("staking with 5-7% APR", {"min_apr": 5.0, "max_apr": 7.0}),
+        ("4.5% to 6% apr", {"min_apr": 4.5, "max_apr": 6.0}),
+        ("staking 5% apr", {"min_apr": 5.0}),
+        ("is 5% APR or 7% APR better?", {}),
+        ("5% apr vs 7% apy", {}),
+        ("what lending strategies are available", {"category": "lending"}),
+        ("liquid staking options", {"category": "liquid staking"}),
+        ("recommend some staking protocols", {}),
+        ("Which is better, staking or lending?", {}),
+        ("restaking vs liquid staking", {}),
+        ("compare lending and restaking", {}),
+    ],
+)
+def test_parse_constraints(table, query, expected):
+    constraints = table.parse_constraints(query)
+    assert {k: v for k, v in constraints.items() if k in ("min_apr", "max_apr", "category")} == expected
+
+
+def test_upper_bound_keeps_matching_strategies(table):
+    records = table.query(**table.parse_constraints("at most 6% APR"))
+    assert records and all(float(r["APR"]) <= 6 for r in records)
+
+
+def test_range_keeps_strategies_inside_it(table):
+    records = table.query(**table.parse_constraints("staking between 5% and 7% APR"))
+    assert records and all(5 <= float(r["APR"]) <= 7 for r in records)
+
+
+@pytest.mark.asyncio
+async def test_retrieval_falls_back_to_semantic_search_when_nothing_matches(fake_main):
+    content, documents = await fake_main.retrieve_defi_info.coroutine("staking with at least 50% APR")
+    assert documents
+    assert fake_main.vector_store.get().searches == 1
@@ -1,39 +1,134 @@
 from pinecone import Pinecone, ServerlessSpec
 from langchain_pinecone import PineconeVectorStore
 from langchain_openai import OpenAIEmbeddings
-from config import PINECONE_API_KEY, PINECONE_INDEX_NAME
+from config import LOCAL_INDEX_PATH, PINECONE_API_KEY, PINECONE_INDEX_NAME, VECTOR_BACKEND
+from catalog import catalog_version
+from embedding_cache import EmbeddingCache, ResultCache
+from local_index import LocalVectorStore
 from dotenv import load_dotenv
+import asyncio
+import json
 import os 
 
+import admission
+import metrics
+
 load_dotenv()
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 
 
 class ProtocolsVectorStore:
-    def __init__(self):
-        pc = Pinecone(api_key=PINECONE_API_KEY)
-        self.index_name = PINECONE_INDEX_NAME
-
-        # Create index if it doesn't exist
-        if self.index_name not in pc.list_indexes().names():
-            pc.create_index(
-                name=self.index_name,
-                dimension=1536,  # dimensionality of OpenAI embeddings
-                metric="cosine",
-                spec=ServerlessSpec(cloud="aws", region="us-east-1"),
-            )
-
-        self.index = pc.Index(self.index_name)
+    def __init__(self, backend=VECTOR_BACKEND):
+        self.backend = backend
         self.embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
-        self.vector_store = PineconeVectorStore(
-            index=self.index, embedding=self.embeddings, text_key="text"
-        )
+
+        if backend == "local":
+            # In-process NumPy index persisted next to the app by ingestion.py
+            self.index_name = LOCAL_INDEX_PATH
+            self.vector_store = LocalVectorStore(self.embeddings, path=LOCAL_INDEX_PATH)
+        else:
+            pc = Pinecone(api_key=PINECONE_API_KEY)
+            self.index_name = PINECONE_INDEX_NAME
+
+            # Create index if it doesn't exist
+            if self.index_name not in pc.list_indexes().names():
+                pc.create_index(
+                    name=self.index_name,
+                    dimension=1536,  # dimensionality of OpenAI embeddings
+                    metric="cosine",
+                    spec=ServerlessSpec(cloud="aws", region="us-east-1"),
+                )
+
+            self.index = pc.Index(self.index_name)
+            self.vector_store = PineconeVectorStore(
+                index=self.index, embedding=self.embeddings, text_key="text"
+            )
+        self.embedding_cache = EmbeddingCache(model=self.embeddings.model)
+        self.result_cache = ResultCache()
 
     def add_documents(self, documents):
         self.vector_store.add_documents(documents)
+        self.result_cache.clear()
+
+    def upsert_embeddings(self, ids, vectors, documents):
+        """Insert or replace documents whose embeddings were computed by the caller."""
+        if self.backend == "local":
+            self.vector_store.add_vectors(
+                vectors,
+                [doc.page_content for doc in documents],
+                [doc.metadata for doc in documents],
+                ids,
+                save=False,
+            )
+        else:
+            self.index.upsert(
+                vectors=[
+                    {"id": id, "values": vector, "metadata": {**doc.metadata, "text": doc.page_content}}
+                    for id, vector, doc in zip(ids, vectors, documents)
+                ]
+            )
+        self.result_cache.clear()
+
+    def delete_documents(self, ids):
+        if self.backend == "local":
+            self.vector_store.delete(ids=ids, save=False)
+        else:
+            self.vector_store.delete(ids=ids)
+        self.result_cache.clear()
+
+    def flush(self):
+        """Persist batched writes (only needed for the local backend)."""
+        if self.backend == "local":
+            self.vector_store.save()
+
+    async def aembed_query(self, query):
+        """Query embedding through the embedding cache (also used by the response cache)."""
+        return await self.embedding_cache.aembed(query, self._aembed)
+
+    def _embed(self, text):
+        with metrics.timer("embedding", self.embeddings.model):
+            return self.embeddings.embed_query(text)
+
+    async def _aembed(self, text):
+        async with admission.limit("embeddings"):
+            with metrics.timer("embedding", self.embeddings.model):
+                return await self.embeddings.aembed_query(text)
+
+    def similarity_search(self, query, k=10, filter=None):
+        embedding = self.embedding_cache.embed(query, self._embed)
+        key = ResultCache.key(embedding, k, catalog_version()) + (json.dumps(filter, sort_keys=True),)
+        docs = self.result_cache.get(key)
+        if docs is None:
+            docs = self._search_by_vector(embedding, k, filter)
+            self.result_cache.put(key, docs)
+        return list(docs)
+
+    async def asimilarity_search(self, query, k=10, filter=None):
+        """Embed the query with the async OpenAI client, then run the (sync) Pinecone query in a worker thread."""
+        embedding = await self.aembed_query(query)
+        key = ResultCache.key(embedding, k, catalog_version()) + (json.dumps(filter, sort_keys=True),)
+        docs = self.result_cache.get(key)
+        if docs is None:
+            docs = await asyncio.to_thread(self._search_by_vector, embedding, k, filter)
+            self.result_cache.put(key, docs)
+        return list(docs)
+
+    def _search_by_vector(self, embedding, k, filter=None):
+        # PineconeVectorStore only implements the scored variant (LocalVectorStore mirrors it)
+        with metrics.timer("vector", self.backend):
+            return [
+                doc
+                for doc, _ in self.vector_store.similarity_search_by_vector_with_score(
+                    embedding, k=k, filter=filter
+                )
+            ]
 
-    def similarity_search(self, query, k=10):
-        return self.vector_store.similarity_search(query, k)
+    def cache_stats(self):
+        return {
+            "embeddings": self.embedding_cache.stats(),
+            "results": self.result_cache.stats(),
+            "catalog_version": catalog_version(),
+        }
     
     def as_retriever(self):
         return self.vector_store.as_retriever(
@@ -44,10 +139,11 @@ class ProtocolsVectorStore:
         )
 
     def delete_all_documents(self):
-        """Delete all documents from the Pinecone index"""
+        """Delete all documents from the index"""
         try:
             # Delete all vectors in the index
-            self.index.delete(delete_all=True)
+            self.vector_store.delete(delete_all=True)
+            self.result_cache.clear()
             print(f"Successfully deleted all documents from index: {self.index_name}")
             return True
         except Exception as e: